@@ -1,14 +1,37 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
+from werkzeug.middleware.proxy_fix import ProxyFix
 import wikipediaapi
 import wikipedia
 import requests
 import os
-from flask_bcrypt import Bcrypt
+from password_service import (start_pool as start_password_pool, hash_password, check_password,
+                              rehash_if_needed, PasswordServiceBusy, RETRY_AFTER)
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
 import re
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-from sentimental import sentiment_blueprint, init_app
+from datetime import datetime
+from sentimental import sentiment_blueprint, init_app, enqueue_comment_sentiment, start_sentiment_worker
+from user_profiles import create_profile, record_like, record_share
+from article_sampling import sample_from_domains, interacted_ids_by_domain, ensure_random_keys, new_random_key
+from feeds import init_feeds, read_feed, save_feed, register_feed_builder
+from trending_service import init_trending, start_poller, get_trending, TRENDING_WINDOWS
+from pageview_window import SORT_KEYS
+from topic_matcher import DEFAULT_REGION, REGION_KEYWORDS
+from swr_cache import stale_while_revalidate, cache_stats
+from cache_events import (init_cache_events, start_listener, register_user_cache, publish_user_event,
+                          user_invalidated_at)
+from search_service import (init_search, index_article, title_index, search_cache, search_local,
+                            search_cache_key, SEARCH_CACHE_EMPTY_TTL)
+import search_service
+from user_history import (find_slim_user, history_cursor, get_history_page, InvalidCursor,
+                          INTERACTION_TYPES, HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE)
+from session_tokens import init_sessions, issue_token, verify_token, bearer_token, InvalidSession
+from rate_limiter import init_rate_limiter, rate_limited, check_rate_limit
+from inference_client import score_subdomains, is_available as inference_available
+from metrics import init_metrics, render_metrics, count_cache, timed
+from db_profiler import init_db_profiler
+from structured_logging import get_logger
 
 
 # Add these imports at the top
@@ -17,6 +40,11 @@ import time
 from cachelib import SimpleCache
 import threading
 
+# Fork the password hashing processes before any threads are started
+start_password_pool()
+
+log = get_logger(__name__)
+
 # Create a cache object
 cache = SimpleCache()
 
@@ -29,12 +57,12 @@ def load_bert_model():
     global global_tokenizer, global_model
     try:
         from transformers import BertTokenizer, BertForSequenceClassification
-        print("Loading BERT model and tokenizer...")
+        log.info("Loading BERT model and tokenizer")
         global_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
         global_model = BertForSequenceClassification.from_pretrained('bert-base-uncased')
-        print("BERT model loaded successfully")
+        log.info("BERT model loaded")
     except Exception as e:
-        print(f"Error loading BERT model: {str(e)}")
+        log.error("Error loading BERT model: %s", e)
 
 # Start loading model in background thread
 threading.Thread(target=load_bert_model).start()
@@ -48,7 +76,19 @@ def get_cached_wikipedia_data(topic):
 load_dotenv()
 
 app = Flask(__name__)
-bcrypt = Bcrypt(app)
+
+# Number of proxies in front of the app (ngrok, a load balancer) whose
+# X-Forwarded-For is trusted for the client address. 0 ignores the header.
+# The ngrok tunnel is one hop, so it is trusted by default when USE_NGROK is set.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1 if os.environ.get('USE_NGROK') == 'True' else 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+else:
+    log.warning("TRUSTED_PROXY_HOPS is 0, so behind a proxy all clients share one rate limit bucket")
+
+# Command listeners only see clients created after they are registered
+init_metrics(app)
+init_db_profiler(app)
 
 # MongoDB Connection
 mongo_uri = os.environ.get('MONGODB_URI')
@@ -56,9 +96,54 @@ client = MongoClient(mongo_uri)
 db = client.get_database("visionary")
 users_collection = db.users
 
+# Unique indexes let signup detect an existing email or phone with a single insert.
+# Without them, e.g. when existing duplicates block the index, signup falls
+# back to looking both up first.
+try:
+    users_collection.create_index("email", unique=True)
+    users_collection.create_index("phone", unique=True)
+    unique_user_indexes = True
+except Exception as e:
+    log.error("Error creating user indexes, signup checks for duplicates with extra reads: %s", e)
+    unique_user_indexes = False
+
+init_feeds(db)
+init_sessions(db)
+init_rate_limiter(db)
+init_cache_events(db)
+init_trending(db)
+register_user_cache(cache, "bert_rec_{user_id}")
 init_app(app, db)
 app.register_blueprint(sentiment_blueprint)
 
+VALID_DOMAINS = ["nature", "education", "entertainment", "technology", 
+                 "science", "political", "lifestyle", "social", 
+                 "space", "food"]
+
+# Index and backfill the random keys used for article sampling
+def prepare_article_sampling():
+    try:
+        assigned = ensure_random_keys(db, VALID_DOMAINS)
+        if assigned:
+            log.info("Assigned random keys to %d articles", assigned)
+    except Exception as e:
+        log.error("Error preparing article sampling: %s", e)
+
+threading.Thread(target=prepare_article_sampling, daemon=True).start()
+
+# Index the domain collections for /search
+init_search(db, VALID_DOMAINS)
+
+# Threads don't survive a fork, so a process forked after this point, like
+# a preloaded gunicorn worker, starts its own on its first request. Forked
+# processes that don't serve requests, like the password hashing pool, don't.
+@app.before_request
+def start_background_threads():
+    start_listener()
+    start_poller()
+    search_service.start_indexer()
+    start_sentiment_worker()
+
 def get_wikipedia_data(topic):
     wiki_wiki = wikipediaapi.Wikipedia(
         language='en',
@@ -84,7 +169,7 @@ def get_wikipedia_data(topic):
                     wikipedia_page = wikipedia.page(page_title, auto_suggest=False)
                     image_url = wikipedia_page.images[0] if wikipedia_page.images else None
                 except Exception as img_error:
-                    print(f"Error getting image for {page_title}: {str(img_error)}")
+                    log.warning("Error getting image for %s: %s", page_title, img_error, extra={"page": page_title})
                 
                 # Get key sections
                 sections = []
@@ -110,16 +195,17 @@ def get_wikipedia_data(topic):
                 })
                 
             except Exception as page_error:
-                print(f"Error processing page {page_title}: {str(page_error)}")
+                log.warning("Error processing page %s: %s", page_title, page_error, extra={"page": page_title})
                 continue
         
         return data if data else None
         
     except Exception as e:
-        print(f"An error occurred: {str(e)}")
+        log.error("Error getting Wikipedia data for %s: %s", topic, e, extra={"topic": topic})
         return None
 
 @app.route('/wiki', methods=['GET'])
+@rate_limited("wikipedia")
 def wiki_data():
     topic = request.args.get('topic')
     if not topic:
@@ -136,6 +222,7 @@ def wiki_data():
 WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
 
 @app.route('/wiki/topics', methods=['GET'])
+@rate_limited("wikipedia")
 def get_random_topics():
     params = {
         "action": "query",
@@ -152,6 +239,7 @@ def get_random_topics():
     return jsonify({"topics": topics})
 
 @app.route('/wiki/random', methods=['GET'])
+@rate_limited("wikipedia")
 def random_wiki_article():
     # Get a random topic from Wikipedia
     params = {
@@ -189,6 +277,38 @@ def random_wiki_article():
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+def duplicate_key_field(error):
+    """The field whose unique index rejected an insert"""
+    key_pattern = (error.details or {}).get("keyPattern")
+    if key_pattern:
+        return next(iter(key_pattern))
+    # Servers before 4.2 only name the index in the message
+    return "phone" if "phone_1" in str(error) else "email"
+
+def interaction_user(user_id):
+    """
+    The acting user's id and name as (user, None), or (None, error response).
+    A session token for the same user is trusted without a MongoDB lookup,
+    requests without one look the user up as before.
+    """
+    token = bearer_token(request)
+    if token:
+        try:
+            claims = verify_token(token)
+        except InvalidSession as e:
+            return None, (jsonify({"error": str(e)}), 401)
+        if claims["sub"] != str(user_id):
+            return None, (jsonify({"error": "Session does not belong to this user"}), 403)
+        return {"_id": user_id, "fullName": claims["name"]}, None
+    
+    user = users_collection.find_one({"_id": user_id}, {"fullName": 1})
+    if not user:
+        return None, (jsonify({"error": "User not found"}), 404)
+    return user, None
+
+def password_service_busy():
+    return jsonify({"error": "Server is busy, please try again shortly"}), 503, {"Retry-After": str(RETRY_AFTER)}
+
 @app.route('/signup', methods=['POST'])
 def signup():
     data = request.json
@@ -204,20 +324,27 @@ def signup():
     if not re.match(email_regex, data['email']):
         return jsonify({"error": "Invalid email format"}), 400
     
-    # Check if email already exists
-    if users_collection.find_one({"email": data['email']}):
-        return jsonify({"error": "Email already registered"}), 409
+    if not unique_user_indexes:
+        # Check if email already exists
+        if users_collection.find_one({"email": data['email']}, {"_id": 1}):
+            return jsonify({"error": "Email already registered"}), 409
+        
+        # Check if phone already exists
+        if users_collection.find_one({"phone": data['phone']}, {"_id": 1}):
+            return jsonify({"error": "Phone number already registered"}), 409
     
-    # Check if phone already exists
-    if users_collection.find_one({"phone": data['phone']}):
-        return jsonify({"error": "Phone number already registered"}), 409
+    # Hash the password on the hashing pool, refusing new work when it is saturated
+    try:
+        password_hash = hash_password(data['password'])
+    except PasswordServiceBusy:
+        return password_service_busy()
     
     # Prepare user document with arrays to track interactions
     user = {
         "fullName": data['fullName'],
         "email": data['email'],
         "phone": data['phone'],
-        "password": bcrypt.generate_password_hash(data['password']).decode('utf-8'),
+        "password": password_hash,
         "bio": data.get('bio', ''),  # Optional field
         "interestedDomains": data.get('interestedDomains', []),  # Optional field
         "likedArticles": [],  # Array to store liked articles
@@ -225,10 +352,18 @@ def signup():
         "sharedArticles": []  # Array to store shared articles
     }
     
-    # Insert user into database
-    result = users_collection.insert_one(user)
+    # Insert user into database, the unique indexes reject an existing email or phone
+    try:
+        result = users_collection.insert_one(user)
+    except DuplicateKeyError as e:
+        if duplicate_key_field(e) == "phone":
+            return jsonify({"error": "Phone number already registered"}), 409
+        return jsonify({"error": "Email already registered"}), 409
     
     if result.inserted_id:
+        # Start the user's domain score profile
+        create_profile(db, result.inserted_id)
+        
         # Remove password from response and create a response dict
         response_user = {
             "fullName": user["fullName"],
@@ -244,6 +379,7 @@ def signup():
         return jsonify({
             "message": "User registered successfully",
             "userId": str(result.inserted_id),
+            "token": issue_token(result.inserted_id, user["fullName"]),
             "user": response_user
         }), 201
     else:
@@ -281,6 +417,9 @@ def update_user_domains():
         )
         
         if result.modified_count > 0:
+            # Invalidate the user's cached recommendations in every worker
+            publish_user_event(user_id, "domains")
+            
             # Get the updated user data
             updated_user = users_collection.find_one({"_id": user_id})
             
@@ -312,15 +451,29 @@ def login():
     if not data or 'email' not in data or 'password' not in data:
         return jsonify({"error": "Email and password are required"}), 400
     
+    # A slim login leaves out the interaction history, fetched later page by page
+    slim = bool(data.get('slim'))
+    
     try:
         # Find the user by email
-        user = users_collection.find_one({"email": data['email']})
+        if slim:
+            user = find_slim_user(users_collection, {"email": data['email']})
+        else:
+            user = users_collection.find_one({"email": data['email']})
         
         if not user:
             return jsonify({"error": "User not found"}), 404
         
-        # Verify password
-        if bcrypt.check_password_hash(user['password'], data['password']):
+        # Verify password on the hashing pool
+        try:
+            password_matches = check_password(user['password'], data['password'])
+        except PasswordServiceBusy:
+            return password_service_busy()
+        
+        if password_matches:
+            # Bring hashes made with an older cost up to the current one
+            rehash_if_needed(users_collection, user["_id"], user['password'], data['password'])
+            
             # Create a response without password
             response_user = {
                 "userId": str(user["_id"]),
@@ -328,16 +481,23 @@ def login():
                 "email": user["email"],
                 "phone": user["phone"],
                 "bio": user.get("bio", ""),
-                "interestedDomains": user.get("interestedDomains", []),
-                "interactions": {
+                "interestedDomains": user.get("interestedDomains", [])
+            }
+            
+            if slim:
+                response_user["interactionCounts"] = user["interactionCounts"]
+                response_user["historyCursor"] = history_cursor(user["interactionCounts"])
+            else:
+                response_user["interactions"] = {
                     "likedArticles": user.get("likedArticles", []),
                     "commentedArticles": user.get("commentedArticles", []),
                     "sharedArticles": user.get("sharedArticles", [])
                 }
-            }
             
             return jsonify({
                 "message": "Login successful",
+                # Send as "Authorization: Bearer <token>" to skip the user lookup on interactions
+                "token": issue_token(user["_id"], user["fullName"]),
                 "user": response_user
             }), 200
         else:
@@ -353,6 +513,7 @@ def login():
 # Add this after the login route and before if __name__ == '__main__'
 
 @app.route('/populate-domains', methods=['POST'])
+@rate_limited("ingest")
 def populate_domains():
     domains = [
         "Nature"
@@ -387,9 +548,12 @@ def populate_domains():
                         page_data["comments"] = []
                         page_data["reading_time"] = reading_time
                         page_data["created_at"] = datetime.now()
+                        page_data["random_key"] = new_random_key()  # Used for random sampling
                         
                         # Insert into collection
                         domain_collection.insert_one(page_data)
+                        # Make it searchable in this worker right away
+                        index_article(collection_name, page_data)
                 
                 results[domain] = f"Added {len(wiki_data)} articles"
             else:
@@ -437,10 +601,10 @@ def like_article(domain, article_id, user_id):
         from bson.objectid import ObjectId
         user_id_obj = ObjectId(user_id)
         
-        # Find the user
-        user = users_collection.find_one({"_id": user_id_obj})
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        # Check the user, skipped for requests with a valid session token
+        user, error = interaction_user(user_id_obj)
+        if error:
+            return error
         
         # Get the domain collection
         domain_collection = db[domain]
@@ -452,16 +616,28 @@ def like_article(domain, article_id, user_id):
             
         article_title = article.get("title", "Unknown article")
         
-        # Check if user already liked this article
-        liked_article = next((item for item in user.get("likedArticles", []) 
-                             if item.get("articleId") == article_id and item.get("domain") == domain), None)
+        like_info = {
+            "articleId": article_id,
+            "domain": domain,
+            "articleTitle": article_title,
+            "likedAt": datetime.now()
+        }
         
-        if liked_article:
+        # Add to user's liked articles unless it is already there
+        liked = users_collection.update_one(
+            {"_id": user_id_obj,
+             "likedArticles": {"$not": {"$elemMatch": {"articleId": article_id, "domain": domain}}}},
+            {"$push": {"likedArticles": like_info}}
+        ).matched_count == 1
+        
+        if not liked:
             # User already liked this article, unlike it
-            users_collection.update_one(
+            unliked = users_collection.update_one(
                 {"_id": user_id_obj},
                 {"$pull": {"likedArticles": {"articleId": article_id, "domain": domain}}}
             )
+            if unliked.matched_count == 0:
+                return jsonify({"error": "User not found"}), 404
             
             # Decrease like count in article
             domain_collection.update_one(
@@ -469,29 +645,27 @@ def like_article(domain, article_id, user_id):
                 {"$inc": {"likes": -1}}
             )
             
-            return jsonify({"message": "Article unliked successfully"}), 200
+            # Take the like back out of the user's domain scores
+            record_like(db, user_id_obj, domain, liked=False)
             
-        else:
-            # User is liking the article for the first time
-            like_info = {
-                "articleId": article_id,
-                "domain": domain,
-                "articleTitle": article_title,
-                "likedAt": datetime.now()
-            }
+            # Invalidate the user's cached recommendations in every worker
+            publish_user_event(user_id, "unlike")
             
-            # Add to user's liked articles
-            users_collection.update_one(
-                {"_id": user_id_obj},
-                {"$push": {"likedArticles": like_info}}
-            )
+            return jsonify({"message": "Article unliked successfully"}), 200
             
-            # Update the article's like count
+        else:
+            # User is liking the article for the first time, update the article's like count
             domain_collection.update_one(
                 {"id": article_id},
                 {"$inc": {"likes": 1}}
             )
             
+            # Add the like to the user's domain scores
+            record_like(db, user_id_obj, domain)
+            
+            # Invalidate the user's cached recommendations in every worker
+            publish_user_event(user_id, "like")
+            
             return jsonify({"message": "Article liked successfully"}), 200
             
     except Exception as e:
@@ -518,10 +692,10 @@ def add_comment(domain, article_id):
         from bson.objectid import ObjectId
         user_id = ObjectId(data['userId'])
         
-        # Find the user
-        user = users_collection.find_one({"_id": user_id})
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        # Check the user, skipped for requests with a valid session token
+        user, error = interaction_user(user_id)
+        if error:
+            return error
             
         # Get domain collection
         domain_collection = db[domain]
@@ -553,13 +727,14 @@ def add_comment(domain, article_id):
         )
         
         # Add to user's commented articles
+        commented_at = datetime.now()
         comment_info = {
             "commentId": comment_id,
             "articleId": article_id,
             "domain": domain,
             "articleTitle": article_title,
             "commentText": data['comment'],
-            "commentedAt": datetime.now()
+            "commentedAt": commented_at
         }
         
         users_collection.update_one(
@@ -567,6 +742,12 @@ def add_comment(domain, article_id):
             {"$push": {"commentedArticles": comment_info}}
         )
         
+        # Score the comment in the background and store the label on both documents
+        enqueue_comment_sentiment(domain, article_id, comment_id, user_id, data['comment'], commented_at)
+        
+        # Invalidate the user's cached recommendations in every worker
+        publish_user_event(user_id, "comment")
+        
         return jsonify({
             "message": "Comment added successfully",
             "comment": comment
@@ -626,10 +807,10 @@ def share_article(domain, article_id):
         from bson.objectid import ObjectId
         user_id = ObjectId(data['userId'])
         
-        # Find the user
-        user = users_collection.find_one({"_id": user_id})
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        # Check the user, skipped for requests with a valid session token
+        user, error = interaction_user(user_id)
+        if error:
+            return error
             
         # Get the domain collection
         domain_collection = db[domain]
@@ -655,6 +836,12 @@ def share_article(domain, article_id):
             {"$push": {"sharedArticles": share_info}}
         )
         
+        # Add the share to the user's domain scores
+        record_share(db, user_id, domain)
+        
+        # Invalidate the user's cached recommendations in every worker
+        publish_user_event(user_id, "share")
+        
         return jsonify({"message": "Article shared successfully"}), 200
             
     except Exception as e:
@@ -685,6 +872,41 @@ def get_user_interactions(user_id):
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+@app.route('/user/<user_id>/interactions/history', methods=['GET'])
+def get_user_interaction_history(user_id):
+    try:
+        # Convert the string user ID to MongoDB ObjectId
+        from bson.objectid import ObjectId
+        user_id_obj = ObjectId(user_id)
+        
+        # One of likedArticles, commentedArticles or sharedArticles
+        kind = request.args.get('type')
+        if kind not in INTERACTION_TYPES:
+            return jsonify({"error": f"type must be one of {INTERACTION_TYPES}"}), 400
+        
+        limit = min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), MAX_HISTORY_PAGE_SIZE)
+        if limit < 1:
+            limit = HISTORY_PAGE_SIZE
+        
+        # The cursor from a slim login or the previous page, newest page without one
+        try:
+            page = get_history_page(users_collection, user_id_obj, kind, request.args.get('cursor'), limit)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+        if page is None:
+            return jsonify({"error": "User not found"}), 404
+        
+        items, next_cursor = page
+        return jsonify({
+            "type": kind,
+            "items": items,
+            "count": len(items),
+            "nextCursor": next_cursor
+        }), 200
+            
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
 @app.route('/domains/<domain>/articles/<article_id>', methods=['GET'])
 def get_article_by_id(domain, article_id):
     try:
@@ -714,13 +936,11 @@ def get_article_by_id(domain, article_id):
 
     
 @app.route('/user/<user_id>/bert-recommendations-test', methods=['GET'])
+@rate_limited("bert")
 def get_bert_recommendations_test(user_id):
     try:
         # Convert the string user ID to MongoDB ObjectId
         from bson.objectid import ObjectId
-        from transformers import BertTokenizer, BertForSequenceClassification
-        import torch
-        import numpy as np
         
         user_id_obj = ObjectId(user_id)
         
@@ -732,8 +952,6 @@ def get_bert_recommendations_test(user_id):
         # Get user's interested domains and interactions
         interested_domains = user.get("interestedDomains", [])
         liked_articles = user.get("likedArticles", [])
-        commented_articles = user.get("commentedArticles", [])
-        shared_articles = user.get("sharedArticles", [])
         
         if not interested_domains:
             return jsonify({"error": "User has no interested domains selected"}), 404
@@ -741,12 +959,6 @@ def get_bert_recommendations_test(user_id):
         # Convert domain names to lowercase for collection names
         domain_collections = [domain.lower() for domain in interested_domains]
         
-        # Create a set of all interacted article IDs to avoid recommending them
-        interacted_articles = set()
-        for item in liked_articles + commented_articles + shared_articles:
-            if 'articleId' in item and 'domain' in item:
-                interacted_articles.add((item['articleId'], item['domain']))
-        
         # Define the mapping of domains to subdomains
         domain_to_subdomains = {
             "nature": ["Ecology", "Wildlife Conservation", "Botany", "Marine Biology", "Climatology", 
@@ -778,10 +990,6 @@ def get_bert_recommendations_test(user_id):
         
         if liked_articles:
             try:
-                # Load BERT model and tokenizer for classification
-                tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-                model = BertForSequenceClassification.from_pretrained('bert-base-uncased')
-                
                 # Extract summaries from liked articles
                 summaries = []
                 article_domains = []
@@ -804,28 +1012,47 @@ def get_bert_recommendations_test(user_id):
                 # Identify most relevant subdomains using BERT
                 subdomain_scores = {}
                 
-                for i, summary in enumerate(summaries):
-                    domain = article_domains[i]
-                    subdomains = domain_to_subdomains.get(domain, [])
-                    
-                    if not subdomains:
-                        continue
-                    
-                    # Use BERT to classify text into subdomains
-                    # This is a simplified approach - in production, you'd use a fine-tuned model
-                    inputs = tokenizer(summary, return_tensors="pt", truncation=True, padding=True)
-                    with torch.no_grad():
-                        outputs = model(**inputs)
+                # Score all summaries in one batched call to the inference server
+                remote_scores = score_subdomains(
+                    summaries,
+                    [domain_to_subdomains.get(domain, []) for domain in article_domains]
+                )
+                
+                if remote_scores is not None:
+                    for scores in remote_scores:
+                        for subdomain, score in scores.items():
+                            subdomain_scores[subdomain] = subdomain_scores.get(subdomain, 0) + score
+                else:
+                    # Inference server is down, load BERT in this worker instead
+                    from transformers import BertTokenizer, BertForSequenceClassification
+                    import torch
+                    import numpy as np
                     
-                    # Simulate subdomain classification with random scores for this example
-                    # In production, replace with actual classification logic
-                    subdomain_probs = np.random.random(len(subdomains))
-                    subdomain_probs = subdomain_probs / subdomain_probs.sum()  # Normalize to sum to 1
+                    tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
+                    model = BertForSequenceClassification.from_pretrained('bert-base-uncased')
                     
-                    for j, subdomain in enumerate(subdomains):
-                        if subdomain not in subdomain_scores:
-                            subdomain_scores[subdomain] = 0
-                        subdomain_scores[subdomain] += subdomain_probs[j]
+                    for i, summary in enumerate(summaries):
+                        domain = article_domains[i]
+                        subdomains = domain_to_subdomains.get(domain, [])
+                        
+                        if not subdomains:
+                            continue
+                        
+                        # Use BERT to classify text into subdomains
+                        # This is a simplified approach - in production, you'd use a fine-tuned model
+                        inputs = tokenizer(summary, return_tensors="pt", truncation=True, padding=True)
+                        with torch.no_grad(), timed("model_inference_seconds", model="bert_local"):
+                            outputs = model(**inputs)
+                        
+                        # Simulate subdomain classification with random scores for this example
+                        # In production, replace with actual classification logic
+                        subdomain_probs = np.random.random(len(subdomains))
+                        subdomain_probs = subdomain_probs / subdomain_probs.sum()  # Normalize to sum to 1
+                        
+                        for j, subdomain in enumerate(subdomains):
+                            if subdomain not in subdomain_scores:
+                                subdomain_scores[subdomain] = 0
+                            subdomain_scores[subdomain] += subdomain_probs[j]
                 
                 # Get top 3 subdomains
                 top_subdomains = sorted(subdomain_scores.items(), key=lambda x: x[1], reverse=True)[:3]
@@ -851,36 +1078,29 @@ def get_bert_recommendations_test(user_id):
                             bert_recommended_articles.append(article)
                 
             except Exception as bert_error:
-                print(f"Error in BERT recommendation: {str(bert_error)}")
+                log.error("Error in BERT recommendation: %s", bert_error)
         
         # If BERT recommendations didn't yield enough articles, get more from other domains
         if len(bert_recommended_articles) < 10:
             remaining_bert = 10 - len(bert_recommended_articles)
+            
+            # Exclude interacted and already recommended articles
+            exclude_ids = interacted_ids_by_domain(user)
+            for article in bert_recommended_articles:
+                if article.get("domain"):
+                    exclude_ids.setdefault(article["domain"], set()).add(article.get("id"))
+            
             # Get random articles from user's interested domains
-            for domain in domain_collections[:3]:  # Just use first 3 domains to keep it simple
-                if len(bert_recommended_articles) >= 10:
-                    break
-                    
-                if domain in db.list_collection_names():
-                    # Get article IDs to exclude
-                    exclude_ids = [article_id for article_id, article_domain in interacted_articles if article_domain == domain]
-                    already_recommended_ids = [a.get("id") for a in bert_recommended_articles if a.get("domain") == domain]
-                    exclude_ids.extend(already_recommended_ids)
-                    
-                    random_articles = list(db[domain].aggregate([
-                        {"$match": {"id": {"$nin": exclude_ids}}},
-                        {"$sample": {"size": remaining_bert // 3 + 1}},
-                        {"$project": {"_id": 0}}
-                    ]))
-                    
-                    for article in random_articles:
-                        article["domain"] = domain
-                        article["recommendation_source"] = "fallback"
-                    
-                    bert_recommended_articles.extend(random_articles)
-                    if len(bert_recommended_articles) >= 10:
-                        bert_recommended_articles = bert_recommended_articles[:10]
-                        break
+            existing_collections = set(db.list_collection_names())
+            quotas = [(domain, remaining_bert // 3 + 1) for domain in domain_collections[:3]  # Just use first 3 domains to keep it simple
+                      if domain in existing_collections]
+            
+            random_articles = sample_from_domains(db, quotas, exclude_ids)
+            for article in random_articles:
+                article["recommendation_source"] = "fallback"
+            
+            bert_recommended_articles.extend(random_articles)
+            bert_recommended_articles = bert_recommended_articles[:10]
         
         # Remove duplicates by ID
         seen_ids = set()
@@ -902,152 +1122,160 @@ def get_bert_recommendations_test(user_id):
     
 
 
-@app.route('/user/<user_id>/bert-recommendations', methods=['GET'])
-def get_bert_recommendations(user_id):
-    # Check cache first
-    cache_key = f"bert_rec_{user_id}"
-    cached_result = cache.get(cache_key)
-    if cached_result:
-        return jsonify(cached_result), 200
+def build_bert_recommendations(user_id):
+    """
+    Compute a user's BERT-based recommendations.
+    Returns (response_data, status) so the result can be served or stored as a feed.
+    """
+    # Set a timeout for the entire function
+    start_time = time.time()
+    max_execution_time = 25  # seconds
     
-    try:
-        # Set a timeout for the entire function
-        start_time = time.time()
-        max_execution_time = 25  # seconds
-        
-        # Convert the string user ID to MongoDB ObjectId
-        from bson.objectid import ObjectId
-        import numpy as np
-        
-        user_id_obj = ObjectId(user_id)
-        
-        # Find the user
-        user = users_collection.find_one({"_id": user_id_obj})
-        if not user:
-            return jsonify({"error": "User not found"}), 404
-        
-        # Get user's interested domains and interactions
-        interested_domains = user.get("interestedDomains", [])
-        liked_articles = user.get("likedArticles", [])
-        
-        if not interested_domains:
-            return jsonify({"error": "User has no interested domains selected"}), 404
-            
-        # Convert domain names to lowercase for collection names
-        domain_collections = [domain.lower() for domain in interested_domains]
-        
-        # Create a set of all interacted articles to avoid recommending them
-        interacted_articles = set()
-        for item in liked_articles + user.get("commentedArticles", []) + user.get("sharedArticles", []):
-            if 'articleId' in item and 'domain' in item:
-                interacted_articles.add((item['articleId'], item['domain']))
+    # Convert the string user ID to MongoDB ObjectId
+    from bson.objectid import ObjectId
+    import numpy as np
+    
+    user_id_obj = ObjectId(user_id)
+    
+    # Find the user
+    user = users_collection.find_one({"_id": user_id_obj})
+    if not user:
+        return {"error": "User not found"}, 404
+    
+    # Get user's interested domains and interactions
+    interested_domains = user.get("interestedDomains", [])
+    liked_articles = user.get("likedArticles", [])
+    
+    if not interested_domains:
+        return {"error": "User has no interested domains selected"}, 404
         
-        # Define the mapping of domains to subdomains (kept same as original)
-        domain_to_subdomains = {
-            "nature": ["Ecology", "Wildlife Conservation", "Botany"],
-            "education": ["Early Childhood Education", "Higher Education", "Online Learning"],
-            "entertainment": ["Movies", "Music", "Television Shows"],
-            "technology": ["Artificial Intelligence", "Cybersecurity", "Software Development"],
-            "science": ["Physics", "Chemistry", "Biology"],
-            "political": ["International Relations", "Government Systems", "Political Theories"],
-            "lifestyle": ["Travel & Tourism", "Fashion & Style", "Health & Wellness"],
-            "social": ["Sociology", "Psychology", "Social Media Trends"],
-            "space": ["Solar System", "Exoplanets", "Black Holes"],
-            "food": ["Culinary Arts", "Nutrition & Diet", "Food Science"],
-        }
+    # Convert domain names to lowercase for collection names
+    domain_collections = [domain.lower() for domain in interested_domains]
+    
+    # Define the mapping of domains to subdomains (kept same as original)
+    domain_to_subdomains = {
+        "nature": ["Ecology", "Wildlife Conservation", "Botany"],
+        "education": ["Early Childhood Education", "Higher Education", "Online Learning"],
+        "entertainment": ["Movies", "Music", "Television Shows"],
+        "technology": ["Artificial Intelligence", "Cybersecurity", "Software Development"],
+        "science": ["Physics", "Chemistry", "Biology"],
+        "political": ["International Relations", "Government Systems", "Political Theories"],
+        "lifestyle": ["Travel & Tourism", "Fashion & Style", "Health & Wellness"],
+        "social": ["Sociology", "Psychology", "Social Media Trends"],
+        "space": ["Solar System", "Exoplanets", "Black Holes"],
+        "food": ["Culinary Arts", "Nutrition & Diet", "Food Science"],
+    }
 
-        bert_recommended_articles = []
-        
-        # For each interested domain, get some articles to recommend
-        for domain in domain_collections[:3]:  # Limit to top 3 domains
-            if time.time() - start_time > max_execution_time:
-                # We're running out of time, break early
-                break
-                
-            # Get 3-4 articles from each domain
-            if domain in db.list_collection_names():
-                # Get article IDs to exclude
-                exclude_ids = [article_id for article_id, article_domain in interacted_articles if article_domain == domain]
-                
-                # Get random articles from this domain
-                random_articles = list(db[domain].aggregate([
-                    {"$match": {"id": {"$nin": exclude_ids}}},
-                    {"$sample": {"size": 4}},
-                    {"$project": {"_id": 0}}
-                ]))
-                
-                for article in random_articles:
-                    article["domain"] = domain
-                    article["recommendation_source"] = "domain_based"
-                
-                bert_recommended_articles.extend(random_articles)
-        
-        # If user has liked articles, try to get some subdomain recommendations
-        if liked_articles and global_tokenizer and global_model and len(bert_recommended_articles) < 10:
-            try:
-                # Use only a few liked articles to keep it fast
-                recent_liked = liked_articles[:3]
-                
-                # Mock subdomain classification for speed
-                subdomains_to_try = []
-                for liked in recent_liked:
-                    domain = liked.get('domain')
-                    if domain in domain_to_subdomains:
-                        # Pick a random subdomain
-                        import random
-                        subdomain = random.choice(domain_to_subdomains[domain])
-                        if subdomain not in subdomains_to_try:
-                            subdomains_to_try.append(subdomain)
+    bert_recommended_articles = []
+    
+    # For each interested domain, get 3-4 articles to recommend in one query
+    existing_collections = set(db.list_collection_names())
+    quotas = [(domain, 4) for domain in domain_collections[:3]  # Limit to top 3 domains
+              if domain in existing_collections]
+    
+    random_articles = sample_from_domains(db, quotas, interacted_ids_by_domain(user))
+    for article in random_articles:
+        article["recommendation_source"] = "domain_based"
+    
+    bert_recommended_articles.extend(random_articles)
+    
+    # If user has liked articles, try to get some subdomain recommendations
+    bert_available = inference_available() or (global_tokenizer and global_model)
+    if liked_articles and bert_available and len(bert_recommended_articles) < 10:
+        try:
+            # Use only a few liked articles to keep it fast
+            recent_liked = [liked for liked in liked_articles[:3] 
+                            if liked.get('domain') in domain_to_subdomains]
+            
+            # Classify the liked article titles on the inference server
+            remote_scores = score_subdomains(
+                [liked.get('articleTitle', '') for liked in recent_liked],
+                [domain_to_subdomains[liked['domain']] for liked in recent_liked]
+            )
+            
+            subdomains_to_try = []
+            for i, liked in enumerate(recent_liked):
+                if remote_scores:
+                    # Pick the best scoring subdomain
+                    scores = remote_scores[i]
+                    subdomain = max(scores, key=scores.get)
+                else:
+                    # Inference server is down, pick a random subdomain
+                    import random
+                    subdomain = random.choice(domain_to_subdomains[liked['domain']])
+                if subdomain not in subdomains_to_try:
+                    subdomains_to_try.append(subdomain)
+            
+            # Get 1-2 articles for each subdomain
+            for subdomain in subdomains_to_try[:2]:
+                if time.time() - start_time > max_execution_time:
+                    # We're running out of time, break early
+                    break
+                    
+                # Use cached version to speed up
+                subdomain_wiki_data = get_cached_wikipedia_data(subdomain)
                 
-                # Get 1-2 articles for each subdomain
-                for subdomain in subdomains_to_try[:2]:
-                    if time.time() - start_time > max_execution_time:
-                        # We're running out of time, break early
-                        break
+                if subdomain_wiki_data:
+                    # Add a couple articles from this subdomain
+                    for article in subdomain_wiki_data[:2]:
+                        article["subdomain"] = subdomain
+                        article["subdomain_score"] = 0.8  # Fixed score for speed
                         
-                    # Use cached version to speed up
-                    subdomain_wiki_data = get_cached_wikipedia_data(subdomain)
-                    
-                    if subdomain_wiki_data:
-                        # Add a couple articles from this subdomain
-                        for article in subdomain_wiki_data[:2]:
-                            article["subdomain"] = subdomain
-                            article["subdomain_score"] = 0.8  # Fixed score for speed
-                            
-                            # Find which main domain this subdomain belongs to
-                            for domain, subdomains in domain_to_subdomains.items():
-                                if subdomain in subdomains:
-                                    article["domain"] = domain
-                                    break
-                            
-                            bert_recommended_articles.append(article)
-            except Exception as bert_error:
-                print(f"Error in BERT recommendation: {str(bert_error)}")
-        
-        # Remove duplicates by ID
-        seen_ids = set()
-        unique_bert_articles = []
-        
-        for article in bert_recommended_articles:
-            if article["id"] not in seen_ids:
-                seen_ids.add(article["id"])
-                unique_bert_articles.append(article)
+                        # Find which main domain this subdomain belongs to
+                        for domain, subdomains in domain_to_subdomains.items():
+                            if subdomain in subdomains:
+                                article["domain"] = domain
+                                break
+                        
+                        bert_recommended_articles.append(article)
+        except Exception as bert_error:
+            log.error("Error in BERT recommendation: %s", bert_error)
+    
+    # Remove duplicates by ID
+    seen_ids = set()
+    unique_bert_articles = []
+    
+    for article in bert_recommended_articles:
+        if article["id"] not in seen_ids:
+            seen_ids.add(article["id"])
+            unique_bert_articles.append(article)
+    
+    # Prepare response
+    response_data = {
+        "bertRecommendedArticles": unique_bert_articles[:10],
+        "count": len(unique_bert_articles[:10]),
+        "method": "BERT-based subdomain classification"
+    }
+    
+    return response_data, 200
+
+
+# Responses are cached for 6 hours and recomputed in the background after 30 minutes,
+# interaction events clear them sooner
+@app.route('/user/<user_id>/bert-recommendations', methods=['GET'])
+@stale_while_revalidate(cache, lambda user_id: f"bert_rec_{user_id}", soft_ttl=1800, hard_ttl=21600,
+                        invalidated_at=user_invalidated_at)
+def get_bert_recommendations(user_id):
+    try:
+        # Serve the precomputed feed with a single read if there is one
+        feed = read_feed("bert", user_id)
+        if feed:
+            return jsonify(feed), 200
         
-        # Prepare response
-        response_data = {
-            "bertRecommendedArticles": unique_bert_articles[:10],
-            "count": len(unique_bert_articles[:10]),
-            "method": "BERT-based subdomain classification"
-        }
+        started_at = datetime.now()
+        response_data, status = build_bert_recommendations(user_id)
         
-        # Cache the result for 1 hour (3600 seconds)
-        cache.set(cache_key, response_data, timeout=3600)
+        if status == 200:
+            # Store it as the user's feed for the next load
+            save_feed("bert", user_id, response_data, generated_at=started_at)
         
-        return jsonify(response_data), 200
+        return jsonify(response_data), status
             
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+register_feed_builder("bert", build_bert_recommendations)
+
 # @app.route('/user/<user_id>/standard-recommendations', methods=['GET'])
 # def get_standard_recommendations(user_id):
 #     try:
@@ -1291,7 +1519,10 @@ def get_bert_recommendations(user_id):
 #         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
     
 
+# Engagement changes slowly, recompute in the background after a minute
 @app.route('/articles/trending', methods=['GET'])
+@stale_while_revalidate(cache, lambda: f"trending_articles_{request.args.get('limit', 10)}", 
+                        soft_ttl=60, hard_ttl=3600)
 def get_trending_articles():
     try:
         # Set a limit for the number of trending articles to return
@@ -1364,123 +1595,45 @@ def get_trending_articles():
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+# Topics are polled in the background by trending_service and served from memory
 @app.route('/wiki/trending', methods=['GET'])
 def get_trending_wikipedia_articles():
     try:
         # Set a limit for the number of trending articles to return
         limit = int(request.args.get('limit', 20))
-        
-        # Get the top viewed pages from Wikipedia's API (with India focus)
-        # Using en.wikipedia for English Wikipedia with India focus
-        url = "https://wikimedia.org/api/rest_v1/metrics/pageviews/top/en.wikipedia/all-access/"
-        
-        # Calculate today and yesterday's dates
-        today = datetime.now()
-        yesterday = today - timedelta(days=1)
-        
-        # Format dates properly for the API (YYYY/MM/DD)
-        dates_to_try = [
-            yesterday.strftime("%Y/%m/%d"),  # Try yesterday first (more likely to have complete data)
-            today.strftime("%Y/%m/%d"),      # Try today as well
-            # Fallback to known working dates if recent dates fail
-            "2025/03/25",
-            "2025/03/24",
-            "2025/03/23"
-        ]
-        
-        response = None
-        date_str = None
-        
-        # Set proper headers to avoid 403 errors
-        headers = {
-            'User-Agent': 'Visionary Educational App/1.0 (contact@visionary-education.com)',
-            'Accept': 'application/json',
-            'Accept-Language': 'en-US,en;q=0.9'
+        # Topics related to this region are listed first
+        region = request.args.get('region', DEFAULT_REGION).lower()
+        if region not in REGION_KEYWORDS:
+            return jsonify({"error": "Invalid region"}), 400
+        # Rank over the last 1, 7 or 30 days by total views or day-over-day growth
+        window = int(request.args.get('window', 1))
+        if window not in TRENDING_WINDOWS:
+            return jsonify({"error": f"Invalid window, expected one of {list(TRENDING_WINDOWS)}"}), 400
+        sort = request.args.get('sort', 'views')
+        if sort not in SORT_KEYS:
+            return jsonify({"error": f"Invalid sort, expected one of {list(SORT_KEYS)}"}), 400
+        
+        trending = get_trending(limit, region, window, sort)
+        if not trending:
+            return jsonify({"error": "Could not fetch trending data"}), 500
+        
+        response = {
+            "trendingTopics": trending["topics"],
+            "region": region,
+            "region_related_count": trending["related_count"],
+            "window": window,
+            "sort": sort,
+            "days_loaded": trending["days_loaded"],
+            "total_count": len(trending["topics"]),
+            "date": trending["date"],
+            "method": f"Wikipedia pageviews API ({region} focus)"
         }
-        
-        # Try each date until we get a successful response
-        for try_date in dates_to_try:
-            date_str = try_date
-            print(f"Trying to fetch trending data for date: {date_str}")
-            response = requests.get(f"{url}{date_str}", headers=headers)
-            print(f"Response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                print(f"Successfully retrieved trending data for: {date_str}")
-                break
-            elif response.status_code == 403:
-                print("Access forbidden - API rejected the request")
-                # Wait a moment before trying again to avoid triggering rate limits
-                time.sleep(1)
-        
-        # If all date attempts failed, return an error
-        if response is None or response.status_code != 200:
-            return jsonify({
-                "error": f"Could not fetch trending data. API returned status: {response.status_code if response else 'No response'}"
-            }), 500
-        
-        data = response.json()
-        top_articles = data['items'][0]['articles']
-        
-        # Process each article to create a simplified list with only topic, views and rank
-        trending_topics = []
-        india_related_topics = []
-        processed_count = 0
-        
-        # List of India-related keywords to prioritize
-        india_keywords = ["india", "indian", "mumbai", "delhi", "bangalore", "kolkata", "chennai",
-                         "hyderabad", "modi", "bollywood", "cricket", "bjp", "congress"]
-        
-        # First pass: find India-related articles
-        for article in top_articles:
-            # Skip main page, special pages, and other non-article pages
-            if (article['article'] in ['Main_Page', 'Special:Search'] or 
-                article['article'].startswith('Wikipedia:') or 
-                article['article'].startswith('Special:') or
-                article['article'].startswith('File:') or
-                article['article'].startswith('Portal:') or
-                article['article'].startswith('User:')):
-                continue
-            
-            # Create a simplified topic object
-            topic = {
-                'title': article['article'].replace('_', ' '),
-                'views': article['views'],
-                'rank': article['rank']
-            }
-            
-            # Check if this article is related to India
-            article_title_lower = topic['title'].lower()
-            is_india_related = any(keyword in article_title_lower for keyword in india_keywords)
-            
-            if is_india_related:
-                india_related_topics.append(topic)
-                print(f"Added India-related topic: {topic['title']}")
-            else:
-                trending_topics.append(topic)
-        
-        # Combine the lists, with India-related topics first
-        final_topics = india_related_topics + trending_topics
-        
-        # Limit to the requested number
-        final_topics = final_topics[:limit]
-        
-        # Add counts for each topic
-        for i, topic in enumerate(final_topics):
-            print(f"Final topic #{i+1}: {topic['title']}")
-        
-        return jsonify({
-            "trendingTopics": final_topics,
-            "india_related_count": len(india_related_topics),
-            "total_count": len(final_topics),
-            "date": date_str,
-            "method": "Wikipedia pageviews API (India focus)"
-        }), 200
+        # Kept for clients that read the India count by name
+        if region == "india":
+            response["india_related_count"] = trending["related_count"]
+        return jsonify(response), 200
         
     except Exception as e:
-        print(f"Exception in trending endpoint: {e}")
-        import traceback
-        traceback.print_exc()
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
         
@@ -1516,7 +1669,7 @@ def get_search_results(query, limit=5):
                     wikipedia_page = wikipedia.page(page_title, auto_suggest=False)
                     image_url = wikipedia_page.images[0] if wikipedia_page.images else None
                 except Exception as img_error:
-                    print(f"Error getting image for {page_title}: {str(img_error)}")
+                    log.warning("Error getting image for %s: %s", page_title, img_error, extra={"page": page_title})
                 
                 # Fetching summary with Wikipedia library
                 summary = wikipedia.summary(page_title, sentences=3, auto_suggest=False)
@@ -1533,13 +1686,13 @@ def get_search_results(query, limit=5):
                 })
                 
             except Exception as page_error:
-                print(f"Error processing search result {page_title}: {str(page_error)}")
+                log.warning("Error processing search result %s: %s", page_title, page_error, extra={"page": page_title})
                 continue
         
         return data if data else None
         
     except Exception as e:
-        print(f"An error occurred during search: {str(e)}")
+        log.error("Error searching Wikipedia for %s: %s", query, e, extra={"query": query})
         return None
 
 @app.route('/search', methods=['GET'])
@@ -1556,8 +1709,44 @@ def search_articles():
     except ValueError:
         limit = 5
         
-    # Get search results
-    results = get_search_results(query, limit)
+    # Full-text search over our own articles only, no calls to Wikipedia
+    if request.args.get('source') == 'local':
+        domains = None
+        if request.args.get('domains'):
+            domains = {domain.strip().lower() for domain in request.args.get('domains').split(',')}
+            if not domains.issubset(VALID_DOMAINS):
+                return jsonify({"error": "Invalid domain"}), 400
+        
+        start = time.perf_counter()
+        results = search_local(query, limit, domains)
+        return jsonify({
+            "query": query,
+            "results": results,
+            "count": len(results),
+            "took_ms": round((time.perf_counter() - start) * 1000, 2)
+        }), 200
+    
+    # Answer from our own articles first
+    results = title_index.search(query, limit)
+    
+    # Only go to Wikipedia for what the local index couldn't fill
+    if len(results) < limit:
+        cache_key = search_cache_key(query, limit)
+        wikipedia_results = search_cache.get(cache_key)
+        count_cache("search", "miss" if wikipedia_results is None else "hit")
+        if wikipedia_results is None:
+            # Only a cache miss calls Wikipedia, so only misses count against the limit
+            limited = check_rate_limit("wikipedia")
+            if limited:
+                return limited
+            wikipedia_results = get_search_results(query, limit) or []
+            search_cache.set(cache_key, wikipedia_results,
+                             ttl=None if wikipedia_results else SEARCH_CACHE_EMPTY_TTL)
+        
+        local_ids = {result["id"] for result in results}
+        # Cached results may have been stored for a differently written query
+        results += [dict(result, search_query=query, source="wikipedia")
+                    for result in wikipedia_results if result["id"] not in local_ids][:limit - len(results)]
     
     if not results:
         return jsonify({
@@ -1573,6 +1762,36 @@ def search_articles():
         "count": len(results)
     }), 200
 
+@app.route('/search/suggest', methods=['GET'])
+def suggest_search():
+    prefix = request.args.get('prefix', '')
+    
+    # Set limit with default of 8
+    try:
+        limit = int(request.args.get('limit', 8))
+        if limit < 1 or limit > 20:
+            limit = 8
+    except ValueError:
+        limit = 8
+    
+    # Article titles and trending topics starting with the prefix, most engaged first
+    suggestions = search_service.suggest_index.suggest(prefix, limit)
+    return jsonify({
+        "prefix": prefix,
+        "suggestions": suggestions,
+        "count": len(suggestions)
+    }), 200
+
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    # Hit, stale and miss counters for the stale-while-revalidate caches in this worker
+    return jsonify(cache_stats()), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Latency, MongoDB, HTTP, cache and inference metrics summed over all workers
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4"), 200
+
 def run_with_ngrok():
     from pyngrok import ngrok
     
@@ -1584,7 +1803,7 @@ def run_with_ngrok():
     
     # Open a ngrok tunnel to the HTTP server
     public_url = ngrok.connect(port)
-    print(f" * ngrok tunnel \"{public_url}\" -> \"http://localhost:{port}\"")
+    log.info("ngrok tunnel %s -> http://localhost:%d", public_url, port)
     
     # Update the app to use ngrok
     app.config["BASE_URL"] = public_url
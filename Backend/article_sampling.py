@@ -0,0 +1,169 @@
+"""
+Random article sampling across domain collections.
+
+Every article carries an indexed `random_key` drawn uniformly from [0, 1).
+To sample, each domain picks a random pivot and reads the next few articles
+in random_key order, wrapping around to the start of the range if needed.
+Those are indexed range scans, unlike `$match {$nin}` followed by `$sample`,
+which scans the collection and sorts it randomly.
+
+All domains are read in one aggregation, with one branch per domain joined
+by $unionWith. Excluded ids are filtered out client-side with a set, and any
+domain left short is topped up with a fresh pivot.
+"""
+import random
+
+from pymongo import UpdateOne
+
+RANDOM_KEY = "random_key"
+
+# Extra articles read per domain to absorb excluded ids without another query
+MIN_OVERFETCH = 5
+MAX_TOP_UP_ROUNDS = 3
+
+
+def interacted_ids_by_domain(user):
+    """Ids of every article the user liked, commented on or shared, keyed by domain"""
+    interacted = {}
+    for item in (user.get("likedArticles", []) + user.get("commentedArticles", [])
+                 + user.get("sharedArticles", [])):
+        if 'articleId' in item and 'domain' in item:
+            interacted.setdefault(item['domain'], set()).add(item['articleId'])
+    return interacted
+
+
+def new_random_key():
+    return random.random()
+
+
+def ensure_random_keys(db, domains, batch_size=1000):
+    """Index random_key and assign one to any article that doesn't have one yet"""
+    existing_collections = set(db.list_collection_names())
+    assigned = 0
+
+    for domain in domains:
+        if domain not in existing_collections:
+            continue
+        collection = db[domain]
+        collection.create_index(RANDOM_KEY)
+
+        updates = []
+        for article in collection.find({RANDOM_KEY: {"$exists": False}}, {"_id": 1}):
+            updates.append(UpdateOne({"_id": article["_id"]}, {"$set": {RANDOM_KEY: new_random_key()}}))
+            if len(updates) >= batch_size:
+                collection.bulk_write(updates, ordered=False)
+                assigned += len(updates)
+                updates = []
+        if updates:
+            collection.bulk_write(updates, ordered=False)
+            assigned += len(updates)
+
+    return assigned
+
+
+def range_branches(domain, pivot, limit):
+    """Two branches reading `limit` articles from the pivot onwards, wrapping around to 0"""
+    project = [{"$project": {"_id": 0}}, {"$addFields": {"domain": domain}}]
+    after_pivot = [
+        {"$match": {RANDOM_KEY: {"$gte": pivot}}},
+        {"$sort": {RANDOM_KEY: 1}},
+        {"$limit": limit}
+    ] + project
+    before_pivot = [
+        {"$match": {RANDOM_KEY: {"$lt": pivot}}},
+        {"$sort": {RANDOM_KEY: 1}},
+        {"$limit": limit}
+    ] + project
+    return [(domain, after_pivot), (domain, before_pivot)]
+
+
+def run_branches(db, branches):
+    """Run (collection, pipeline) branches as a single aggregation"""
+    first_domain, pipeline = branches[0]
+    pipeline = list(pipeline)
+    for domain, branch in branches[1:]:
+        pipeline.append({"$unionWith": {"coll": domain, "pipeline": branch}})
+    return list(db[first_domain].aggregate(pipeline))
+
+
+def fetch_limit(size, excluded):
+    """Articles to read from each side of the pivot for a quota of `size`"""
+    return size + max(MIN_OVERFETCH, min(size, len(excluded)))
+
+
+def sample_from_domains(db, quotas, exclude_ids=None):
+    """
+    Sample random articles from several domains.
+
+    quotas is a list of (domain, size) pairs, exclude_ids maps a domain to the
+    article ids it must not return. Articles come back grouped by domain in
+    quota order, with their domain field set.
+    """
+    exclude_ids = exclude_ids or {}
+    quotas = [(domain, size) for domain, size in quotas if size > 0]
+    if not quotas:
+        return []
+
+    # The same domain can appear more than once, so fill each quota separately
+    # while tracking every id handed out for that domain
+    taken = {domain: set(exclude_ids.get(domain, ())) for domain, _ in quotas}
+    results = [[] for _ in quotas]
+    pending = list(range(len(quotas)))
+
+    for _ in range(1 + MAX_TOP_UP_ROUNDS):
+        # One query reading candidates from a fresh random pivot in each domain
+        limits = {}
+        branches = []
+        for i in pending:
+            domain, size = quotas[i]
+            limit = fetch_limit(size - len(results[i]), taken[domain])
+            limits[domain] = limits.get(domain, 0) + limit
+            branches.extend(range_branches(domain, new_random_key(), limit))
+
+        candidates = {}
+        for article in run_branches(db, branches):
+            candidates.setdefault(article["domain"], []).append(article)
+        fetched = {domain: len(articles) for domain, articles in candidates.items()}
+
+        still_pending = []
+        for i in pending:
+            domain, size = quotas[i]
+            domain_candidates = candidates.get(domain, [])
+            while domain_candidates and len(results[i]) < size:
+                article = domain_candidates.pop(0)
+                if article["id"] in taken[domain]:
+                    continue
+                taken[domain].add(article["id"])
+                results[i].append(article)
+
+            # Fewer candidates than the limit means the whole collection was
+            # read, so only retry when more articles may exist
+            if len(results[i]) < size and fetched.get(domain, 0) >= limits[domain]:
+                still_pending.append(i)
+
+        pending = still_pending
+        if not pending:
+            break
+
+    # Pivots keep landing on excluded articles, so the user has seen most of
+    # the domain. Fall back to sampling whatever is left.
+    for i in pending:
+        domain, size = quotas[i]
+        leftover = list(db[domain].aggregate([
+            {"$match": {"id": {"$nin": list(taken[domain])}}},
+            {"$sample": {"size": size - len(results[i])}},
+            {"$project": {"_id": 0}},
+            {"$addFields": {"domain": domain}}
+        ]))
+        taken[domain].update(article["id"] for article in leftover)
+        results[i].extend(leftover)
+
+    return [article for domain_results in results for article in domain_results]
+
+
+def group_by_domain(articles):
+    """Split sampled articles back into per-domain lists"""
+    grouped = {}
+    for article in articles:
+        grouped.setdefault(article["domain"], []).append(article)
+    return grouped
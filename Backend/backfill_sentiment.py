@@ -0,0 +1,23 @@
+"""
+Store sentiment labels for comments that were never scored, and add them to the
+authors' profiles if the profiles don't count them yet.
+
+    python backfill_sentiment.py [batch_size]
+"""
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from sentimental import backfill_comment_sentiment
+
+if __name__ == '__main__':
+    load_dotenv()
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    
+    client = MongoClient(os.environ.get('MONGODB_URI'))
+    db = client.get_database("visionary")
+    
+    scored = backfill_comment_sentiment(db, batch_size=batch_size)
+    print(f"Stored sentiment for {scored} comments")
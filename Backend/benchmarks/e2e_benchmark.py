@@ -0,0 +1,269 @@
+"""
+Drive every route of the app and report throughput and latency per route.
+
+Needs a seeded local mongod, the Wikipedia stub and the app running against
+both:
+
+    BENCH_MONGODB_URI=mongodb://localhost:27017 python benchmarks/e2e_seed.py
+    python benchmarks/wikipedia_stub.py &
+    BENCH_MONGODB_URI=mongodb://localhost:27017 python benchmarks/e2e_server.py &
+    BENCH_URL=http://localhost:5000 python benchmarks/e2e_benchmark.py
+
+Each route gets BENCH_REQUESTS requests (scaled by the route's weight below)
+from BENCH_CONCURRENCY threads, for users and articles picked from the
+seeded database. Requests carry a random X-Forwarded-For unless
+BENCH_DISTINCT_IPS=0, so the per-IP rate limits don't turn the run into a
+429 benchmark; per-user limits still apply. The app only uses it because
+e2e_server.py runs it with TRUSTED_PROXY_HOPS=1, like behind one proxy.
+
+Results are written to BENCH_OUTPUT, by default
+benchmarks/results/e2e-<commit>.json. Pass a previous result as
+BENCH_COMPARE to print the change per route:
+
+    BENCH_COMPARE=benchmarks/results/e2e-4d13ddb.json python benchmarks/e2e_benchmark.py
+
+BENCH_ROUTES=search,wiki runs only the routes whose name contains one of
+the given strings.
+
+The Wikipedia routes are answered by the stub, and without recorded fixtures
+(see wikipedia_stub.py) those answers are synthetic. The results start with
+how many of the stub's answers were recorded and how many synthetic, and
+store the counts as "wikipedia". Routes that call Wikipedia are only
+comparable between runs with the same source.
+"""
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from pymongo import MongoClient
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from user_profiles import ALL_DOMAINS
+
+BASE_URL = os.environ.get('BENCH_URL', 'http://localhost:5000')
+MONGODB_URI = os.environ.get('BENCH_MONGODB_URI', 'mongodb://localhost:27017')
+REQUESTS = int(os.environ.get('BENCH_REQUESTS', 200))
+CONCURRENCY = int(os.environ.get('BENCH_CONCURRENCY', 8))
+DISTINCT_IPS = os.environ.get('BENCH_DISTINCT_IPS', '1') == '1'
+PASSWORD = os.environ.get('BENCH_PASSWORD', 'benchmark-password')
+ROUTE_FILTER = [name for name in os.environ.get('BENCH_ROUTES', '').split(',') if name]
+COMPARE = os.environ.get('BENCH_COMPARE')
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+OUTPUT = os.environ.get('BENCH_OUTPUT')
+STUB_URL = os.environ.get('BENCH_STUB_URL', f"http://127.0.0.1:{os.environ.get('BENCH_STUB_PORT', 5099)}")
+TIMEOUT = 120
+
+
+class Fixtures:
+    """Users and articles sampled from the seeded database"""
+
+    def __init__(self, db):
+        self.users = list(db.users.aggregate([
+            {"$sample": {"size": 200}},
+            {"$project": {"email": 1}}
+        ]))
+        self.articles = []
+        for domain in ALL_DOMAINS:
+            self.articles += [(domain, article["id"], article["title"])
+                              for article in db[domain].aggregate([
+                                  {"$sample": {"size": 50}},
+                                  {"$project": {"_id": 0, "id": 1, "title": 1}}
+                              ])]
+        if not self.users or not self.articles:
+            sys.exit("The database has no users or articles, run benchmarks/e2e_seed.py first")
+
+    def user_id(self):
+        return str(random.choice(self.users)["_id"])
+
+    def email(self):
+        return random.choice(self.users)["email"]
+
+    def article(self):
+        return random.choice(self.articles)
+
+    def query(self):
+        return random.choice(self.articles)[2].rsplit(" ", 1)[0]
+
+
+# (name, weight, build(fixtures) -> (method, path, json body)). Weights scale
+# BENCH_REQUESTS for routes too slow or too rate-limited to run as often.
+ROUTES = [
+    ("GET /wiki", 0.1, lambda f: ("GET", f"/wiki?topic={f.query()}", None)),
+    ("GET /wiki/topics", 0.25, lambda f: ("GET", "/wiki/topics", None)),
+    ("GET /wiki/random", 0.1, lambda f: ("GET", "/wiki/random", None)),
+    ("GET /wiki/trending", 1, lambda f: ("GET", f"/wiki/trending?window={random.choice([1, 7, 30])}", None)),
+    ("POST /signup", 0.25, lambda f: ("POST", "/signup", {
+        "fullName": "Benchmark Signup",
+        "email": f"bench-signup-{uuid.uuid4().hex}@example.com",
+        "phone": uuid.uuid4().hex[:12],
+        "password": PASSWORD,
+        "interestedDomains": random.sample(ALL_DOMAINS, 3)
+    })),
+    ("POST /login", 0.25, lambda f: ("POST", "/login", {"email": f.email(), "password": PASSWORD})),
+    ("POST /login slim", 0.25, lambda f: ("POST", "/login", {"email": f.email(), "password": PASSWORD,
+                                                             "slim": True})),
+    ("POST /user/domains", 1, lambda f: ("POST", "/user/domains", {
+        "userId": f.user_id(), "domains": random.sample(ALL_DOMAINS, 3)})),
+    ("POST /populate-domains", 0.01, lambda f: ("POST", "/populate-domains", None)),
+    ("GET /domains/<domain>/articles", 1, lambda f: ("GET", f"/domains/{f.article()[0]}/articles", None)),
+    ("GET /domains/<domain>/articles/<article_id>", 1,
+     lambda f: ("GET", "/domains/{}/articles/{}".format(*f.article()[:2]), None)),
+    ("POST /domains/<domain>/articles/<article_id>/like/<user_id>", 1,
+     lambda f: ("POST", "/domains/{}/articles/{}/like/{}".format(*f.article()[:2], f.user_id()), None)),
+    ("POST /domains/<domain>/articles/<article_id>/comment", 1,
+     lambda f: ("POST", "/domains/{}/articles/{}/comment".format(*f.article()[:2]),
+                {"userId": f.user_id(), "comment": random.choice(["Loved it", "Awful", "Interesting"])})),
+    ("GET /domains/<domain>/articles/<article_id>/comments", 1,
+     lambda f: ("GET", "/domains/{}/articles/{}/comments".format(*f.article()[:2]), None)),
+    ("POST /domains/<domain>/articles/<article_id>/share", 1,
+     lambda f: ("POST", "/domains/{}/articles/{}/share".format(*f.article()[:2]),
+                {"userId": f.user_id(), "sharedTo": "public"})),
+    ("GET /user/<user_id>/interactions", 1, lambda f: ("GET", f"/user/{f.user_id()}/interactions", None)),
+    ("GET /user/<user_id>/interactions/history", 1,
+     lambda f: ("GET", f"/user/{f.user_id()}/interactions/history?type=likedArticles", None)),
+    ("GET /user/<user_id>/bert-recommendations-test", 0.05,
+     lambda f: ("GET", f"/user/{f.user_id()}/bert-recommendations-test", None)),
+    ("GET /user/<user_id>/bert-recommendations", 0.5,
+     lambda f: ("GET", f"/user/{f.user_id()}/bert-recommendations", None)),
+    ("GET /user/<user_id>/standard-recommendations", 1,
+     lambda f: ("GET", f"/user/{f.user_id()}/standard-recommendations", None)),
+    ("GET /articles/trending", 1, lambda f: ("GET", "/articles/trending", None)),
+    ("GET /search", 1, lambda f: ("GET", f"/search?query={f.query()}", None)),
+    ("GET /search local", 1, lambda f: ("GET", f"/search?query={f.query()}&source=local", None)),
+    ("GET /search/suggest", 1, lambda f: ("GET", f"/search/suggest?prefix={f.query()[:3]}", None)),
+    ("GET /cache/stats", 1, lambda f: ("GET", "/cache/stats", None)),
+    ("GET /metrics", 0.25, lambda f: ("GET", "/metrics", None)),
+]
+
+sessions = threading.local()
+
+
+def send(fixtures, build):
+    if not hasattr(sessions, "session"):
+        sessions.session = requests.Session()
+    method, path, body = build(fixtures)
+    headers = {}
+    if DISTINCT_IPS:
+        headers["X-Forwarded-For"] = f"10.{random.randrange(256)}.{random.randrange(256)}.{random.randrange(256)}"
+
+    start = time.perf_counter()
+    try:
+        status = sessions.session.request(method, f"{BASE_URL}{path}", json=body, headers=headers,
+                                          timeout=TIMEOUT).status_code
+    except requests.RequestException:
+        status = "error"
+    return status, (time.perf_counter() - start) * 1000
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def run_route(fixtures, build, count):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(lambda _: send(fixtures, build), range(count)))
+    elapsed = time.perf_counter() - start
+
+    timings = sorted(elapsed_ms for _, elapsed_ms in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": count,
+        "throughput": count / elapsed,
+        "p50": statistics.median(timings),
+        "p95": percentile(timings, 0.95),
+        "p99": percentile(timings, 0.99),
+        "statuses": statuses
+    }
+
+
+def commit_id():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def change(result, before, key):
+    return (result[key] - before[key]) / before[key] * 100 if before[key] else 0
+
+
+def stub_stats():
+    """The stub's answers per source so far, or None if it can't be reached"""
+    try:
+        return requests.get(f"{STUB_URL}/__stats", timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def wikipedia_sources(before, after):
+    if before is None or after is None:
+        return None
+    return {source: after[source] - before.get(source, 0) for source in after}
+
+
+def print_sources(sources):
+    if sources is None:
+        print(f"Wikipedia answers: unknown, the stub at {STUB_URL} didn't report them")
+        return
+    recorded = sources.get("fixture", 0) + sources.get("recorded", 0)
+    print(f"Wikipedia answers: {recorded} recorded, {sources.get('synthetic', 0)} synthetic")
+    if sources.get("synthetic"):
+        print("Routes calling Wikipedia were measured against synthetic data, not recorded responses")
+
+
+def print_results(results, baseline):
+    print(f"{'route':<58} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for name, result in results.items():
+        print(f"{name:<58} {result['throughput']:>8.1f} {result['p50']:>9.1f} {result['p95']:>9.1f} "
+              f"{result['p99']:>9.1f}  {result['statuses']}")
+        before = baseline.get(name)
+        if before:
+            print(f"{'  vs baseline':<58} {change(result, before, 'throughput'):>+7.0f}% "
+                  f"{change(result, before, 'p50'):>+8.0f}% {change(result, before, 'p95'):>+8.0f}% "
+                  f"{change(result, before, 'p99'):>+8.0f}%")
+
+
+def main():
+    fixtures = Fixtures(MongoClient(MONGODB_URI).visionary)
+    baseline = {}
+    if COMPARE:
+        with open(COMPARE) as f:
+            baseline = json.load(f)["routes"]
+
+    stats_before = stub_stats()
+    results = {}
+    for name, weight, build in ROUTES:
+        if ROUTE_FILTER and not any(part in name for part in ROUTE_FILTER):
+            continue
+        results[name] = run_route(fixtures, build, max(1, int(REQUESTS * weight)))
+        print(f"{name}: {results[name]['p50']:.1f} ms p50", file=sys.stderr)
+
+    sources = wikipedia_sources(stats_before, stub_stats())
+    print_sources(sources)
+    print_results(results, baseline)
+
+    path = OUTPUT or os.path.join(RESULTS_DIR, f"e2e-{commit_id()}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"commit": commit_id(), "concurrency": CONCURRENCY, "requests": REQUESTS,
+                   "wikipedia": sources, "routes": results}, f, indent=2)
+    print(f"Results written to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Seed a local mongod with synthetic data for e2e_benchmark.py.
+
+Fills the app's `visionary` database with articles in every domain
+collection, users with long-tailed interaction histories, and comments on
+the articles they commented on. Every user's password is BENCH_PASSWORD.
+
+The database is dropped first, so this only runs against localhost and
+refuses to touch a database it didn't seed itself unless BENCH_FORCE=1.
+
+    BENCH_MONGODB_URI=mongodb://localhost:27017 BENCH_USERS=500 python benchmarks/e2e_seed.py
+"""
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from bson.objectid import ObjectId
+from flask_bcrypt import generate_password_hash
+from pymongo import MongoClient
+
+from article_sampling import new_random_key
+from password_service import BCRYPT_ROUNDS
+from user_profiles import ALL_DOMAINS
+
+MONGODB_URI = os.environ.get('BENCH_MONGODB_URI', 'mongodb://localhost:27017')
+DATABASE_NAME = 'visionary'
+ARTICLES_PER_DOMAIN = int(os.environ.get('BENCH_ARTICLES_PER_DOMAIN', 2000))
+USERS = int(os.environ.get('BENCH_USERS', 200))
+# Median interactions per user, the heaviest users have about 50x as many
+INTERACTIONS = int(os.environ.get('BENCH_INTERACTIONS', 50))
+MAX_INTERACTIONS = int(os.environ.get('BENCH_MAX_INTERACTIONS', 100_000))
+PASSWORD = os.environ.get('BENCH_PASSWORD', 'benchmark-password')
+FORCE = os.environ.get('BENCH_FORCE') == '1'
+SEED = int(os.environ.get('BENCH_SEED', 42))
+
+SEED_MARKER = {"_id": "benchmark_seed"}
+
+WORDS = ["solar", "river", "quantum", "election", "festival", "forest", "robot", "galaxy", "recipe",
+         "climate", "museum", "vaccine", "orbit", "novel", "protest", "harvest", "satellite", "ocean",
+         "algorithm", "cinema", "mountain", "parliament", "telescope", "bakery", "volcano", "neuron"]
+COMMENTS = ["I love this article", "This is terrible and wrong", "Interesting read, thanks",
+            "Not sure about this", "Great explanation of a hard topic", "Boring"]
+
+
+def check_target(db):
+    host = urlsplit(MONGODB_URI).hostname
+    if host not in ("localhost", "127.0.0.1", "::1") and not FORCE:
+        sys.exit(f"Refusing to seed {host}, the database is dropped first. Set BENCH_FORCE=1 to override.")
+    if db.users.estimated_document_count() and not db.app_settings.find_one(SEED_MARKER) and not FORCE:
+        sys.exit(f"{DATABASE_NAME} has users that weren't seeded by this script. Set BENCH_FORCE=1 to drop them.")
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def article_id(domain_index, i):
+    return domain_index * 10_000_000 + i
+
+
+def seed_articles(db, rng, now):
+    for d, domain in enumerate(ALL_DOMAINS):
+        db[domain].insert_many([{
+            "id": article_id(d, i),
+            "title": f"{words(rng, rng.randint(1, 3)).title()} {i}",
+            "summary": f"{words(rng, 40)}.",
+            "sections": [{"title": words(rng, 2).title(), "content": words(rng, 50)}
+                         for _ in range(rng.randint(2, 5))],
+            "url": f"https://en.wikipedia.org/wiki/{domain}_{i}",
+            "image_url": None,
+            "likes": 0,
+            "comments": [],
+            "random_key": new_random_key(),
+            "created_at": now - timedelta(minutes=rng.randrange(60 * 24 * 90))
+        } for i in range(ARTICLES_PER_DOMAIN)], ordered=False)
+        db[domain].create_index("id")
+
+
+def interaction_count(rng):
+    # Pareto-distributed, so a few users have very long histories
+    return min(MAX_INTERACTIONS, int(INTERACTIONS * 0.5 * rng.paretovariate(1.0)))
+
+
+def seed_users(db, rng, now):
+    password_hash = generate_password_hash(PASSWORD, BCRYPT_ROUNDS).decode('utf-8')
+    likes = {}
+    comments = {}
+
+    users = []
+    for u in range(USERS):
+        user = {
+            "_id": ObjectId(),
+            "fullName": f"Benchmark User {u}",
+            "email": f"bench-user-{u}@example.com",
+            "phone": f"555{u:07d}",
+            "password": password_hash,
+            "bio": "",
+            "interestedDomains": rng.sample(ALL_DOMAINS, 3),
+            "likedArticles": [],
+            "commentedArticles": [],
+            "sharedArticles": []
+        }
+        for n in range(interaction_count(rng)):
+            d = rng.randrange(len(ALL_DOMAINS))
+            domain = ALL_DOMAINS[d]
+            aid = article_id(d, rng.randrange(ARTICLES_PER_DOMAIN))
+            at = now - timedelta(minutes=n)
+            item = {"articleId": aid, "domain": domain, "articleTitle": f"Article {aid}"}
+            kind = rng.random()
+            if kind < 0.7:
+                if user["_id"] in likes.get((domain, aid), ()):
+                    continue
+                likes.setdefault((domain, aid), set()).add(user["_id"])
+                user["likedArticles"].append(dict(item, likedAt=at))
+            elif kind < 0.9:
+                text = rng.choice(COMMENTS)
+                comment_id = str(uuid.uuid4())
+                comments.setdefault((domain, aid), []).append({
+                    "id": comment_id, "user_id": str(user["_id"]), "user_name": user["fullName"],
+                    "text": text, "timestamp": at
+                })
+                user["commentedArticles"].append(dict(item, commentId=comment_id, commentText=text,
+                                                      commentedAt=at))
+            else:
+                user["sharedArticles"].append(dict(item, sharedAt=at, sharedTo="public"))
+
+        # Interactions are appended as they happen, oldest first
+        for kind in ("likedArticles", "commentedArticles", "sharedArticles"):
+            user[kind].reverse()
+        users.append(user)
+
+    for start in range(0, len(users), 100):
+        db.users.insert_many(users[start:start + 100], ordered=False)
+    db.users.create_index("email", unique=True)
+    db.users.create_index("phone", unique=True)
+
+    for (domain, aid), user_ids in likes.items():
+        db[domain].update_one({"id": aid}, {"$set": {"likes": len(user_ids)}})
+    for (domain, aid), article_comments in comments.items():
+        db[domain].update_one({"id": aid}, {"$push": {"comments": {"$each": article_comments}}})
+
+    return sum(len(u["likedArticles"]) + len(u["commentedArticles"]) + len(u["sharedArticles"]) for u in users)
+
+
+def main():
+    db = MongoClient(MONGODB_URI)[DATABASE_NAME]
+    check_target(db)
+
+    rng = random.Random(SEED)
+    now = datetime.now()
+    start = time.perf_counter()
+    db.client.drop_database(DATABASE_NAME)
+    db.app_settings.insert_one(dict(SEED_MARKER, seededAt=now, users=USERS,
+                                    articlesPerDomain=ARTICLES_PER_DOMAIN, interactions=INTERACTIONS))
+
+    seed_articles(db, rng, now)
+    interactions = seed_users(db, rng, now)
+    print(f"Seeded {ARTICLES_PER_DOMAIN} articles x {len(ALL_DOMAINS)} domains, {USERS} users and "
+          f"{interactions} interactions in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Run the app for e2e_benchmark.py, with Wikipedia replaced by the local stub.
+
+Outgoing requests to *.wikipedia.org and wikimedia.org, including the ones
+made inside the wikipedia and wikipediaapi libraries, are rewritten to
+wikipedia_stub.py before they leave the process. Both requests and httpx
+are covered, since newer wikipediaapi releases use httpx. The app then runs
+under gunicorn with gunicorn_config.py, like in production, or under the
+Flask development server when gunicorn isn't installed. It trusts one proxy
+hop (TRUSTED_PROXY_HOPS=1) so the benchmark's X-Forwarded-For addresses are
+used as client IPs.
+
+    BENCH_MONGODB_URI=mongodb://localhost:27017 python benchmarks/e2e_server.py
+"""
+import os
+import runpy
+import sys
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+STUB_URL = os.environ.get('BENCH_STUB_URL', f"http://127.0.0.1:{os.environ.get('BENCH_STUB_PORT', 5099)}")
+STUBBED_HOSTS = ("wikipedia.org", "wikimedia.org")
+WORKERS = os.environ.get('BENCH_WORKERS')
+THREADS = os.environ.get('BENCH_THREADS')
+
+original_send = HTTPAdapter.send
+
+
+def stub_url(url):
+    """The stub's URL for a request to a Wikipedia host, or None for any other host"""
+    url = urlsplit(url)
+    if url.hostname and url.hostname.endswith(STUBBED_HOSTS):
+        return f"{STUB_URL}/{url.hostname}{url.path}" + (f"?{url.query}" if url.query else "")
+    return None
+
+
+def send_to_stub(self, request, *args, **kwargs):
+    request.url = stub_url(request.url) or request.url
+    return original_send(self, request, *args, **kwargs)
+
+
+def redirect_httpx():
+    try:
+        import httpx
+    except ImportError:
+        return
+    original_handle_request = httpx.HTTPTransport.handle_request
+
+    def handle_request_with_stub(self, request):
+        url = stub_url(str(request.url))
+        if url:
+            request.url = httpx.URL(url)
+        return original_handle_request(self, request)
+
+    httpx.HTTPTransport.handle_request = handle_request_with_stub
+
+
+def run_gunicorn():
+    from gunicorn.app.base import BaseApplication
+
+    class BenchmarkServer(BaseApplication):
+        def load_config(self):
+            settings = runpy.run_path(os.path.join(BACKEND_DIR, "gunicorn_config.py"))
+            for key, value in settings.items():
+                if key in self.cfg.settings:
+                    self.cfg.set(key, value)
+            if WORKERS:
+                self.cfg.set("workers", int(WORKERS))
+            if THREADS:
+                self.cfg.set("threads", int(THREADS))
+
+        def load(self):
+            # Imported in each worker, which inherits the redirect through fork
+            from app import app
+            return app
+
+    BenchmarkServer().run()
+
+
+def main():
+    os.environ['MONGODB_URI'] = os.environ.get('BENCH_MONGODB_URI', 'mongodb://localhost:27017')
+    # e2e_benchmark.py plays the proxy and forwards a random client address per request
+    os.environ.setdefault('TRUSTED_PROXY_HOPS', '1')
+    HTTPAdapter.send = send_to_stub
+    redirect_httpx()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("gunicorn isn't installed, using the Flask development server")
+        from app import app
+        app.run(host='127.0.0.1', port=int(os.environ.get('PORT', 5000)), threaded=True)
+        return
+    run_gunicorn()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Measure feed latency while the server handles a burst of logins.
+
+Run against a running server, e.g. `gunicorn -c gunicorn_config.py app:app`.
+Signs up a throwaway user, then requests its standard recommendations in a
+loop, first on their own and then while BENCH_LOGINS concurrent logins hit
+/login. With bcrypt on the hashing pool the feed p99 should stay close to
+the baseline, and logins beyond the pool's queue get 503s instead of piling
+up.
+
+    BENCH_URL=http://localhost:5000 python benchmarks/login_burst_benchmark.py
+"""
+import os
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = os.environ.get('BENCH_URL', 'http://localhost:5000')
+LOGINS = int(os.environ.get('BENCH_LOGINS', 200))
+LOGIN_CONCURRENCY = int(os.environ.get('BENCH_LOGIN_CONCURRENCY', 32))
+FEED_REQUESTS = int(os.environ.get('BENCH_FEED_REQUESTS', 100))
+PASSWORD = "benchmark-password"
+
+
+def create_user():
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    response = requests.post(f"{BASE_URL}/signup", json={
+        "fullName": "Benchmark User",
+        "email": email,
+        "phone": uuid.uuid4().hex[:10],
+        "password": PASSWORD,
+        "interestedDomains": ["science", "space"]
+    }, timeout=30)
+    response.raise_for_status()
+    return email, response.json()["userId"]
+
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def measure_feed(user_id, stop=None):
+    """Feed latencies in ms, until FEED_REQUESTS are done or stop is set"""
+    timings = []
+    session = requests.Session()
+    while len(timings) < FEED_REQUESTS and not (stop and stop.is_set()):
+        start = time.perf_counter()
+        session.get(f"{BASE_URL}/user/{user_id}/standard-recommendations", timeout=60)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def login(email):
+    start = time.perf_counter()
+    response = requests.post(f"{BASE_URL}/login", json={"email": email, "password": PASSWORD}, timeout=60)
+    return response.status_code, (time.perf_counter() - start) * 1000
+
+
+def report(name, timings):
+    print(f"{name:<24} {len(timings):>6} {statistics.median(timings):>9.1f} "
+          f"{percentile(timings, 0.99):>9.1f} {max(timings):>9.1f}")
+
+
+def main():
+    email, user_id = create_user()
+    # Warm the user's feed so both phases measure the same cached path
+    requests.get(f"{BASE_URL}/user/{user_id}/standard-recommendations", timeout=60)
+
+    print(f"{'phase':<24} {'count':>6} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    report("feed, idle", measure_feed(user_id))
+
+    stop = threading.Event()
+    feed_timings = []
+    feed_thread = threading.Thread(target=lambda: feed_timings.extend(measure_feed(user_id, stop)))
+    feed_thread.start()
+
+    with ThreadPoolExecutor(max_workers=LOGIN_CONCURRENCY) as executor:
+        login_results = list(executor.map(login, [email] * LOGINS))
+    stop.set()
+    feed_thread.join()
+
+    report("feed, during logins", feed_timings)
+    report("login", [elapsed for _, elapsed in login_results])
+
+    statuses = {}
+    for status, _ in login_results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"login status codes: {statuses}")
+
+
+if __name__ == '__main__':
+    main()
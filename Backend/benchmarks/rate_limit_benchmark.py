@@ -0,0 +1,87 @@
+"""
+Measure cheap-route latency while an expensive route is flooded.
+
+Run against a running server, e.g. `gunicorn -c gunicorn_config.py app:app`.
+Requests /articles/trending in a loop, first on its own and then while
+BENCH_FLOOD_CONCURRENCY threads hammer BENCH_FLOOD_PATH. With the rate
+limiter in place most of the flood is answered 429 straight from the token
+bucket, so the cheap route's p99 should stay close to the baseline.
+
+    BENCH_URL=http://localhost:5000 python benchmarks/rate_limit_benchmark.py
+"""
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = os.environ.get('BENCH_URL', 'http://localhost:5000')
+FLOOD_PATH = os.environ.get('BENCH_FLOOD_PATH', '/wiki/random')
+FLOOD_REQUESTS = int(os.environ.get('BENCH_FLOOD_REQUESTS', 500))
+FLOOD_CONCURRENCY = int(os.environ.get('BENCH_FLOOD_CONCURRENCY', 32))
+CHEAP_PATH = os.environ.get('BENCH_CHEAP_PATH', '/articles/trending')
+CHEAP_REQUESTS = int(os.environ.get('BENCH_CHEAP_REQUESTS', 200))
+
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def measure_cheap(stop=None):
+    """Cheap route latencies in ms, until CHEAP_REQUESTS are done or stop is set"""
+    timings = []
+    session = requests.Session()
+    while len(timings) < CHEAP_REQUESTS and not (stop and stop.is_set()):
+        start = time.perf_counter()
+        session.get(f"{BASE_URL}{CHEAP_PATH}", timeout=60)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def flood(_):
+    start = time.perf_counter()
+    method = requests.post if FLOOD_PATH == '/populate-domains' else requests.get
+    response = method(f"{BASE_URL}{FLOOD_PATH}", timeout=120)
+    return response.status_code, response.headers.get("Retry-After"), (time.perf_counter() - start) * 1000
+
+
+def report(name, timings):
+    print(f"{name:<28} {len(timings):>6} {statistics.median(timings):>9.1f} "
+          f"{percentile(timings, 0.99):>9.1f} {max(timings):>9.1f}")
+
+
+def main():
+    # Warm the cheap route so both phases measure the same cached path
+    requests.get(f"{BASE_URL}{CHEAP_PATH}", timeout=60)
+
+    print(f"{'phase':<28} {'count':>6} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    report(f"{CHEAP_PATH}, idle", measure_cheap())
+
+    stop = threading.Event()
+    cheap_timings = []
+    cheap_thread = threading.Thread(target=lambda: cheap_timings.extend(measure_cheap(stop)))
+    cheap_thread.start()
+
+    with ThreadPoolExecutor(max_workers=FLOOD_CONCURRENCY) as executor:
+        flood_results = list(executor.map(flood, range(FLOOD_REQUESTS)))
+    stop.set()
+    cheap_thread.join()
+
+    report(f"{CHEAP_PATH}, during flood", cheap_timings)
+    report(f"{FLOOD_PATH}, allowed", [elapsed for status, _, elapsed in flood_results if status != 429] or [0])
+    report(f"{FLOOD_PATH}, throttled", [elapsed for status, _, elapsed in flood_results if status == 429] or [0])
+
+    statuses = {}
+    for status, _, _ in flood_results:
+        statuses[status] = statuses.get(status, 0) + 1
+    retry_after = sorted({int(value) for _, value, _ in flood_results if value})
+    print(f"{FLOOD_PATH} status codes: {statuses}")
+    if retry_after:
+        print(f"Retry-After range: {retry_after[0]}s - {retry_after[-1]}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""
+Micro-benchmarks for the CPU-side recommendation, scoring and trending code.
+
+Runs the pure functions behind the standard recommendations, sentiment
+scoring and trending rankings on synthetic inputs of increasing size, with
+no database or network. Run from anywhere:
+
+    python benchmarks/recommendation_microbenchmark.py
+    BENCH_SIZES=1000,10000 BENCH_CASES=profile,exclusions python benchmarks/recommendation_microbenchmark.py
+
+Sizes are interactions in a user's history, texts scored or titles per
+trending day (BENCH_SIZES, default 10 up to 100k). Every case is timed like
+pytest-benchmark: a call is repeated enough times for one round to last at
+least a millisecond, and rounds run until BENCH_MIN_TIME seconds (at least
+BENCH_MIN_ROUNDS). The table shows min, median and ops/s per call.
+
+Each sized case also gets a scaling exponent, the slope of log(median) over
+log(size) from 1000 up, where constant overhead no longer dominates: about
+1 for linear work, 2 for quadratic. A case above BENCH_MAX_EXPONENT is
+reported as super-linear and the script exits with status 1, so a
+complexity regression such as deduplicating against a list instead of a set
+shows up even when the sizes used in production are still fast. Constant
+factor regressions, like rebuilding the exclusion sets once per domain,
+show up in the comparison with a baseline instead.
+
+Results are written to BENCH_OUTPUT, by default
+benchmarks/results/micro-<commit>.json, and BENCH_COMPARE takes a previous
+result to print the change per case.
+"""
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+# sentimental.py loads its pickles relative to the working directory
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from article_sampling import interacted_ids_by_domain
+from pageview_window import PageviewWindow
+from recommendation_plan import (domain_percentiles, dominant_domains, score_quotas, even_quotas,
+                                 label_sampled, with_recommended, unique_by_id)
+from sentimental import preprocess_text, analyze_sentiment, analyze_sentiment_batch
+from topic_matcher import get_classifier
+from user_profiles import ALL_DOMAINS, profile_from_history, profile_domain_scores, comment_updates
+
+SIZES = [int(size) for size in os.environ.get('BENCH_SIZES', '10,100,1000,10000,100000').split(',')]
+CASE_FILTER = [name for name in os.environ.get('BENCH_CASES', '').split(',') if name]
+MIN_TIME = float(os.environ.get('BENCH_MIN_TIME', 0.2))
+MIN_ROUNDS = int(os.environ.get('BENCH_MIN_ROUNDS', 5))
+MAX_EXPONENT = float(os.environ.get('BENCH_MAX_EXPONENT', 1.3))
+COMPARE = os.environ.get('BENCH_COMPARE')
+OUTPUT = os.environ.get('BENCH_OUTPUT')
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+SEED = int(os.environ.get('BENCH_SEED', 42))
+# Smallest size used for the scaling exponent
+SCALING_FROM = 1000
+# Minimum duration of one timed round
+ROUND_TIME = 0.001
+
+WORDS = ["solar", "river", "quantum", "election", "festival", "forest", "robot", "galaxy", "recipe",
+         "climate", "museum", "vaccine", "orbit", "novel", "protest", "harvest", "satellite", "ocean",
+         "india", "cricket", "mumbai", "london", "premier", "league", "algorithm", "cinema"]
+COMMENTS = ["I love this article, it was really informative!", "This is terrible and completely wrong.",
+            "Interesting read about the history of the region.", "Not sure I agree with the second section :(",
+            "Great facts, thanks for sharing 100%", "Boring. Nothing new here."]
+# Articles sampled per domain in a 40-article feed
+ARTICLES_PER_DOMAIN = 4
+TRENDING_DAYS = 30
+
+
+# Synthetic inputs
+
+def synthetic_history(size, rng, labelled=True):
+    """A user with `size` interactions: 70% likes, 20% comments, 10% shares, skewed to a few domains"""
+    weights = [2 ** -i for i in range(len(ALL_DOMAINS))]
+    user = {"_id": "bench-user", "likedArticles": [], "commentedArticles": [], "sharedArticles": []}
+    for n in range(size):
+        domain = rng.choices(ALL_DOMAINS, weights)[0]
+        item = {"articleId": rng.randrange(size * 2), "domain": domain, "articleTitle": f"Article {n}"}
+        kind = rng.random()
+        if kind < 0.7:
+            user["likedArticles"].append(item)
+        elif kind < 0.9:
+            item["commentText"] = rng.choice(COMMENTS)
+            if labelled:
+                item["sentiment"] = rng.choice([-1, 0, 1])
+            user["commentedArticles"].append(item)
+        else:
+            user["sharedArticles"].append(item)
+    return user
+
+
+def synthetic_articles(size, rng):
+    return [{"id": rng.randrange(size), "domain": rng.choice(ALL_DOMAINS), "title": f"Article {i}"}
+            for i in range(size)]
+
+
+def synthetic_texts(size, rng):
+    return [rng.choice(COMMENTS) for _ in range(size)]
+
+
+def synthetic_topics(size, rng, day=0):
+    # Titles overlap between days, like a real top list, and views fall with rank
+    return [{"title": " ".join(rng.choice(WORDS) for _ in range(3)) + f" {rng.randrange(size * 2)}",
+             "views": 5_000_000 // (rank + 1 + day)}
+            for rank in range(size)]
+
+
+def filled_window(size, rng):
+    window = PageviewWindow(TRENDING_DAYS)
+    first = date(2025, 1, 1)
+    for day in range(TRENDING_DAYS):
+        window.add_day(first + timedelta(days=day), synthetic_topics(size, rng, day))
+    return window
+
+
+def plan_feed(domain_scores, existing_collections):
+    """The planning part of build_standard_recommendations for one user"""
+    percentiles = domain_percentiles(domain_scores)
+    high = dominant_domains(percentiles)
+    score_counts = score_quotas(percentiles, existing_collections, 30)
+    low = [d for d in domain_scores if d not in high and d in existing_collections]
+    random_counts = dict(even_quotas(low, 10))
+    return percentiles, score_counts, random_counts
+
+
+def sampled_feed(rng, size):
+    return {domain: [{"id": rng.randrange(size), "domain": domain} for _ in range(ARTICLES_PER_DOMAIN)]
+            for domain in ALL_DOMAINS}
+
+
+# Cases: (name, sizes, setup(size, rng) -> fn). Setup isn't timed. Cases
+# with sizes=None run once at a fixed size since their input doesn't grow
+# with the user's history.
+
+def case_exclusions(size, rng):
+    user = synthetic_history(size, rng)
+    return lambda: interacted_ids_by_domain(user)
+
+
+def case_profile(size, rng):
+    user = synthetic_history(size, rng)
+    return lambda: profile_domain_scores(profile_from_history(user, analyze_sentiment_batch))
+
+
+def case_profile_unlabelled(size, rng):
+    user = synthetic_history(size, rng, labelled=False)
+    return lambda: profile_from_history(user, analyze_sentiment_batch)
+
+
+def case_fallback_exclusions(size, rng):
+    excluded_ids = interacted_ids_by_domain(synthetic_history(size, rng))
+    recommended = synthetic_articles(40, rng)
+    return lambda: with_recommended(excluded_ids, recommended)
+
+
+def case_dedupe(size, rng):
+    articles = synthetic_articles(size, rng)
+    return lambda: unique_by_id(articles)[:40]
+
+
+def case_comment_updates(size, rng):
+    comments = [{"userId": f"user-{rng.randrange(max(1, size // 10))}", "domain": rng.choice(ALL_DOMAINS)}
+                for _ in range(size)]
+    labels = [rng.choice([-1, 0, 1]) for _ in range(size)]
+    return lambda: comment_updates(comments, labels)
+
+
+def case_plan(size, rng):
+    profile = profile_from_history(synthetic_history(1000, rng), analyze_sentiment_batch)
+    domain_scores = profile_domain_scores(profile)
+    existing_collections = set(ALL_DOMAINS)
+    return lambda: plan_feed(domain_scores, existing_collections)
+
+
+def case_label(size, rng):
+    domain_scores = profile_domain_scores(profile_from_history(synthetic_history(1000, rng), analyze_sentiment_batch))
+    percentiles, score_counts, _ = plan_feed(domain_scores, set(ALL_DOMAINS))
+    # Labelling only sets fields, so the same sample can be labelled on every call
+    sampled = sampled_feed(rng, 1000)
+    return lambda: label_sampled(sampled, score_counts, percentiles)
+
+
+def case_preprocess(size, rng):
+    texts = synthetic_texts(size, rng)
+    return lambda: [preprocess_text(text) for text in texts]
+
+
+def case_sentiment(size, rng):
+    texts = synthetic_texts(size, rng)
+    return lambda: [analyze_sentiment(text) for text in texts]
+
+
+def case_sentiment_batch(size, rng):
+    texts = synthetic_texts(size, rng)
+    return lambda: analyze_sentiment_batch(texts)
+
+
+def case_trending_add_day(size, rng):
+    window = filled_window(size, rng)
+    topics = synthetic_topics(size, rng, TRENDING_DAYS)
+    next_day = date(2025, 1, 1) + timedelta(days=TRENDING_DAYS)
+    # Re-adding the same newest day overwrites its slot, so every call does the same work
+    window.add_day(next_day, topics)
+    return lambda: window.add_day(next_day, topics)
+
+
+def case_trending_views(size, rng):
+    window = filled_window(size, rng)
+    return lambda: window.ranking(7, sort="views")
+
+
+def case_trending_velocity(size, rng):
+    window = filled_window(size, rng)
+    return lambda: window.ranking(7, sort="velocity")
+
+
+def case_trending_partition(size, rng):
+    classifier = get_classifier()
+    topics = synthetic_topics(size, rng)
+    return lambda: classifier.partition(topics)
+
+
+# The per-call sentiment path and the trending windows are too slow at 100k to repeat
+SMALLER = [size for size in SIZES if size <= 10000]
+
+CASES = [
+    ("exclusions interacted_ids_by_domain", SIZES, case_exclusions),
+    ("profile from history", SIZES, case_profile),
+    ("profile from history, unlabelled comments", SIZES, case_profile_unlabelled),
+    ("fallback exclusions", SIZES, case_fallback_exclusions),
+    ("dedupe unique_by_id", SIZES, case_dedupe),
+    ("comment_updates", SIZES, case_comment_updates),
+    ("plan percentiles and quotas", None, case_plan),
+    ("label sampled articles", None, case_label),
+    ("sentiment preprocess_text", SIZES, case_preprocess),
+    ("sentiment analyze_sentiment", SMALLER, case_sentiment),
+    ("sentiment analyze_sentiment_batch", SIZES, case_sentiment_batch),
+    ("trending add_day", SMALLER, case_trending_add_day),
+    ("trending ranking views", SMALLER, case_trending_views),
+    ("trending ranking velocity", SMALLER, case_trending_velocity),
+    ("trending partition", SIZES, case_trending_partition),
+]
+
+
+# Timing
+
+def calibrate(fn):
+    """Calls per round so that a round lasts at least ROUND_TIME"""
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        if time.perf_counter() - start >= ROUND_TIME:
+            return iterations
+        iterations *= 10
+
+
+def bench(fn):
+    """Per-call timings in seconds: min, median and ops/s over the rounds"""
+    iterations = calibrate(fn)
+    timings = []
+    deadline = time.perf_counter() + MIN_TIME
+    while len(timings) < MIN_ROUNDS or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        timings.append((time.perf_counter() - start) / iterations)
+    median = statistics.median(timings)
+    return {"min": min(timings), "median": median, "ops": 1 / median if median else 0,
+            "rounds": len(timings), "iterations": iterations}
+
+
+def scaling_exponent(results):
+    """Least-squares slope of log(median) over log(size), for sizes from SCALING_FROM up"""
+    points = [(math.log(size), math.log(result["median"])) for size, result in results.items()
+              if size >= SCALING_FROM and result["median"] > 0]
+    if len(points) < 2:
+        return None
+    mean_x = statistics.mean(x for x, _ in points)
+    mean_y = statistics.mean(y for _, y in points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def commit_id():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_case(name, sizes, setup):
+    results = {}
+    for size in sizes or [1]:
+        fn = setup(size, random.Random(SEED))
+        results[size] = bench(fn)
+        print(f"{name} [{size}]: {format_time(results[size]['median'])}", file=sys.stderr)
+    return results
+
+
+def print_results(cases, baseline):
+    print(f"{'case':<44} {'size':>7} {'min':>10} {'median':>10} {'ops/s':>11}")
+    for name, case in cases.items():
+        for size, result in case["sizes"].items():
+            line = (f"{name:<44} {size:>7} {format_time(result['min']):>10} {format_time(result['median']):>10} "
+                    f"{result['ops']:>11.1f}")
+            before = baseline.get(name, {}).get("sizes", {}).get(str(size))
+            if before and before["median"]:
+                line += f"  {(result['median'] - before['median']) / before['median'] * 100:+.0f}% vs baseline"
+            print(line)
+        if case["exponent"] is not None:
+            flag = "  SUPER-LINEAR" if case["exponent"] > MAX_EXPONENT else ""
+            print(f"{'  scaling exponent':<44} {case['exponent']:>7.2f}{flag}")
+
+
+def main():
+    baseline = {}
+    if COMPARE:
+        with open(COMPARE) as f:
+            baseline = json.load(f)["cases"]
+
+    cases = {}
+    for name, sizes, setup in CASES:
+        if CASE_FILTER and not any(part in name for part in CASE_FILTER):
+            continue
+        results = run_case(name, sizes, setup)
+        cases[name] = {"sizes": results, "exponent": scaling_exponent(results) if sizes else None}
+
+    print_results(cases, baseline)
+
+    path = OUTPUT or os.path.join(RESULTS_DIR, f"micro-{commit_id()}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"commit": commit_id(), "cases": cases}, f, indent=2)
+    print(f"Results written to {path}")
+
+    super_linear = [name for name, case in cases.items()
+                    if case["exponent"] is not None and case["exponent"] > MAX_EXPONENT]
+    if super_linear:
+        sys.exit(f"Super-linear scaling (exponent above {MAX_EXPONENT}): {', '.join(super_linear)}")
+
+
+if __name__ == '__main__':
+    main()
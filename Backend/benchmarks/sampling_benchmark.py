@@ -0,0 +1,83 @@
+"""
+Compare `$match {$nin}` + `$sample` with random_key pivot sampling.
+
+Seeds one domain collection per size against a local mongod and samples a
+40-article feed from it with a user exclusion list.
+
+    BENCH_MONGODB_URI=mongodb://localhost:27017 python benchmarks/sampling_benchmark.py
+    BENCH_SIZES=10000,100000 python benchmarks/sampling_benchmark.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from pymongo import MongoClient
+
+from article_sampling import ensure_random_keys, sample_from_domains, new_random_key
+
+MONGODB_URI = os.environ.get('BENCH_MONGODB_URI', 'mongodb://localhost:27017')
+DATABASE_NAME = 'visionary_bench'
+SIZES = [int(size) for size in os.environ.get('BENCH_SIZES', '10000,100000,1000000').split(',')]
+EXCLUDED = int(os.environ.get('BENCH_EXCLUDED', 1000))
+SAMPLE_SIZE = 40
+ITERATIONS = int(os.environ.get('BENCH_ITERATIONS', 30))
+INSERT_BATCH = 10000
+
+
+def seed(db, domain, size):
+    collection = db[domain]
+    collection.drop()
+    for start in range(0, size, INSERT_BATCH):
+        collection.insert_many([
+            {"id": i, "title": f"Article {i}", "summary": "Synthetic summary.", "likes": 0,
+             "comments": [], "random_key": new_random_key()}
+            for i in range(start, min(size, start + INSERT_BATCH))
+        ])
+    collection.create_index("id")
+    ensure_random_keys(db, [domain])
+
+
+def sample_nin(db, domain, exclude_ids):
+    return list(db[domain].aggregate([
+        {"$match": {"id": {"$nin": exclude_ids}}},
+        {"$sample": {"size": SAMPLE_SIZE}},
+        {"$project": {"_id": 0}}
+    ]))
+
+
+def timed(fn):
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    db = MongoClient(MONGODB_URI)[DATABASE_NAME]
+    print(f"{'articles':>10} {'strategy':<16} {'p50 ms':>9} {'p95 ms':>9}")
+
+    for size in SIZES:
+        domain = f"sampling_{size}"
+        seed(db, domain, size)
+        exclude_ids = random.sample(range(size), min(EXCLUDED, size // 2))
+
+        for name, fn in (
+            ("$nin + $sample", lambda: sample_nin(db, domain, exclude_ids)),
+            ("random_key", lambda: sample_from_domains(db, [(domain, SAMPLE_SIZE)], {domain: set(exclude_ids)})),
+        ):
+            p50, p95 = timed(fn)
+            print(f"{size:>10} {name:<16} {p50:>9.2f} {p95:>9.2f}")
+
+        db[domain].drop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare per-comment analyze_sentiment calls with analyze_sentiment_batch.
+
+Run from the Backend directory:
+
+    python benchmarks/sentiment_benchmark.py
+"""
+import os
+import random
+import sys
+import time
+
+# sentimental.py loads its pickles relative to the working directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from sentimental import analyze_sentiment, analyze_sentiment_batch
+
+SAMPLE_COMMENTS = [
+    "I love this article, it was really informative!",
+    "This is terrible and completely wrong.",
+    "Interesting read about the history of the region.",
+    "Not sure I agree with the second section :(",
+    "Great facts, thanks for sharing 100%",
+    "Boring. Nothing new here.",
+]
+
+
+def make_comments(count):
+    return [random.choice(SAMPLE_COMMENTS) for _ in range(count)]
+
+
+def best_of(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"{'comments':>10} {'per-call ms':>12} {'batch ms':>10} {'speedup':>8}")
+    for count in (10, 100, 1000):
+        comments = make_comments(count)
+
+        # Both paths must agree before timing them
+        assert [analyze_sentiment(c) for c in comments] == list(analyze_sentiment_batch(comments))
+
+        single = best_of(lambda: [analyze_sentiment(c) for c in comments])
+        batch = best_of(lambda: analyze_sentiment_batch(comments))
+        print(f"{count:>10} {single * 1000:>12.2f} {batch * 1000:>10.2f} {single / batch:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
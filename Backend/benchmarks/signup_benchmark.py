@@ -0,0 +1,108 @@
+"""
+Compare check-then-insert signup with a single insert against unique indexes.
+
+Runs the database part of /signup against a local mongod, without bcrypt:
+
+    check-then-insert   find_one by email, find_one by phone, insert_one
+    unique index        insert_one, DuplicateKeyError means already registered
+
+First every strategy races BENCH_RACERS threads signing up the same email
+and counts how many accounts were created, then it times sequential signups
+of new users.
+
+    BENCH_MONGODB_URI=mongodb://localhost:27017 python benchmarks/signup_benchmark.py
+"""
+import os
+import statistics
+import threading
+import time
+import uuid
+
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+
+MONGODB_URI = os.environ.get('BENCH_MONGODB_URI', 'mongodb://localhost:27017')
+DATABASE_NAME = 'visionary_bench'
+RACERS = int(os.environ.get('BENCH_RACERS', 32))
+RACES = int(os.environ.get('BENCH_RACES', 20))
+SIGNUPS = int(os.environ.get('BENCH_SIGNUPS', 500))
+
+
+def new_user(email=None):
+    return {
+        "fullName": "Benchmark User",
+        "email": email or f"{uuid.uuid4().hex}@example.com",
+        "phone": uuid.uuid4().hex[:12],
+        "password": "not-a-real-hash",
+        "likedArticles": [],
+        "commentedArticles": [],
+        "sharedArticles": []
+    }
+
+
+def signup_check_then_insert(users, user):
+    if users.find_one({"email": user["email"]}):
+        return False
+    if users.find_one({"phone": user["phone"]}):
+        return False
+    users.insert_one(user)
+    return True
+
+
+def signup_unique_index(users, user):
+    try:
+        users.insert_one(user)
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+def race(users, signup):
+    """Sign up the same email from many threads at once, return the accounts created"""
+    email = f"race-{uuid.uuid4().hex}@example.com"
+    barrier = threading.Barrier(RACERS)
+
+    def attempt():
+        user = new_user(email)
+        barrier.wait()
+        signup(users, user)
+
+    threads = [threading.Thread(target=attempt) for _ in range(RACERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return users.count_documents({"email": email})
+
+
+def main():
+    db = MongoClient(MONGODB_URI)[DATABASE_NAME]
+    print(f"{'strategy':<20} {'duplicate races':>16} {'p50 ms':>8} {'p95 ms':>8}")
+
+    for name, signup, unique in (
+        ("check-then-insert", signup_check_then_insert, False),
+        ("unique index", signup_unique_index, True),
+    ):
+        users = db.signup_bench
+        users.drop()
+        # The check-then-insert path had non-unique lookups on the same fields
+        users.create_index("email", unique=unique)
+        users.create_index("phone", unique=unique)
+
+        duplicate_races = sum(1 for _ in range(RACES) if race(users, signup) > 1)
+
+        timings = []
+        for _ in range(SIGNUPS):
+            user = new_user()
+            start = time.perf_counter()
+            signup(users, user)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+
+        print(f"{name:<20} {f'{duplicate_races}/{RACES}':>16} {statistics.median(timings):>8.2f} "
+              f"{timings[int(len(timings) * 0.95) - 1]:>8.2f}")
+        users.drop()
+
+
+if __name__ == '__main__':
+    main()
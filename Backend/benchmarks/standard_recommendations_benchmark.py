@@ -0,0 +1,119 @@
+"""
+End-to-end latency of /user/<id>/standard-recommendations against a local mongod.
+
+Seeds a throwaway database with synthetic domain collections and a user
+with interaction history, then times:
+  - the route itself (cache cleared before every request)
+  - candidate fetching as one query per domain (the old approach)
+  - candidate fetching with a single $unionWith query
+
+    BENCH_MONGODB_URI=mongodb://localhost:27017 python benchmarks/standard_recommendations_benchmark.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from flask import Flask
+from pymongo import MongoClient
+
+import sentimental
+from article_sampling import sample_from_domains
+from user_profiles import ALL_DOMAINS
+
+MONGODB_URI = os.environ.get('BENCH_MONGODB_URI', 'mongodb://localhost:27017')
+DATABASE_NAME = 'visionary_bench'
+ARTICLES_PER_DOMAIN = int(os.environ.get('BENCH_ARTICLES_PER_DOMAIN', 5000))
+INTERACTIONS = int(os.environ.get('BENCH_INTERACTIONS', 500))
+ITERATIONS = int(os.environ.get('BENCH_ITERATIONS', 50))
+
+
+def seed(db):
+    client_domains = ALL_DOMAINS
+    for d, domain in enumerate(client_domains):
+        db[domain].drop()
+        db[domain].insert_many([
+            {"id": d * 10_000_000 + i, "title": f"{domain} {i}", "summary": "Synthetic summary.",
+             "likes": 0, "comments": [], "sections": []}
+            for i in range(ARTICLES_PER_DOMAIN)
+        ])
+        db[domain].create_index("id")
+
+    def interaction(kind):
+        d = random.randrange(len(client_domains))
+        item = {"articleId": d * 10_000_000 + random.randrange(ARTICLES_PER_DOMAIN),
+                "domain": client_domains[d], "articleTitle": "x"}
+        if kind == "comment":
+            item.update({"commentId": str(random.random()), "commentText": "I love it", "sentiment": 1})
+        return item
+
+    db.users.drop()
+    db.user_profiles.drop()
+    user_id = db.users.insert_one({
+        "fullName": "Bench User", "email": "bench@example.com", "phone": "0",
+        "interestedDomains": client_domains[:3],
+        "likedArticles": [interaction("like") for _ in range(INTERACTIONS)],
+        "commentedArticles": [interaction("comment") for _ in range(INTERACTIONS // 5)],
+        "sharedArticles": [interaction("share") for _ in range(INTERACTIONS // 5)],
+    }).inserted_id
+    return db.users.find_one({"_id": user_id})
+
+
+def sequential_fetch(db, quotas, exclude_ids):
+    articles = []
+    for domain, size in quotas:
+        articles.extend(db[domain].aggregate([
+            {"$match": {"id": {"$nin": list(exclude_ids.get(domain, []))}}},
+            {"$sample": {"size": size}},
+            {"$project": {"_id": 0}}
+        ]))
+    return articles
+
+
+def timed(fn, iterations=ITERATIONS):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def report(name, result):
+    p50, p95 = result
+    print(f"{name:<28} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    db = MongoClient(MONGODB_URI)[DATABASE_NAME]
+    print(f"Seeding {ARTICLES_PER_DOMAIN} articles x {len(ALL_DOMAINS)} domains...")
+    user = seed(db)
+
+    app = Flask(__name__)
+    sentimental.init_app(app, db)
+    app.register_blueprint(sentimental.sentiment_blueprint)
+    client = app.test_client()
+
+    def route():
+        sentimental.cache.clear()
+        response = client.get(f"/user/{user['_id']}/standard-recommendations")
+        assert response.status_code == 200, response.json
+
+    exclude_ids = {}
+    for item in user["likedArticles"] + user["commentedArticles"] + user["sharedArticles"]:
+        exclude_ids.setdefault(item["domain"], set()).add(item["articleId"])
+    quotas = [(domain, 4) for domain in ALL_DOMAINS]
+
+    report("route end-to-end", timed(route))
+    report("fetch, query per domain", timed(lambda: sequential_fetch(db, quotas, exclude_ids)))
+    report("fetch, single $unionWith", timed(lambda: sample_from_domains(db, quotas, exclude_ids)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Compare the per-keyword trending classification loop with topic_matcher.
+
+Uses a real pageviews top list (1000 articles) fetched from the Wikimedia
+API, or a saved API response, or a synthetic list when neither is available:
+
+    python benchmarks/topic_matcher_benchmark.py
+    BENCH_DATE=2025/03/25 python benchmarks/topic_matcher_benchmark.py
+    BENCH_PAYLOAD=top.json python benchmarks/topic_matcher_benchmark.py
+"""
+import json
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from topic_matcher import REGION_KEYWORDS, get_classifier
+from trending_service import fetch_top_articles, recent_dates
+
+SYNTHETIC_WORDS = ["Delhi", "Capitals", "List", "of", "Python", "Film", "season", "Taylor", "Swift",
+                   "election", "London", "Cricket", "World", "Cup", "2025", "Deaths", "in", "Texas"]
+SYNTHETIC_PAGES = ["Main_Page", "Special:Search", "Wikipedia:Featured_pictures", "File:Example.jpg",
+                   "Portal:Current_events", "User:Example"]
+
+
+def load_articles():
+    payload = os.environ.get('BENCH_PAYLOAD')
+    if payload:
+        with open(payload) as f:
+            return json.load(f)['items'][0]['articles']
+
+    try:
+        articles = fetch_top_articles(os.environ.get('BENCH_DATE') or recent_dates()[1])
+        if articles:
+            return articles
+    except Exception as e:
+        print(f"Could not fetch pageviews ({str(e)}), using a synthetic list")
+
+    articles = []
+    for rank in range(1, 1001):
+        if rank % 100 == 0:
+            name = random.choice(SYNTHETIC_PAGES)
+        else:
+            name = "_".join(random.choice(SYNTHETIC_WORDS) for _ in range(random.randint(1, 5)))
+        articles.append({"article": name, "views": 1000000 // rank, "rank": rank})
+    return articles
+
+
+def classify_loop(top_articles, keywords):
+    """The classification as it was done inline in the /wiki/trending route"""
+    related_topics = []
+    trending_topics = []
+    for article in top_articles:
+        if (article['article'] in ['Main_Page', 'Special:Search'] or
+            article['article'].startswith('Wikipedia:') or
+            article['article'].startswith('Special:') or
+            article['article'].startswith('File:') or
+            article['article'].startswith('Portal:') or
+            article['article'].startswith('User:')):
+            continue
+
+        topic = {
+            'title': article['article'].replace('_', ' '),
+            'views': article['views'],
+            'rank': article['rank']
+        }
+        title_lower = topic['title'].lower()
+        if any(keyword in title_lower for keyword in keywords):
+            related_topics.append(topic)
+        else:
+            trending_topics.append(topic)
+    return related_topics, trending_topics
+
+
+def classify_compiled(top_articles, classifier):
+    topics = [
+        {'title': article['article'].replace('_', ' '), 'views': article['views'], 'rank': article['rank']}
+        for article in top_articles
+        if classifier.is_article(article['article'])
+    ]
+    return classifier.partition(topics)
+
+
+def best_of(fn, repeat=50):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    articles = load_articles()
+    print(f"{len(articles)} articles")
+    print(f"{'region':<10} {'keywords':>8} {'loop ms':>9} {'compiled ms':>12} {'speedup':>8}")
+
+    for region, keywords in REGION_KEYWORDS.items():
+        classifier = get_classifier(region)
+
+        # Both paths must agree before timing them
+        assert classify_loop(articles, keywords) == classify_compiled(articles, classifier)
+
+        loop = best_of(lambda: classify_loop(articles, keywords))
+        compiled = best_of(lambda: classify_compiled(articles, classifier))
+        print(f"{region:<10} {len(keywords):>8} {loop * 1000:>9.3f} {compiled * 1000:>12.3f} {loop / compiled:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
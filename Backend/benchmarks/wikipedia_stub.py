@@ -0,0 +1,227 @@
+"""
+Local stand-in for the Wikipedia and Wikimedia APIs used by the backend.
+
+e2e_server.py sends the app's calls to *.wikipedia.org and wikimedia.org
+here instead, as http://<stub>/<original host>/<path>?<query>. Each call is
+answered, in order of preference, from:
+
+  1. a recorded response in BENCH_FIXTURES_DIR, keyed by host, path and
+     query parameters
+  2. with BENCH_RECORD=1, the real API, whose response is then recorded
+  3. a synthetic response in the shape of the real one, generated
+     deterministically from the request so repeated runs see the same data
+
+Recording once and replaying keeps benchmark runs comparable between
+commits and independent of Wikipedia's latency. BENCH_STUB_LATENCY_MS adds
+a fixed delay to every answer to mimic a remote API.
+
+No recorded fixtures are committed, so without a recording run every answer
+is synthetic: the titles, extracts and page view counts only have the shape
+of Wikipedia's. GET /__stats returns how many answers came from each source,
+which e2e_benchmark.py prints with its results.
+
+    python benchmarks/wikipedia_stub.py                    # replay, synthesize the rest
+    BENCH_RECORD=1 python benchmarks/wikipedia_stub.py     # record real responses
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+STUB_PORT = int(os.environ.get('BENCH_STUB_PORT', 5099))
+FIXTURES_DIR = os.environ.get('BENCH_FIXTURES_DIR',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'wikipedia'))
+RECORD = os.environ.get('BENCH_RECORD') == '1'
+LATENCY_MS = float(os.environ.get('BENCH_STUB_LATENCY_MS', 0))
+
+# Answers served per source, for /__stats
+served = {"fixture": 0, "recorded": 0, "synthetic": 0}
+served_lock = threading.Lock()
+
+# Query parameters that don't change the answer
+IGNORED_PARAMS = {"format", "utf8"}
+
+WORDS = ["solar", "river", "quantum", "election", "festival", "forest", "robot", "galaxy", "recipe",
+         "climate", "museum", "vaccine", "orbit", "novel", "protest", "harvest", "satellite", "ocean",
+         "algorithm", "cinema", "mountain", "parliament", "telescope", "bakery", "volcano", "neuron"]
+
+
+def fixture_key(host, path, params):
+    kept = sorted((key, value) for key, value in params if key not in IGNORED_PARAMS)
+    return hashlib.sha1(json.dumps([host, path, kept]).encode()).hexdigest()
+
+
+def fixture_path(key):
+    return os.path.join(FIXTURES_DIR, f"{key}.json")
+
+
+def load_fixture(key):
+    try:
+        with open(fixture_path(key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def record(host, path, params, key):
+    response = requests.get(f"https://{host}{path}", params=params,
+                            headers={"User-Agent": "VisionaryBenchmark/1.0 (benchmark fixture recording)"},
+                            timeout=30)
+    fixture = {"status": response.status_code, "body": response.json()}
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    with open(fixture_path(key), "w") as f:
+        json.dump(fixture, f)
+    return fixture
+
+
+# Synthetic responses
+
+def seeded(*parts):
+    return random.Random(hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest())
+
+
+def page_id(title):
+    return int(hashlib.sha1(title.encode()).hexdigest()[:8], 16)
+
+
+def synthetic_title(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title()
+
+
+def synthetic_page(title, params):
+    rng = seeded(title)
+    sections = [synthetic_title(rng) for _ in range(rng.randint(2, 5))]
+    sentences = [f"{title} is a {rng.choice(WORDS)} topic related to {rng.choice(WORDS)}."
+                 for _ in range(rng.randint(3, 8))]
+    if "exsentences" in params:
+        extract = " ".join(sentences[:int(params["exsentences"])])
+    else:
+        extract = " ".join(sentences) + "".join(
+            f"\n\n== {section} ==\n{' '.join(rng.choice(WORDS) for _ in range(60))}." for section in sections)
+    return {
+        "pageid": page_id(title),
+        "ns": 0,
+        "title": title,
+        "contentmodel": "wikitext",
+        "pagelanguage": "en",
+        "fullurl": f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}",
+        "canonicalurl": f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}",
+        "extract": extract,
+        "links": [{"ns": 0, "title": synthetic_title(rng)} for _ in range(rng.randint(5, 20))]
+    }
+
+
+def synthetic_query(params):
+    if params.get("list") == "search":
+        rng = seeded("search", params.get("srsearch"))
+        limit = min(int(params.get("srlimit", 10)), 20)
+        query = params.get("srsearch", "").title()
+        titles = [query] + [f"{query} {synthetic_title(rng)}" for _ in range(limit - 1)]
+        return {"query": {"searchinfo": {"totalhits": limit}, "search": [{"ns": 0, "title": t} for t in titles]}}
+
+    if params.get("list") == "random":
+        rng = random.Random()
+        return {"query": {"random": [{"id": rng.randrange(10 ** 7), "ns": 0, "title": synthetic_title(rng)}
+                                     for _ in range(int(params.get("rnlimit", 1)))]}}
+
+    titles = params.get("titles", "").split("|")
+    if params.get("generator") == "images":
+        images = {}
+        for title in titles:
+            for i in range(2):
+                name = f"File:{title.replace(' ', '_')}_{i}.jpg"
+                images[str(-1 - len(images))] = {
+                    "ns": 6, "title": name,
+                    "imageinfo": [{"url": f"https://upload.wikimedia.org/wikipedia/commons/{name[5:]}"}]
+                }
+        return {"query": {"pages": images}}
+
+    pages = {}
+    for title in titles:
+        page = synthetic_page(title, params)
+        pages[str(page["pageid"])] = page
+    return {"batchcomplete": "", "query": {"pages": pages}}
+
+
+def synthetic_top_articles(path):
+    # /api/rest_v1/metrics/pageviews/top/en.wikipedia/all-access/YYYY/MM/DD
+    year, month, day = path.rstrip("/").split("/")[-3:]
+    rng = seeded("top", year, month, day)
+    titles = ["Main_Page", "Special:Search"] + [synthetic_title(rng).replace(" ", "_") for _ in range(998)]
+    return {"items": [{
+        "project": "en.wikipedia", "access": "all-access", "year": year, "month": month, "day": day,
+        "articles": [{"article": title, "views": 5_000_000 // (rank + 1), "rank": rank + 1}
+                     for rank, title in enumerate(titles)]
+    }]}
+
+
+def synthetic_response(host, path, params):
+    if "/metrics/pageviews/top/" in path:
+        year, month, day = (int(part) for part in path.rstrip("/").split("/")[-3:])
+        if date(year, month, day) >= date.today():
+            return {"status": 404, "body": {"title": "Not found."}}
+        return {"status": 200, "body": synthetic_top_articles(path)}
+    if path.endswith("/api.php"):
+        return {"status": 200, "body": synthetic_query(params)}
+    return {"status": 404, "body": {"error": f"No stub for {host}{path}"}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/__stats":
+            with served_lock:
+                stats = dict(served)
+            self.send_json(200, stats)
+            return
+        host, _, path = url.path.lstrip("/").partition("/")
+        path = "/" + path
+        params = parse_qsl(url.query, keep_blank_values=True)
+
+        key = fixture_key(host, path, params)
+        source = "fixture"
+        fixture = load_fixture(key)
+        if fixture is None and RECORD:
+            source = "recorded"
+            fixture = record(host, path, params, key)
+        if fixture is None:
+            source = "synthetic"
+            fixture = synthetic_response(host, path, dict(params))
+        with served_lock:
+            served[source] += 1
+
+        if LATENCY_MS:
+            time.sleep(LATENCY_MS / 1000)
+        self.send_json(fixture["status"], fixture["body"])
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", STUB_PORT), StubHandler)
+    fixtures = len(os.listdir(FIXTURES_DIR)) if os.path.isdir(FIXTURES_DIR) else 0
+    print(f"Wikipedia stub on http://127.0.0.1:{STUB_PORT} "
+          f"({'recording' if RECORD else 'replaying'} {fixtures} fixtures in {FIXTURES_DIR})")
+    if not fixtures and not RECORD:
+        print("No recorded fixtures, every answer is synthetic")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
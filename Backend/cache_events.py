@@ -0,0 +1,142 @@
+"""
+User-scoped cache invalidation across gunicorn workers.
+
+Each worker keeps its own SimpleCache, so an interaction handled by one
+worker can't clear stale entries in the others directly. Instead the route
+publishes an event into a capped `cache_events` collection, and every worker
+tails that collection and drops the affected user's cache keys.
+
+The publishing worker also drops its own keys right away, marks the user's
+precomputed feeds as outdated and queues their rebuild, so the next load
+is served a fresh feed, computed on the spot if the rebuild isn't done yet.
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from feeds import invalidate_feeds, request_refresh
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+EVENTS_COLLECTION = "cache_events"
+EVENTS_COLLECTION_SIZE = 1024 * 1024  # bytes, old events are overwritten
+
+# (cache, key template) pairs cleared for a user, e.g. (cache, "std_rec_{user_id}")
+user_caches = []
+
+# user id -> time.time() of the user's latest invalidation in this process.
+# Only needed while a response computed before it may still be stored.
+invalidation_times = {}
+INVALIDATION_MEMORY = 600
+MAX_INVALIDATIONS = 10000
+invalidation_lock = threading.Lock()
+
+events_db = None
+process_id = None
+listener_pid = None
+listener_lock = threading.Lock()
+
+
+def register_user_cache(cache, key_template):
+    user_caches.append((cache, key_template))
+
+
+def invalidate_user(user_id):
+    """Drop every registered cache key for the user in this process"""
+    now = time.time()
+    with invalidation_lock:
+        global invalidation_times
+        if len(invalidation_times) >= MAX_INVALIDATIONS:
+            invalidation_times = {user: at for user, at in invalidation_times.items()
+                                  if now - at < INVALIDATION_MEMORY}
+        invalidation_times[str(user_id)] = now
+
+    for cache, key_template in user_caches:
+        cache.delete(key_template.format(user_id=user_id))
+
+
+def user_invalidated_at(user_id):
+    """When this process last invalidated the user, as time.time(), or 0"""
+    return invalidation_times.get(str(user_id), 0)
+
+
+def publish_user_event(user_id, event_type):
+    """
+    Announce that the user's data changed. Clears this worker's caches
+    immediately, stops serving the stored feeds and queues their rebuild,
+    and notifies the other workers.
+    """
+    user_id = str(user_id)
+    invalidate_user(user_id)
+    try:
+        invalidate_feeds(user_id)
+    except Exception as e:
+        log.error("Error invalidating feeds: %s", e, extra={"user_id": user_id})
+    request_refresh(user_id)
+
+    try:
+        events_db[EVENTS_COLLECTION].insert_one({
+            "userId": user_id,
+            "type": event_type,
+            "origin": process_id,
+            "createdAt": datetime.now()
+        })
+    except Exception as e:
+        log.error("Error publishing cache event: %s", e, extra={"user_id": user_id})
+
+
+def listen_for_events():
+    """Tail the events collection and invalidate caches for other workers' events"""
+    collection = events_db[EVENTS_COLLECTION]
+    last_id = None
+
+    while True:
+        try:
+            if last_id is None:
+                # Only events published after this worker started matter
+                latest = collection.find_one(sort=[("$natural", -1)])
+                last_id = latest["_id"] if latest else None
+
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                for event in cursor:
+                    last_id = event["_id"]
+                    if event.get("origin") != process_id:
+                        invalidate_user(event["userId"])
+        except Exception as e:
+            log.error("Error reading cache events: %s", e)
+        time.sleep(1)
+
+
+def start_listener():
+    """Start the listener thread for this process if it isn't running yet"""
+    global process_id, listener_pid
+    # Threads don't survive a fork, so a forked process starts its own
+    if listener_pid == os.getpid():
+        return
+    with listener_lock:
+        if listener_pid != os.getpid():
+            process_id = uuid.uuid4().hex
+            threading.Thread(target=listen_for_events, daemon=True).start()
+            listener_pid = os.getpid()
+
+
+def init_cache_events(database):
+    """Create the capped events collection and start listening in this process"""
+    global events_db
+    events_db = database
+    try:
+        events_db.create_collection(EVENTS_COLLECTION, capped=True, size=EVENTS_COLLECTION_SIZE)
+    except CollectionInvalid:
+        pass  # Already exists
+    except Exception as e:
+        log.error("Error creating cache events collection: %s", e)
+
+    start_listener()
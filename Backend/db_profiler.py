@@ -0,0 +1,152 @@
+"""
+Per-request MongoDB profiling with pymongo command listeners.
+
+Every command a request issues is tagged with the Flask route and the
+request id (the X-Request-ID header, or a generated one, echoed back on the
+response). When the request finishes, its MongoDB time is broken down per
+command in a Server-Timing header, which browser dev tools show next to the
+request:
+
+    Server-Timing: db;dur=41.2;desc="23 commands, 180 docs", db-aggregate;dur=30.5;desc="12", ...
+
+With DB_PROFILE_DEBUG=true, JSON object responses also get a `_db_profile`
+field listing the individual commands. Commands slower than
+DB_SLOW_QUERY_MS are logged with their route and request id, including the
+ones run by background threads outside a request.
+"""
+import os
+import threading
+import uuid
+
+from flask import current_app, g, has_request_context, request
+from pymongo import monitoring
+
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', 100))
+DB_PROFILE_DEBUG = os.environ.get('DB_PROFILE_DEBUG', 'false').lower() == 'true'
+
+# Commands listed individually in the debug field, per request
+DEBUG_COMMAND_LIMIT = 100
+
+pending_lock = threading.Lock()
+pending = {}  # (connection id, operation id) -> collection
+
+
+def command_collection(event):
+    # find, aggregate, insert, update, ... name their collection in the command's first field
+    target = event.command.get(event.command_name)
+    return target if isinstance(target, str) else None
+
+
+def documents_returned(reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "value" in reply:
+        # findAndModify
+        return 1 if reply["value"] else 0
+    return reply.get("n", 0)
+
+
+def request_context():
+    """(route, request id) the current thread is working for"""
+    if has_request_context() and "db_profile" in g:
+        return g.db_profile["route"], g.db_profile["request_id"]
+    return f"background:{threading.current_thread().name}", None
+
+
+class CommandProfiler(monitoring.CommandListener):
+    def started(self, event):
+        with pending_lock:
+            pending[(event.connection_id, event.request_id)] = command_collection(event)
+
+    def succeeded(self, event):
+        self.finished(event, documents_returned(event.reply))
+
+    def failed(self, event):
+        self.finished(event, 0, failed=True)
+
+    def finished(self, event, documents, failed=False):
+        with pending_lock:
+            collection = pending.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+
+        if has_request_context() and "db_profile" in g:
+            record(g.db_profile, event.command_name, collection, duration_ms, documents, failed)
+
+        if duration_ms >= DB_SLOW_QUERY_MS:
+            log.warning("Slow MongoDB %s on %s.%s: %.1f ms", event.command_name, event.database_name,
+                        collection, duration_ms, extra={
+                            "command": event.command_name,
+                            "collection": collection,
+                            "duration_ms": round(duration_ms, 2),
+                            "documents": documents,
+                            "failed": failed
+                        })
+
+
+def record(profile, command_name, collection, duration_ms, documents, failed):
+    profile["time_ms"] += duration_ms
+    profile["documents"] += documents
+    totals = profile["by_command"].setdefault(command_name, [0, 0.0])
+    totals[0] += 1
+    totals[1] += duration_ms
+    if DB_PROFILE_DEBUG and len(profile["commands"]) < DEBUG_COMMAND_LIMIT:
+        profile["commands"].append({
+            "command": command_name,
+            "collection": collection,
+            "ms": round(duration_ms, 2),
+            "documents": documents,
+            "failed": failed
+        })
+
+
+def before_request():
+    g.db_profile = {
+        "route": request.url_rule.rule if request.url_rule else "unmatched",
+        "request_id": request.headers.get("X-Request-ID") or uuid.uuid4().hex,
+        "time_ms": 0.0,
+        "documents": 0,
+        "by_command": {},
+        "commands": []
+    }
+
+
+def server_timing(profile):
+    commands = sum(count for count, _ in profile["by_command"].values())
+    entries = [f'db;dur={profile["time_ms"]:.1f};desc="{commands} commands, {profile["documents"]} docs"']
+    for command_name, (count, duration_ms) in sorted(profile["by_command"].items(),
+                                                      key=lambda item: -item[1][1]):
+        entries.append(f'db-{command_name};dur={duration_ms:.1f};desc="{count}"')
+    return ", ".join(entries)
+
+
+def after_request(response):
+    if "db_profile" not in g:
+        return response
+    profile = g.db_profile
+    response.headers["X-Request-ID"] = profile["request_id"]
+    response.headers["Server-Timing"] = server_timing(profile)
+
+    if DB_PROFILE_DEBUG and response.is_json and not response.direct_passthrough:
+        body = response.get_json(silent=True)
+        if isinstance(body, dict):
+            body["_db_profile"] = {
+                "route": profile["route"],
+                "request_id": profile["request_id"],
+                "time_ms": round(profile["time_ms"], 2),
+                "documents": profile["documents"],
+                "commands": profile["commands"]
+            }
+            response.set_data(current_app.json.dumps(body))
+    return response
+
+
+def init_db_profiler(app):
+    """Profile the app's MongoDB commands. Call before creating the MongoClient."""
+    app.before_request(before_request)
+    app.after_request(after_request)
+    monitoring.register(CommandProfiler())
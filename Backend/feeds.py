@@ -0,0 +1,200 @@
+"""
+Precomputed recommendation feeds.
+
+Each active user's next feed is materialized into the feeds collection, one
+document per user and feed kind ("standard" or "bert"), so the
+recommendation endpoints can answer with a single indexed read:
+
+    {
+        "_id": "standard:<user_id>",
+        "userId": "<user_id>",
+        "kind": "standard",
+        "data": {...response body...},
+        "generatedAt": datetime,     # when the build started reading the user's data
+        "lastServedAt": datetime,
+        "invalidatedAt": datetime    # last interaction, older feeds are not served
+    }
+
+Feeds are rebuilt by a background worker thread in each web process when the
+user interacts or when a served feed is getting old, and on a schedule for
+recently active users by running this module on its own:
+
+    python feeds.py
+
+The endpoints still compute on a miss, so a missing feed only costs latency.
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+FEED_KINDS = ["standard", "bert"]
+
+# Feeds older than this are not served
+FEED_MAX_AGE = int(os.environ.get('FEED_MAX_AGE', 24 * 3600))
+# Serving a feed older than this queues a rebuild for next time
+FEED_REFRESH_AFTER = int(os.environ.get('FEED_REFRESH_AFTER', 600))
+# Users served a feed within this window are refreshed by the scheduler
+FEED_ACTIVE_WINDOW = int(os.environ.get('FEED_ACTIVE_WINDOW', 7 * 24 * 3600))
+FEED_SCHEDULE_INTERVAL = int(os.environ.get('FEED_SCHEDULE_INTERVAL', 900))
+# Reads update a feed's lastServedAt at most this often
+FEED_SERVED_UPDATE_INTERVAL = int(os.environ.get('FEED_SERVED_UPDATE_INTERVAL', 300))
+
+# Feed builders registered by the modules that own the recommendation logic.
+# Each takes a user id string and returns (response_data, status).
+feed_builders = {}
+
+refresh_queue = queue.Queue()
+queued_refreshes = set()
+queued_lock = threading.Lock()
+worker_pid = None
+feeds_db = None
+
+
+def init_feeds(database):
+    """Point the feed store at the app database and create its index"""
+    global feeds_db
+    feeds_db = database
+    try:
+        feeds_db.feeds.create_index("lastServedAt")
+    except Exception as e:
+        log.error("Error creating feeds index: %s", e)
+
+
+def register_feed_builder(kind, builder):
+    feed_builders[kind] = builder
+
+
+def feed_id(kind, user_id):
+    return f"{kind}:{user_id}"
+
+
+def read_feed(kind, user_id):
+    """Return the materialized feed if it is fresh enough to serve, else None"""
+    now = datetime.now()
+    feed = feeds_db.feeds.find_one(
+        {"_id": feed_id(kind, user_id), "generatedAt": {"$gte": now - timedelta(seconds=FEED_MAX_AGE)}},
+        {"data": 1, "generatedAt": 1, "lastServedAt": 1, "invalidatedAt": 1}
+    )
+    if not feed:
+        return None
+    if feed.get("invalidatedAt") and feed["invalidatedAt"] >= feed["generatedAt"]:
+        # Built before the user's latest interaction, a rebuild is already queued
+        return None
+
+    # lastServedAt only decides whether the scheduler keeps the feed fresh,
+    # so it is written at most once per interval instead of on every read
+    served_before = now - timedelta(seconds=FEED_SERVED_UPDATE_INTERVAL)
+    if feed.get("lastServedAt", datetime.min) < served_before:
+        feeds_db.feeds.update_one(
+            {"_id": feed["_id"], "lastServedAt": {"$not": {"$gte": served_before}}},
+            {"$set": {"lastServedAt": now}}
+        )
+
+    if now - feed["generatedAt"] > timedelta(seconds=FEED_REFRESH_AFTER):
+        request_refresh(user_id, kinds=[kind])
+    return feed["data"]
+
+
+def save_feed(kind, user_id, data, generated_at=None):
+    """Store a feed. generated_at is when its data was read, now by default."""
+    now = datetime.now()
+    feeds_db.feeds.update_one(
+        {"_id": feed_id(kind, user_id)},
+        {"$set": {"userId": str(user_id), "kind": kind, "data": data, "generatedAt": generated_at or now},
+         "$setOnInsert": {"lastServedAt": now}},
+        upsert=True
+    )
+
+
+def invalidate_feeds(user_id):
+    """Stop serving the user's stored feeds until they are rebuilt"""
+    feeds_db.feeds.update_many(
+        {"_id": {"$in": [feed_id(kind, user_id) for kind in FEED_KINDS]}},
+        {"$set": {"invalidatedAt": datetime.now()}}
+    )
+
+
+def build_feed(kind, user_id):
+    """Run the registered builder and store the result"""
+    builder = feed_builders.get(kind)
+    if not builder:
+        return None
+    # A build that started before an interaction must not count as newer than it
+    started_at = datetime.now()
+    data, status = builder(str(user_id))
+    if status == 200:
+        save_feed(kind, user_id, data, generated_at=started_at)
+        return data
+    return None
+
+
+def feed_worker():
+    """Rebuild queued feeds for the lifetime of the process"""
+    while True:
+        kind, user_id = refresh_queue.get()
+        with queued_lock:
+            queued_refreshes.discard((kind, user_id))
+        try:
+            build_feed(kind, user_id)
+        except Exception as e:
+            log.error("Error refreshing %s feed for %s: %s", kind, user_id, e, extra={"user_id": user_id})
+
+
+def request_refresh(user_id, kinds=None):
+    """Queue a rebuild of the user's feeds, ignoring ones already queued"""
+    global worker_pid
+
+    # Gunicorn forks workers, so start one thread per process on first use
+    with queued_lock:
+        if worker_pid != os.getpid():
+            threading.Thread(target=feed_worker, daemon=True).start()
+            worker_pid = os.getpid()
+
+        for kind in kinds or FEED_KINDS:
+            key = (kind, str(user_id))
+            if key in queued_refreshes:
+                continue
+            queued_refreshes.add(key)
+            refresh_queue.put(key)
+
+
+def refresh_active_feeds():
+    """Rebuild feeds of recently active users that haven't been rebuilt for a while"""
+    now = datetime.now()
+    stale_feeds = feeds_db.feeds.find(
+        {"lastServedAt": {"$gte": now - timedelta(seconds=FEED_ACTIVE_WINDOW)},
+         "generatedAt": {"$lt": now - timedelta(seconds=FEED_REFRESH_AFTER)}},
+        {"kind": 1, "userId": 1}
+    )
+
+    refreshed = 0
+    for feed in stale_feeds:
+        try:
+            if build_feed(feed["kind"], feed["userId"]) is not None:
+                refreshed += 1
+        except Exception as e:
+            log.error("Error refreshing %s feed for %s: %s", feed["kind"], feed["userId"], e,
+                      extra={"user_id": feed["userId"]})
+    return refreshed
+
+
+def run_scheduler():
+    while True:
+        start = time.time()
+        refreshed = refresh_active_feeds()
+        log.info("Refreshed %d feeds in %.1fs", refreshed, time.time() - start)
+        time.sleep(FEED_SCHEDULE_INTERVAL)
+
+
+if __name__ == '__main__':
+    # Importing the app connects to MongoDB and registers the feed builders
+    # on the imported feeds module, not on this __main__ copy
+    import app  # noqa: F401
+    import feeds
+    feeds.run_scheduler()
@@ -0,0 +1,197 @@
+"""
+BM25 full-text index over article titles, summaries and sections.
+
+Documents are numbered in the order they are added, so every posting list
+is an append-only pair of arrays (document numbers, term frequencies) that
+stays sorted without any merging. On disk each list is stored as varint
+encoded document number gaps followed by varint frequencies:
+
+    index = FullTextIndex()
+    index.load("search_index.bin")
+    index.add("space", article)
+    index.search("black hole", limit=10, domains={"space", "science"})
+    index.save("search_index.bin")
+"""
+import heapq
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Common words that would match nearly every article
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "its",
+    "of", "on", "or", "that", "the", "to", "was", "were", "which", "with"
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Title words count this many times
+TITLE_WEIGHT = 3
+
+FORMAT_VERSION = 1
+
+
+def analyze(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def encode_varints(numbers):
+    out = bytearray()
+    for number in numbers:
+        while number >= 0x80:
+            out.append((number & 0x7F) | 0x80)
+            number >>= 7
+        out.append(number)
+    return bytes(out)
+
+
+def decode_varints(data):
+    numbers = array('I')
+    number = shift = 0
+    for byte in data:
+        number |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(number)
+            number = shift = 0
+    return numbers
+
+
+def encode_postings(doc_numbers, frequencies):
+    gaps = [doc_numbers[0]] + [doc_numbers[i] - doc_numbers[i - 1] for i in range(1, len(doc_numbers))]
+    return encode_varints(gaps) + encode_varints(frequencies)
+
+
+def decode_postings(data, count):
+    numbers = decode_varints(data)
+    doc_numbers = array('I')
+    total = 0
+    for gap in numbers[:count]:
+        total += gap
+        doc_numbers.append(total)
+    return doc_numbers, numbers[count:]
+
+
+def article_text(article):
+    sections = " ".join(f"{section.get('title', '')} {section.get('content', '')}"
+                        for section in article.get("sections") or [])
+    return f"{article.get('summary', '')} {sections}"
+
+
+class FullTextIndex:
+    def __init__(self):
+        self.documents = []        # document number -> stored article fields
+        self.keys = {}             # (domain, id) -> document number
+        self.lengths = array('I')  # document number -> indexed token count
+        self.total_length = 0
+        self.postings = {}         # term -> (array of document numbers, array of frequencies)
+        self.indexed_until = None  # UTC datetime the domain collections were last scanned up to
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def add(self, domain, article):
+        key = (domain, article["id"])
+        if not article.get("title"):
+            return False
+        tokens = analyze(article["title"]) * TITLE_WEIGHT + analyze(article_text(article))
+
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+
+        with self.lock:
+            if key in self.keys:
+                return False
+            doc_number = len(self.documents)
+            self.keys[key] = doc_number
+            self.documents.append({
+                "id": article["id"],
+                "domain": domain,
+                "title": article["title"],
+                "url": article.get("url"),
+                "summary": article.get("summary", ""),
+                "image_url": article.get("image_url")
+            })
+            self.lengths.append(len(tokens))
+            self.total_length += len(tokens)
+            for term, frequency in frequencies.items():
+                if term not in self.postings:
+                    self.postings[term] = (array('I'), array('I'))
+                doc_numbers, term_frequencies = self.postings[term]
+                doc_numbers.append(doc_number)
+                term_frequencies.append(frequency)
+            self.dirty = True
+        return True
+
+    def search(self, query, limit, domains=None):
+        """Top `limit` (score, document) pairs by BM25, optionally only from `domains`"""
+        terms = set(analyze(query))
+        with self.lock:
+            count = len(self.documents)
+            if not terms or not count:
+                return []
+            average_length = self.total_length / count
+
+            scores = {}
+            for term in terms:
+                if term not in self.postings:
+                    continue
+                doc_numbers, frequencies = self.postings[term]
+                idf = math.log(1 + (count - len(doc_numbers) + 0.5) / (len(doc_numbers) + 0.5))
+                for doc_number, frequency in zip(doc_numbers, frequencies):
+                    norm = K1 * (1 - B + B * self.lengths[doc_number] / average_length)
+                    scores[doc_number] = scores.get(doc_number, 0) + idf * frequency * (K1 + 1) / (frequency + norm)
+
+            if domains:
+                scores = {doc_number: score for doc_number, score in scores.items()
+                          if self.documents[doc_number]["domain"] in domains}
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [(score, self.documents[doc_number]) for doc_number, score in best]
+
+    def save(self, path):
+        """Write the index atomically so a reader never sees a partial file"""
+        with self.lock:
+            data = {
+                "version": FORMAT_VERSION,
+                "documents": self.documents,
+                "lengths": self.lengths.tobytes(),
+                "postings": {term: (len(doc_numbers), encode_postings(doc_numbers, frequencies))
+                             for term, (doc_numbers, frequencies) in self.postings.items()},
+                "indexed_until": self.indexed_until
+            }
+            self.dirty = False
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        """Replace the contents with an index written by save(). False if the file is missing or outdated."""
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != FORMAT_VERSION:
+            return False
+
+        lengths = array('I')
+        lengths.frombytes(data["lengths"])
+        postings = {term: decode_postings(encoded, count) for term, (count, encoded) in data["postings"].items()}
+        with self.lock:
+            self.documents = data["documents"]
+            self.keys = {(document["domain"], document["id"]): doc_number
+                         for doc_number, document in enumerate(self.documents)}
+            self.lengths = lengths
+            self.total_length = sum(lengths)
+            self.postings = postings
+            self.indexed_until = data["indexed_until"]
+            self.dirty = False
+        return True
@@ -1,4 +1,9 @@
 workers = 4
 threads = 2
 timeout = 60  # Increase timeout to 60 seconds
-bind = "0.0.0.0:5000"
\ No newline at end of file
+bind = "0.0.0.0:5000"
+
+def on_starting(server):
+    # Start /metrics from zero instead of adding to the last run's snapshots
+    from metrics import clear_metrics_dir
+    clear_metrics_dir()
@@ -0,0 +1,111 @@
+"""
+Client for inference_server.py.
+
+Every call returns None when the inference server is unreachable or
+returns an error, so callers can fall back to their local code path.
+Requests are only sent once /health reports the model as loaded. After a
+failure the server is skipped for INFERENCE_RETRY_AFTER seconds so a down
+sidecar doesn't add a timeout to every request, and /health is checked
+again before it is used.
+"""
+import os
+import threading
+import time
+
+import requests
+from dotenv import load_dotenv
+
+from metrics import timed
+from structured_logging import get_logger
+
+load_dotenv()
+
+log = get_logger(__name__)
+
+INFERENCE_URL = os.environ.get('INFERENCE_URL', 'http://127.0.0.1:5001')
+INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 2))
+INFERENCE_RETRY_AFTER = float(os.environ.get('INFERENCE_RETRY_AFTER', 30))
+
+_session = requests.Session()
+_state_lock = threading.Lock()
+_health_lock = threading.Lock()
+_unavailable_until = 0.0
+# None until /health has been checked, True once it reported the model loaded
+_model_ready = None
+
+
+def _mark_unavailable():
+    global _unavailable_until, _model_ready
+    with _state_lock:
+        _unavailable_until = time.time() + INFERENCE_RETRY_AFTER
+        _model_ready = None
+
+
+def _check_health():
+    """True if the server answers /health with the model loaded"""
+    try:
+        response = _session.get(f"{INFERENCE_URL}/health", timeout=INFERENCE_TIMEOUT)
+        health = response.json()
+    except Exception as e:
+        log.warning("Inference server unavailable: %s", e)
+        return False
+    if response.status_code != 200 or not health.get("model_loaded"):
+        log.warning("Inference server model not loaded: %s", health.get("error") or health.get("status"))
+        return False
+    return True
+
+
+def is_available():
+    """
+    False while we are backing off after a failed call. Otherwise the first
+    caller checks /health, and the server is used once it reports the model
+    as loaded.
+    """
+    global _model_ready
+    if time.time() < _unavailable_until:
+        return False
+    if _model_ready:
+        return True
+    with _health_lock:
+        if _model_ready is None and time.time() >= _unavailable_until:
+            if _check_health():
+                _model_ready = True
+            else:
+                _mark_unavailable()
+        return bool(_model_ready)
+
+
+def _post(path, payload):
+    if not is_available():
+        return None
+    try:
+        with timed("model_inference_seconds", model=f"remote{path.replace('/', '_')}"):
+            response = _session.post(f"{INFERENCE_URL}{path}", json=payload, timeout=INFERENCE_TIMEOUT)
+        if response.status_code != 200:
+            log.warning("Inference server returned status %d for %s", response.status_code, path)
+            _mark_unavailable()
+            return None
+        return response.json()
+    except Exception as e:
+        log.warning("Inference server unavailable: %s", e)
+        _mark_unavailable()
+        return None
+
+
+def embed_texts(texts):
+    """Return one embedding per text, or None if the server is down"""
+    if not texts:
+        return []
+    result = _post("/embed", {"texts": list(texts)})
+    return result.get("embeddings") if result else None
+
+
+def score_subdomains(texts, subdomains):
+    """
+    Score each text against its own list of subdomain labels.
+    Returns a list of {subdomain: score} dicts, or None if the server is down.
+    """
+    if not texts:
+        return []
+    result = _post("/subdomains", {"texts": list(texts), "subdomains": [list(s) for s in subdomains]})
+    return result.get("scores") if result else None
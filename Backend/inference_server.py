@@ -0,0 +1,330 @@
+"""
+Standalone BERT inference server.
+
+Gunicorn workers send summary texts here instead of running BERT inside the
+Flask request thread. Requests from every worker are grouped into dynamic
+micro-batches (up to INFERENCE_MAX_BATCH texts, waiting at most
+INFERENCE_MAX_WAIT_MS for the batch to fill) and run through a single
+forward pass.
+
+Run it next to the web server:
+
+    python inference_server.py
+
+The model loads in the background after the server starts listening. Until
+it has loaded, /health answers 503 and so do /embed and /subdomains.
+
+Endpoints:
+    POST /embed      {"texts": [...]}                  -> {"embeddings": [[...], ...]}
+    POST /subdomains {"texts": [...], "subdomains": [[...], ...]}
+                                                       -> {"scores": [{subdomain: score}, ...]}
+    GET  /health                                       -> {"status": "ok" | "loading" | "error",
+                                                           "model_loaded": bool, "error": str | None}
+    GET  /metrics                                      -> queue depth and batch size histogram
+"""
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+load_dotenv()
+
+MODEL_NAME = os.environ.get('INFERENCE_MODEL', 'bert-base-uncased')
+MAX_BATCH_SIZE = int(os.environ.get('INFERENCE_MAX_BATCH', 32))
+MAX_WAIT_MS = float(os.environ.get('INFERENCE_MAX_WAIT_MS', 10))
+REQUEST_TIMEOUT = float(os.environ.get('INFERENCE_REQUEST_TIMEOUT', 10))
+
+# Upper bounds for the batch size histogram exported on /metrics
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+
+
+class InferenceMetrics:
+    """Thread-safe counters for queue depth and batch sizes"""
+
+    def __init__(self, buckets):
+        self.lock = threading.Lock()
+        self.buckets = list(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.batch_count = 0
+        self.batch_size_sum = 0
+        self.texts_total = 0
+        self.forward_seconds_total = 0.0
+
+    def observe_batch(self, size, seconds):
+        with self.lock:
+            for i, upper in enumerate(self.buckets):
+                if size <= upper:
+                    self.bucket_counts[i] += 1
+            self.batch_count += 1
+            self.batch_size_sum += size
+            self.texts_total += size
+            self.forward_seconds_total += seconds
+
+    def render(self, queue_depth):
+        """Render metrics in Prometheus text exposition format"""
+        with self.lock:
+            lines = [
+                "# HELP inference_queue_depth Texts waiting to be batched",
+                "# TYPE inference_queue_depth gauge",
+                f"inference_queue_depth {queue_depth}",
+                "# HELP inference_batch_size Texts per forward pass",
+                "# TYPE inference_batch_size histogram",
+            ]
+            for upper, count in zip(self.buckets, self.bucket_counts):
+                lines.append(f'inference_batch_size_bucket{{le="{upper}"}} {count}')
+            lines.append(f'inference_batch_size_bucket{{le="+Inf"}} {self.batch_count}')
+            lines.append(f"inference_batch_size_sum {self.batch_size_sum}")
+            lines.append(f"inference_batch_size_count {self.batch_count}")
+            lines.append("# TYPE inference_texts_total counter")
+            lines.append(f"inference_texts_total {self.texts_total}")
+            lines.append("# TYPE inference_forward_seconds_total counter")
+            lines.append(f"inference_forward_seconds_total {self.forward_seconds_total:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+class PendingText:
+    """A single text waiting for its embedding"""
+
+    def __init__(self, text):
+        self.text = text
+        self.embedding = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Collects texts from concurrent requests and embeds them in batches.
+    The first queued text opens a batch window of max_wait_ms; the batch is
+    run as soon as it is full or the window closes.
+    """
+
+    def __init__(self, embed_fn, metrics, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.embed_fn = embed_fn
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def submit(self, texts, timeout=REQUEST_TIMEOUT):
+        """Queue texts and block until all of them have been embedded"""
+        pending = [PendingText(text) for text in texts]
+        for item in pending:
+            self.queue.put(item)
+
+        deadline = time.time() + timeout
+        for item in pending:
+            if not item.done.wait(max(0, deadline - time.time())):
+                raise TimeoutError("Inference request timed out")
+            if item.error:
+                raise item.error
+        return [item.embedding for item in pending]
+
+    def _collect_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            start = time.time()
+            try:
+                embeddings = self.embed_fn([item.text for item in batch])
+                for item, embedding in zip(batch, embeddings):
+                    item.embedding = embedding
+            except Exception as e:
+                log.exception("Error in inference batch: %s", e, extra={"batch_size": len(batch)})
+                for item in batch:
+                    item.error = e
+            finally:
+                self.metrics.observe_batch(len(batch), time.time() - start)
+                for item in batch:
+                    item.done.set()
+
+
+class BertEmbedder:
+    """Mean-pooled BERT sentence embeddings"""
+
+    def __init__(self, model_name=MODEL_NAME):
+        from transformers import BertTokenizer, BertModel
+        import torch
+
+        log.info("Loading inference model %s", model_name)
+        self.torch = torch
+        self.tokenizer = BertTokenizer.from_pretrained(model_name)
+        self.model = BertModel.from_pretrained(model_name)
+        self.model.eval()
+        log.info("Inference model loaded")
+
+    def __call__(self, texts):
+        inputs = self.tokenizer(texts, return_tensors="pt", truncation=True, padding=True, max_length=256)
+        with self.torch.no_grad():
+            outputs = self.model(**inputs)
+
+        # Average token embeddings, ignoring padding
+        mask = inputs["attention_mask"].unsqueeze(-1).float()
+        summed = (outputs.last_hidden_state * mask).sum(dim=1)
+        pooled = summed / mask.sum(dim=1).clamp(min=1e-9)
+        pooled = self.torch.nn.functional.normalize(pooled, dim=1)
+        return pooled.tolist()
+
+
+def cosine_scores(embedding, label_embeddings):
+    """Dot product of normalized vectors, shifted to 0..1 and normalized to sum to 1"""
+    raw = [(sum(a * b for a, b in zip(embedding, label)) + 1) / 2 for label in label_embeddings]
+    total = sum(raw)
+    return [score / total for score in raw] if total > 0 else raw
+
+
+class ModelNotLoaded(Exception):
+    """The model is still loading or failed to load"""
+
+
+class InferenceService:
+    """Ties the batcher to the endpoints and caches subdomain label embeddings"""
+
+    def __init__(self):
+        self.metrics = InferenceMetrics(BATCH_SIZE_BUCKETS)
+        self.embedder = None
+        self.load_error = None
+        self.batcher = MicroBatcher(self._embed, self.metrics)
+        self.label_cache = {}
+        self.label_lock = threading.Lock()
+
+    def load(self, load_embedder):
+        """Create the embedder, recording the error if it can't be loaded"""
+        try:
+            self.embedder = load_embedder()
+        except Exception as e:
+            log.exception("Error loading inference model: %s", e)
+            self.load_error = str(e)
+
+    def model_loaded(self):
+        return self.embedder is not None
+
+    def health(self):
+        if self.model_loaded():
+            status = "ok"
+        else:
+            status = "error" if self.load_error else "loading"
+        return {"status": status, "model_loaded": self.model_loaded(), "error": self.load_error}
+
+    def _embed(self, texts):
+        return self.embedder(texts)
+
+    def _require_model(self):
+        if not self.model_loaded():
+            raise ModelNotLoaded(self.load_error or "Inference model is still loading")
+
+    def embed(self, texts):
+        self._require_model()
+        return self.batcher.submit(texts)
+
+    def _label_embeddings(self, labels):
+        missing = [label for label in labels if label not in self.label_cache]
+        if missing:
+            embeddings = self.batcher.submit(missing)
+            with self.label_lock:
+                for label, embedding in zip(missing, embeddings):
+                    self.label_cache[label] = embedding
+        return [self.label_cache[label] for label in labels]
+
+    def subdomain_scores(self, texts, subdomains):
+        self._require_model()
+        embeddings = self.batcher.submit(texts)
+        results = []
+        for embedding, labels in zip(embeddings, subdomains):
+            if not labels:
+                results.append({})
+                continue
+            scores = cosine_scores(embedding, self._label_embeddings(labels))
+            results.append(dict(zip(labels, scores)))
+        return results
+
+
+def make_handler(service):
+    class InferenceHandler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type="application/json"):
+            payload = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200 if service.model_loaded() else 503, service.health())
+            elif self.path == "/metrics":
+                body = service.metrics.render(service.batcher.queue_depth()).encode("utf-8")
+                self._send(200, body, "text/plain; version=0.0.4")
+            else:
+                self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            try:
+                data = self._read_json()
+                texts = data.get("texts")
+                if not isinstance(texts, list) or not texts:
+                    return self._send(400, {"error": "texts array is required"})
+
+                if self.path == "/embed":
+                    self._send(200, {"embeddings": service.embed(texts)})
+                elif self.path == "/subdomains":
+                    subdomains = data.get("subdomains")
+                    if not isinstance(subdomains, list) or len(subdomains) != len(texts):
+                        return self._send(400, {"error": "subdomains must have one list per text"})
+                    self._send(200, {"scores": service.subdomain_scores(texts, subdomains)})
+                else:
+                    self._send(404, {"error": "Not found"})
+            except (TimeoutError, ModelNotLoaded) as e:
+                self._send(503, {"error": str(e)})
+            except Exception as e:
+                self._send(500, {"error": f"An error occurred: {str(e)}"})
+
+        def log_message(self, format, *args):
+            # Keep per-request access logs off stdout
+            pass
+
+    return InferenceHandler
+
+
+def run_server(host=None, port=None):
+    host = host or os.environ.get('INFERENCE_HOST', '127.0.0.1')
+    port = int(port or os.environ.get('INFERENCE_PORT', 5001))
+
+    service = InferenceService()
+    threading.Thread(target=service.load, args=(BertEmbedder,), daemon=True).start()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    log.info("Inference server listening on http://%s:%d", host, port)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    run_server()
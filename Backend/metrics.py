@@ -0,0 +1,273 @@
+"""
+Request metrics in the Prometheus text exposition format.
+
+Every worker counts in memory and regularly writes a snapshot of its
+counters and histograms to METRICS_DIR, one file per worker process. The
+/metrics route merges all the snapshots, so whichever gunicorn worker
+answers the scrape reports the totals for the whole server. Snapshots of
+exited workers are kept so counters never go backwards; gunicorn_config.py
+clears the directory when the server starts.
+
+Recorded per request:
+
+    http_request_duration_seconds   latency histogram per route, method and status
+    http_request_mongo_commands     MongoDB round trips per request
+    http_request_external_calls     outgoing HTTP calls per request, e.g. to Wikipedia
+
+and, outside of requests too, cache_requests_total (hit ratios are
+hit / all results per cache), external_http_requests_total and
+model_inference_seconds.
+
+    with timed("model_inference_seconds", model="sentiment"):
+        predictions = sentiment_model.predict(bow)
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from flask import g, has_request_context, request
+from pymongo import monitoring
+from requests.adapters import HTTPAdapter
+
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'visionary_metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "http_requests_total": ("counter", "HTTP requests handled", None),
+    "http_request_duration_seconds": ("histogram", "Time spent handling a request", LATENCY_BUCKETS),
+    "http_request_mongo_commands": ("histogram", "MongoDB commands issued per request", COUNT_BUCKETS),
+    "http_request_external_calls": ("histogram", "Outgoing HTTP calls made per request", COUNT_BUCKETS),
+    "mongo_commands_total": ("counter", "MongoDB commands issued", None),
+    "external_http_requests_total": ("counter", "Outgoing HTTP calls", None),
+    "cache_requests_total": ("counter", "Cache lookups by result", None),
+    "model_inference_seconds": ("histogram", "Time spent in model inference", LATENCY_BUCKETS),
+}
+
+metrics_lock = threading.Lock()
+counters = {}    # (name, labels) -> value
+histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+
+worker_id = None
+flusher_pid = None
+
+
+def label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    start_flusher()
+    key = (name, label_key(labels))
+    with metrics_lock:
+        counters[key] = counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    start_flusher()
+    buckets = METRICS[name][2]
+    key = (name, label_key(labels))
+    with metrics_lock:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0] * (len(buckets) + 2)
+        # Buckets are stored individually and made cumulative when rendered
+        index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+        histogram[index] += 1
+        histogram[-1] += value
+
+
+@contextmanager
+def timed(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def count_cache(cache, result):
+    inc("cache_requests_total", cache=cache, result=result)
+
+
+# Per-request counting
+
+def count_in_request(counter):
+    if has_request_context() and "metrics_start" in g:
+        g.metrics_counts[counter] = g.metrics_counts.get(counter, 0) + 1
+
+
+def route_label():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_counts = {}
+
+
+def after_request(response):
+    if "metrics_start" not in g:
+        return response
+    route = route_label()
+    observe("http_request_duration_seconds", time.perf_counter() - g.metrics_start,
+            route=route, method=request.method, status=response.status_code)
+    inc("http_requests_total", route=route, method=request.method, status=response.status_code)
+    observe("http_request_mongo_commands", g.metrics_counts.get("mongo", 0), route=route)
+    observe("http_request_external_calls", g.metrics_counts.get("external", 0), route=route)
+    return response
+
+
+class MongoCommandCounter(monitoring.CommandListener):
+    def started(self, event):
+        inc("mongo_commands_total", command=event.command_name)
+        count_in_request("mongo")
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+original_adapter_send = HTTPAdapter.send
+
+
+def counting_adapter_send(self, http_request, *args, **kwargs):
+    # Every requests call goes through an HTTPAdapter, including the ones
+    # made inside the wikipedia and wikipediaapi libraries
+    inc("external_http_requests_total", host=urlparse(http_request.url).hostname)
+    count_in_request("external")
+    return original_adapter_send(self, http_request, *args, **kwargs)
+
+
+# Sharing between workers
+
+def snapshot():
+    with metrics_lock:
+        return {
+            "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+            "histograms": [[name, labels, list(values)] for (name, labels), values in histograms.items()]
+        }
+
+
+def flush():
+    """Write this worker's snapshot, replacing the previous one atomically"""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{worker_id}.json")
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(temp_path, path)
+
+
+def run_flusher():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            log.error("Error writing metrics snapshot: %s", e)
+
+
+def start_flusher():
+    """Start the snapshot thread once per worker process"""
+    global flusher_pid, worker_id
+    if flusher_pid == os.getpid():
+        return
+    with metrics_lock:
+        if flusher_pid == os.getpid():
+            return
+        flusher_pid = os.getpid()
+        # A restarted worker can reuse a pid, so name snapshots uniquely
+        worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Counts inherited through fork belong to the parent's snapshot
+        counters.clear()
+        histograms.clear()
+    threading.Thread(target=run_flusher, daemon=True).start()
+
+
+def merged_snapshots():
+    merged_counters = {}
+    merged_histograms = {}
+    for filename in os.listdir(METRICS_DIR):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            merged_counters[key] = merged_counters.get(key, 0) + value
+        for name, labels, values in data["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            if key in merged_histograms:
+                merged_histograms[key] = [a + b for a, b in zip(merged_histograms[key], values)]
+            else:
+                merged_histograms[key] = values
+    return merged_counters, merged_histograms
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def render_metrics():
+    """All workers' metrics in the Prometheus text format"""
+    start_flusher()
+    flush()
+    merged_counters, merged_histograms = merged_snapshots()
+
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        if metric_type == "counter":
+            for (metric, labels), value in sorted(merged_counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+            continue
+
+        for (metric, labels), values in sorted(merged_histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], values):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{format_labels(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {values[-1]}")
+            lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def clear_metrics_dir():
+    """Drop the snapshots of a previous server run"""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for filename in os.listdir(METRICS_DIR):
+        os.remove(os.path.join(METRICS_DIR, filename))
+
+
+def init_metrics(app):
+    """Record request metrics for the app. Call before creating the MongoClient."""
+    app.before_request(before_request)
+    app.after_request(after_request)
+    monitoring.register(MongoCommandCounter())
+    HTTPAdapter.send = counting_adapter_send
@@ -0,0 +1,104 @@
+"""
+Rolling per-title pageview counts for the last N days.
+
+Each title keeps one fixed-size array of daily views, used as a ring buffer
+indexed by the day's ordinal modulo N. Adding a newer day zeroes the slots
+that fell out of the window and drops titles with no views left, so memory
+stays bounded by the titles seen in the last N daily top lists.
+
+    window = PageviewWindow(30)
+    window.add_day(date(2025, 3, 25), [{"title": ..., "views": ...}, ...])
+    window.ranking(7, sort="velocity")
+
+Daily top lists are truncated, so a title missing from a day only had fewer
+views than that day's last entry. Velocity treats it as having exactly that
+many, which makes a newcomer's growth a lower bound rather than infinite.
+"""
+from array import array
+
+SORT_KEYS = ("views", "velocity")
+
+
+class PageviewWindow:
+    def __init__(self, days):
+        self.days = days
+        self.newest = None     # ordinal of the newest day in the window
+        self.cutoffs = {}      # ordinal -> fewest views in that day's top list
+        self.counts = {}       # title -> array of daily views, one slot per day
+
+    @property
+    def loaded_days(self):
+        return set(self.cutoffs)
+
+    def slot(self, ordinal):
+        return ordinal % self.days
+
+    def in_window(self, ordinal):
+        return self.newest is not None and self.newest - self.days < ordinal <= self.newest
+
+    def advance(self, ordinal):
+        """Move the newest day forward, clearing the days that fall out of the window"""
+        if self.newest is not None:
+            if ordinal - self.newest >= self.days:
+                self.counts = {}
+            else:
+                # The slots of the new days still hold the views of the days they replace
+                expired = [self.slot(day) for day in range(self.newest + 1, ordinal + 1)]
+                for title in list(self.counts):
+                    views = self.counts[title]
+                    for slot in expired:
+                        views[slot] = 0
+                    if not any(views):
+                        del self.counts[title]
+        self.newest = ordinal
+        self.cutoffs = {day: cutoff for day, cutoff in self.cutoffs.items() if self.in_window(day)}
+
+    def add_day(self, day, topics):
+        """Add one day's top list. Days older than the window are ignored."""
+        ordinal = day.toordinal()
+        if self.newest is None or ordinal > self.newest:
+            self.advance(ordinal)
+        if not self.in_window(ordinal) or not topics:
+            return
+
+        slot = self.slot(ordinal)
+        for topic in topics:
+            views = self.counts.get(topic['title'])
+            if views is None:
+                views = self.counts[topic['title']] = array('q', bytes(8 * self.days))
+            views[slot] = topic['views']
+        self.cutoffs[ordinal] = min(topic['views'] for topic in topics)
+
+    def ranking(self, window, sort="views"):
+        """
+        Titles ranked over the last `window` days ending at the newest day.
+        Each row has the window's total views and the newest day's growth over
+        the day before (None when either day is missing).
+        """
+        if self.newest is None:
+            return []
+
+        window_slots = [self.slot(day) for day in range(self.newest - min(window, self.days) + 1, self.newest + 1)]
+        today = self.slot(self.newest)
+        yesterday = self.slot(self.newest - 1)
+        previous_cutoff = self.cutoffs.get(self.newest - 1)
+
+        rows = []
+        for title, views in self.counts.items():
+            total = sum(views[slot] for slot in window_slots)
+            if not total:
+                continue
+            velocity = None
+            if views[today] and previous_cutoff:
+                before = views[yesterday] or previous_cutoff
+                velocity = round((views[today] - before) / before, 4)
+            rows.append({"title": title, "views": total, "velocity": velocity})
+
+        if sort == "velocity":
+            rows.sort(key=lambda row: (row["velocity"] is not None, row["velocity"] or 0, row["views"]), reverse=True)
+        else:
+            rows.sort(key=lambda row: row["views"], reverse=True)
+
+        for rank, row in enumerate(rows, start=1):
+            row["rank"] = rank
+        return rows
@@ -0,0 +1,130 @@
+"""
+Password hashing on a dedicated process pool.
+
+bcrypt is deliberately slow, about 250 ms of CPU at cost 12, and running it
+inline holds one of the few gunicorn threads for the whole time. Here it
+runs in PASSWORD_WORKERS child processes instead, so request threads only
+wait on a future and hashing can't starve other traffic of the GIL.
+
+At most PASSWORD_WORKERS + PASSWORD_QUEUE_SIZE operations are accepted at
+once. Past that hash_password() and check_password() raise PasswordServiceBusy
+straight away, which the routes turn into a 503 with Retry-After.
+
+Hashes are created with BCRYPT_ROUNDS. A stored hash with a different cost
+is rehashed in the background after the next successful login.
+
+start_pool() should be called once the imports are done but before the app
+starts any threads, because forking a process that already runs threads can
+leave the children holding locks nobody will release. Replacing a broken
+pool later has to fork from a running worker anyway; the children only run
+bcrypt, and the app's background threads are started per process on its
+first request rather than by after-fork hooks, so none start in them.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from flask_bcrypt import check_password_hash, generate_password_hash
+
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', 2))
+PASSWORD_QUEUE_SIZE = int(os.environ.get('PASSWORD_QUEUE_SIZE', 16))
+# Longest a request waits for its hash before giving up
+PASSWORD_TIMEOUT = 10
+# Seconds a rejected client is asked to wait before retrying
+RETRY_AFTER = 1
+
+
+class PasswordServiceBusy(Exception):
+    """Raised when the hashing queue is full or a hash took too long"""
+
+
+def hash_in_worker(password, rounds):
+    return generate_password_hash(password, rounds).decode('utf-8')
+
+
+def check_in_worker(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+def hash_cost(password_hash):
+    """The cost (log rounds) of a bcrypt hash like $2b$12$..."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE_SIZE)
+pool_lock = threading.Lock()
+pool = None
+
+
+def start_pool():
+    global pool
+    pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS, mp_context=multiprocessing.get_context('fork'))
+    # Fork every worker now rather than on the first login
+    for future in [pool.submit(hash_cost, "") for _ in range(PASSWORD_WORKERS)]:
+        future.result()
+
+
+def submit(fn, *args):
+    """Run fn in the pool, returning a future that releases its slot when done"""
+    if not slots.acquire(blocking=False):
+        raise PasswordServiceBusy("Password hashing queue is full")
+    try:
+        with pool_lock:
+            try:
+                future = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died, replace the pool
+                log.error("Password hashing pool broke, restarting it")
+                start_pool()
+                future = pool.submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def wait(future):
+    try:
+        return future.result(timeout=PASSWORD_TIMEOUT)
+    except TimeoutError:
+        raise PasswordServiceBusy("Password hashing timed out")
+
+
+def hash_password(password):
+    return wait(submit(hash_in_worker, password, BCRYPT_ROUNDS))
+
+
+def check_password(password_hash, password):
+    return wait(submit(check_in_worker, password_hash, password))
+
+
+def rehash_if_needed(users_collection, user_id, password_hash, password):
+    """Bring a hash to BCRYPT_ROUNDS in the background, skipped if the pool is busy"""
+    if hash_cost(password_hash) == BCRYPT_ROUNDS:
+        return False
+
+    def store(future):
+        try:
+            # Only replace the hash we checked, the password may have changed since
+            users_collection.update_one({"_id": user_id, "password": password_hash},
+                                        {"$set": {"password": future.result()}})
+        except Exception as e:
+            log.error("Error storing rehashed password: %s", e)
+
+    try:
+        submit(hash_in_worker, password, BCRYPT_ROUNDS).add_done_callback(store)
+        return True
+    except PasswordServiceBusy:
+        return False
+
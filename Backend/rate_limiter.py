@@ -0,0 +1,152 @@
+"""
+Token-bucket rate limiting for expensive routes, shared by all workers.
+
+Each route class has a bucket of `capacity` tokens that refills at `rate`
+tokens per second, kept separately per client IP and per user id. A
+request takes one token from each of its buckets and is answered 429 with
+Retry-After when one is empty. Tokens already taken from its other buckets
+are then given back, so a rejected request costs nothing.
+
+The client IP is the connection's address. Behind proxies, set
+TRUSTED_PROXY_HOPS to their number so the app takes the address they
+forwarded (werkzeug's ProxyFix); X-Forwarded-For is otherwise ignored, as
+any client can set it.
+
+Buckets live in the rate_limits collection, so the limits hold across
+gunicorn workers. Refilling and taking a token is a single atomic
+find_one_and_update with an update pipeline:
+
+    {"_id": "wikipedia:ip:203.0.113.7", "tokens": 13.4, "updatedAt": datetime}
+
+    @app.route('/wiki/random')
+    @rate_limited("wikipedia")
+    def random_wiki_article():
+        ...
+
+Routes that are only sometimes expensive call check_rate_limit() on the
+expensive path instead. If MongoDB can't be reached the request is let
+through rather than failed.
+"""
+import math
+from datetime import datetime
+from functools import wraps
+
+from flask import jsonify, request
+from pymongo import ReturnDocument
+
+from session_tokens import InvalidSession, bearer_token, verify_token
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+# route class -> (bucket capacity, tokens added per second)
+RATE_LIMITS = {
+    # Live Wikipedia calls: /wiki, /wiki/topics, /wiki/random and /search misses
+    "wikipedia": (20, 20 / 60),
+    # In-process BERT scoring: /user/<user_id>/bert-recommendations-test
+    "bert": (5, 5 / 60),
+    # Bulk ingestion: /populate-domains
+    "ingest": (2, 2 / 3600),
+}
+
+# Idle buckets are full again long before this, so MongoDB can drop them
+BUCKET_EXPIRY = 24 * 3600
+
+limits_db = None
+
+
+def take_token(key, capacity, rate):
+    """Take one token from the bucket. Returns 0 if allowed, else the seconds until a token is available."""
+    now = datetime.now()
+    elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updatedAt", now]}]}, 1000]}
+    bucket = limits_db.rate_limits.find_one_and_update(
+        {"_id": key},
+        [
+            # Refill for the time since the last request, up to capacity
+            {"$set": {
+                "tokens": {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]},
+                                                        {"$multiply": [elapsed_seconds, rate]}]}]},
+                "updatedAt": now
+            }},
+            # Both fields are computed from the refilled count
+            {"$set": {
+                "allowed": {"$gte": ["$tokens", 1]},
+                "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]}
+            }}
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    if bucket["allowed"]:
+        return 0
+    return max(1, math.ceil((1 - bucket["tokens"]) / rate))
+
+
+def refund_token(key, capacity):
+    """Give back a token taken for a request that was rejected by another bucket"""
+    limits_db.rate_limits.update_one(
+        {"_id": key},
+        [{"$set": {"tokens": {"$min": [capacity, {"$add": ["$tokens", 1]}]}}}]
+    )
+
+
+def client_ip():
+    # ProxyFix has already replaced this with the forwarded address behind trusted proxies
+    return request.remote_addr
+
+
+def session_user_id():
+    token = bearer_token(request)
+    if not token:
+        return None
+    try:
+        return verify_token(token)["sub"]
+    except InvalidSession:
+        return None
+
+
+def check_rate_limit(route_class, user_id=None):
+    """None if the request may go ahead, else a 429 response with Retry-After"""
+    capacity, rate = RATE_LIMITS[route_class]
+    keys = [f"{route_class}:ip:{client_ip()}"]
+    user_id = user_id or session_user_id()
+    if user_id:
+        keys.append(f"{route_class}:user:{user_id}")
+
+    taken = []
+    for key in keys:
+        try:
+            retry_after = take_token(key, capacity, rate)
+            if retry_after:
+                for taken_key in taken:
+                    refund_token(taken_key, capacity)
+        except Exception as e:
+            log.error("Error checking rate limit: %s", e)
+            return None
+        if retry_after:
+            return jsonify({"error": "Too many requests, please try again later"}), 429, \
+                {"Retry-After": str(retry_after)}
+        taken.append(key)
+    return None
+
+
+def rate_limited(route_class):
+    """Limit a view by client IP and, when known, by the user_id URL parameter or session"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limited = check_rate_limit(route_class, kwargs.get("user_id"))
+            if limited:
+                return limited
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_rate_limiter(database):
+    global limits_db
+    limits_db = database
+    try:
+        limits_db.rate_limits.create_index("updatedAt", expireAfterSeconds=BUCKET_EXPIRY)
+    except Exception as e:
+        log.error("Error creating rate limit index: %s", e)
@@ -0,0 +1,107 @@
+"""
+Planning steps of the standard recommendations, kept free of database access.
+
+build_standard_recommendations turns the user's domain scores into
+percentiles, splits the article budget into per-domain quotas, samples the
+articles and then labels, tops up and deduplicates them. The functions here
+are the CPU-side parts of that, so they can be benchmarked on their own
+(benchmarks/recommendation_microbenchmark.py).
+"""
+
+# Domains above this share of the user's score don't get random or fallback articles
+HIGH_PERCENTILE = 50
+
+
+def domain_percentiles(domain_scores):
+    """Each domain's share of the total score, in percent. Equal shares without any score."""
+    total_score = sum(domain_scores.values())
+    if total_score > 0:
+        return {domain: (score / total_score) * 100 for domain, score in domain_scores.items()}
+    # If no interactions, equal distribution
+    return {domain: 10 for domain in domain_scores}  # 10% each for 10 domains
+
+
+def dominant_domains(percentiles):
+    """Domains with more than HIGH_PERCENTILE percent of the score"""
+    return [domain for domain, percentile in percentiles.items() if percentile > HIGH_PERCENTILE]
+
+
+def score_quotas(percentiles, existing_collections, total):
+    """Split `total` articles between the domains in proportion to their percentiles"""
+    counts = {}
+    remaining = total
+
+    for domain, percentile in percentiles.items():
+        # Skip domains with no collections
+        if domain not in existing_collections:
+            continue
+        counts[domain] = min(int(round(total * (percentile / 100))), remaining)
+        remaining -= counts[domain]
+
+    # Rounding can leave a few articles unallocated, spread them evenly
+    if remaining > 0:
+        valid_domains = [domain for domain in percentiles if domain in existing_collections]
+        if valid_domains:
+            per_domain = remaining // len(valid_domains)
+            for domain in valid_domains:
+                counts[domain] = counts.get(domain, 0) + per_domain
+                remaining -= per_domain
+
+            # Add any remaining to the first domain
+            if remaining > 0:
+                counts[valid_domains[0]] = counts.get(valid_domains[0], 0) + remaining
+    return counts
+
+
+def even_quotas(domains, total):
+    """An equal share per domain, at least one, until `total` articles are planned"""
+    if not domains:
+        return []
+    per_domain = max(1, total // len(domains))
+    quotas = []
+    planned = 0
+    for domain in domains:
+        if planned >= total:
+            break
+        quotas.append((domain, per_domain))
+        planned += per_domain
+    return quotas
+
+
+def label_sampled(sampled, score_counts, percentiles):
+    """
+    Split each domain's sampled articles into the score-based ones, the
+    first score_counts[domain], and random ones. Returns (score_based, random).
+    """
+    score_based = []
+    random_articles = []
+    for domain, domain_articles in sampled.items():
+        score_count = score_counts.get(domain, 0)
+        for i, article in enumerate(domain_articles):
+            article["domain_score"] = float(percentiles[domain])
+            if i < score_count:
+                article["recommendation_source"] = "score_based"
+                score_based.append(article)
+            else:
+                article["recommendation_source"] = "random"
+                random_articles.append(article)
+    return score_based, random_articles
+
+
+def with_recommended(excluded_ids, articles):
+    """Copy of the per-domain exclusion sets with the recommended articles added"""
+    excluded = {domain: set(ids) for domain, ids in excluded_ids.items()}
+    for article in articles:
+        excluded.setdefault(article["domain"], set()).add(article["id"])
+    return excluded
+
+
+def unique_by_id(articles):
+    """Drop repeated article ids, keeping the first occurrence"""
+    seen_ids = set()
+    unique_articles = []
+    for article in articles:
+        if article["id"] not in seen_ids:
+            seen_ids.add(article["id"])
+            unique_articles.append(article)
+    return unique_articles
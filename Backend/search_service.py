@@ -0,0 +1,341 @@
+"""
+Search over our own articles, with a shared cache for Wikipedia searches.
+
+/search first looks up the query in a title index built from the articles
+already stored in the domain collections. Only when that doesn't fill the
+requested limit does it go to Wikipedia, and those results are cached under
+the normalized query:
+
+    search_cache    per-worker LRU in front of the search_cache collection,
+                    which all workers share and MongoDB expires by TTL
+    TitleIndex      inverted index of title tokens, with a sorted token list
+                    so the last query word also matches as a prefix
+
+/search?source=local skips Wikipedia entirely and ranks articles by BM25
+over their titles, summaries and sections (see fulltext_index). That index
+is saved to SEARCH_INDEX_PATH after each scan that added articles, so a
+restarted worker loads it and only scans articles inserted since.
+
+/search/suggest answers from a SuggestIndex over article titles and the
+week's trending topics, ranked by engagement. New articles are added as
+they are indexed, and the whole index is rebuilt every
+SUGGEST_REBUILD_INTERVAL to pick up new likes, comments and trending topics.
+
+Each worker builds its indexes from the domain collections in a background
+thread, then picks up newly inserted articles on a short interval. Articles
+ingested by this worker are indexed right away with index_article().
+"""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from bson.objectid import ObjectId
+
+from fulltext_index import FullTextIndex
+from suggest_index import SuggestIndex
+from structured_logging import get_logger
+from trending_service import get_trending
+
+log = get_logger(__name__)
+
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 6 * 3600))
+# Empty results are retried sooner, the query may just have failed
+SEARCH_CACHE_EMPTY_TTL = 300
+SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', 1024))
+
+INDEX_INTERVAL = int(os.environ.get('SEARCH_INDEX_INTERVAL', 60))
+# Re-read a little before the last scan, inserts from other workers may land late
+INDEX_OVERLAP = 60
+SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH', 'search_index.bin')
+
+SUGGEST_REBUILD_INTERVAL = int(os.environ.get('SUGGEST_REBUILD_INTERVAL', 3600))
+# Trending topics of the last week offered as suggestions
+SUGGEST_TRENDING_TOPICS = 200
+
+# Fields read from the domain collections for indexing
+ARTICLE_PROJECTION = {"id": 1, "title": 1, "summary": 1, "url": 1, "image_url": 1, "sections": 1, "likes": 1}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def normalize_query(query):
+    """Lowercase words without punctuation, so "Black  Holes?" and "black holes" share a cache entry"""
+    return " ".join(tokenize(query))
+
+
+class SearchCache:
+    """LRU with expiry in each worker, backed by a TTL collection shared by all workers"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.collection = None
+
+    def init(self, collection):
+        self.collection = collection
+        try:
+            # MongoDB removes documents once expireAt has passed
+            self.collection.create_index("expireAt", expireAfterSeconds=0)
+        except Exception as e:
+            log.error("Error creating search cache index: %s", e)
+
+    def remember(self, key, value, expires_at):
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def get(self, key):
+        now = datetime.now()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                return entry[1]
+            self.entries.pop(key, None)
+
+        if self.collection is None:
+            return None
+        # The TTL monitor only runs once a minute, so check expiry ourselves too
+        stored = self.collection.find_one({"_id": key, "expireAt": {"$gt": now}})
+        if not stored:
+            return None
+        self.remember(key, stored["value"], stored["expireAt"])
+        return stored["value"]
+
+    def set(self, key, value, ttl=None):
+        expires_at = datetime.now() + timedelta(seconds=ttl or self.ttl)
+        self.remember(key, value, expires_at)
+        if self.collection is None:
+            return
+        try:
+            self.collection.replace_one({"_id": key}, {"value": value, "expireAt": expires_at}, upsert=True)
+        except Exception as e:
+            log.error("Error storing search cache entry: %s", e)
+
+
+class TitleIndex:
+    """Articles found by the words of their title, the last query word matching as a prefix"""
+
+    def __init__(self):
+        self.postings = {}     # token -> set of (domain, id)
+        self.tokens = []       # every token, sorted for prefix lookups
+        self.articles = {}     # (domain, id) -> article fields returned by search
+        self.lock = threading.Lock()
+
+    def add(self, domain, article):
+        key = (domain, article["id"])
+        if not article.get("title"):
+            return False
+
+        with self.lock:
+            if key in self.articles:
+                return False
+            self.articles[key] = {
+                "id": article["id"],
+                "url": article.get("url"),
+                "title": article["title"],
+                "summary": article.get("summary", ""),
+                "image_url": article.get("image_url"),
+                "domain": domain,
+                "title_length": len(tokenize(article["title"]))
+            }
+            for token in set(tokenize(article["title"])):
+                if token not in self.postings:
+                    self.postings[token] = set()
+                    insort(self.tokens, token)
+                self.postings[token].add(key)
+        return True
+
+    def prefix_matches(self, prefix):
+        """Keys of articles with a title token starting with prefix"""
+        keys = set()
+        i = bisect_left(self.tokens, prefix)
+        while i < len(self.tokens) and self.tokens[i].startswith(prefix):
+            keys |= self.postings[self.tokens[i]]
+            i += 1
+        return keys
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self.lock:
+            # Every word must appear in the title, the last one may still be being typed
+            matches = self.prefix_matches(terms[-1])
+            for term in terms[:-1]:
+                matches &= self.postings.get(term, set())
+            articles = [self.articles[key] for key in matches]
+
+        # Titles made up mostly of the query words rank first
+        def coverage(article):
+            return len(terms) / max(article["title_length"], len(terms))
+
+        articles.sort(key=lambda article: (coverage(article), -len(article["title"])), reverse=True)
+        return [
+            {
+                "id": article["id"],
+                "url": article["url"],
+                "title": article["title"],
+                "summary": article["summary"],
+                "image_url": article["image_url"],
+                "domain": article["domain"],
+                "search_query": query,
+                "relevance_score": round(coverage(article), 4),
+                "source": "local"
+            }
+            for article in articles[:limit]
+        ]
+
+
+search_cache = SearchCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+title_index = TitleIndex()
+fulltext_index = FullTextIndex()
+suggest_index = SuggestIndex()
+
+
+def add_suggestion(domain, article):
+    # Looked up on every call, rebuild_suggestions swaps the index
+    suggest_index.add_article(domain, article)
+
+
+# Callables taking (domain, article) that index newly seen articles
+article_indexes = [title_index.add, fulltext_index.add, add_suggestion]
+
+search_db = None
+search_domains = []
+indexer_pid = None
+indexer_lock = threading.Lock()
+
+
+def search_cache_key(query, limit):
+    return f"wikipedia:{limit}:{normalize_query(query)}"
+
+
+def register_article_index(add):
+    article_indexes.append(add)
+
+
+def index_article(domain, article):
+    """Add an article to every search index of this worker"""
+    for add in article_indexes:
+        try:
+            add(domain, article)
+        except Exception as e:
+            log.error("Error indexing article %s: %s", article.get("id"), e)
+
+
+def scan_articles(since=None):
+    """Index the articles inserted since `since` (a UTC datetime), or all of them"""
+    query = {"_id": {"$gt": ObjectId.from_datetime(since)}} if since else {}
+    for domain in search_domains:
+        for article in search_db[domain].find(query, ARTICLE_PROJECTION):
+            index_article(domain, article)
+
+
+def search_local(query, limit, domains=None):
+    """BM25 ranked articles from the domain collections, without any network calls"""
+    return [
+        {
+            "id": article["id"],
+            "url": article["url"],
+            "title": article["title"],
+            "summary": article["summary"],
+            "image_url": article["image_url"],
+            "domain": article["domain"],
+            "search_query": query,
+            "relevance_score": round(score, 4),
+            "source": "local"
+        }
+        for score, article in fulltext_index.search(query, limit, domains)
+    ]
+
+
+def rebuild_suggestions():
+    """Build a fresh suggestion index with current engagement and trending topics, then swap it in"""
+    global suggest_index
+    index = SuggestIndex()
+    for domain in search_domains:
+        for article in search_db[domain].aggregate([
+            {"$project": {"_id": 0, "id": 1, "title": 1, "likes": 1,
+                          "comment_count": {"$size": {"$ifNull": ["$comments", []]}}}}
+        ]):
+            index.add_article(domain, article)
+
+    try:
+        trending = get_trending(SUGGEST_TRENDING_TOPICS, window=7)
+    except Exception as e:
+        log.error("Error loading trending topics for suggestions: %s", e)
+        trending = None
+    for topic in trending["topics"] if trending else []:
+        index.add_trending(topic)
+
+    suggest_index = index
+
+
+def load_saved_index():
+    """Load the saved full-text index into every index. Returns the time to scan from, or None for a full scan."""
+    if fulltext_index.documents:
+        return None
+    try:
+        if not fulltext_index.load(SEARCH_INDEX_PATH):
+            return None
+    except Exception as e:
+        log.error("Error loading search index: %s", e)
+        return None
+
+    for document in list(fulltext_index.documents):
+        index_article(document["domain"], document)
+    return fulltext_index.indexed_until
+
+
+def run_indexer():
+    since = load_saved_index()
+    suggestions_built = 0
+    while True:
+        started = datetime.now(timezone.utc)
+        try:
+            if time.time() - suggestions_built > SUGGEST_REBUILD_INTERVAL:
+                rebuild_suggestions()
+                suggestions_built = time.time()
+            scan_articles(since)
+            since = started - timedelta(seconds=INDEX_OVERLAP)
+            fulltext_index.indexed_until = since
+            if fulltext_index.dirty:
+                fulltext_index.save(SEARCH_INDEX_PATH)
+        except Exception as e:
+            log.error("Error indexing articles for search: %s", e)
+        time.sleep(INDEX_INTERVAL)
+
+
+def start_indexer():
+    """Start the indexer thread for this process if it isn't running yet"""
+    global indexer_pid
+    # Threads don't survive a fork, so a forked process starts its own
+    if indexer_pid == os.getpid():
+        return
+    with indexer_lock:
+        if indexer_pid != os.getpid():
+            threading.Thread(target=run_indexer, daemon=True).start()
+            indexer_pid = os.getpid()
+
+
+def init_search(database, domains):
+    """Connect the search cache and start indexing the domain collections in this process"""
+    global search_db, search_domains
+    search_db = database
+    search_domains = list(domains)
+    search_cache.init(database.search_cache)
+    start_indexer()
@@ -1,12 +1,26 @@
 from flask import Blueprint, Flask, jsonify, request
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson.objectid import ObjectId
 import pickle
 import re
+import queue
+import threading
+import uuid
+from metrics import timed
+from structured_logging import get_logger
 from cachelib import SimpleCache
+from user_profiles import get_profile, profile_domain_scores, comment_updates, uncounted_comments, ALL_DOMAINS
+from feeds import read_feed, save_feed, register_feed_builder
+from cache_events import register_user_cache, user_invalidated_at
+from article_sampling import sample_from_domains, group_by_domain, interacted_ids_by_domain
+from recommendation_plan import (domain_percentiles, dominant_domains, score_quotas, even_quotas,
+                                 label_sampled, with_recommended, unique_by_id)
+
+log = get_logger(__name__)
 
 # Create a Blueprint instead of a Flask app
 sentiment_blueprint = Blueprint('sentiment', __name__)
@@ -20,18 +34,22 @@ try:
         sentiment_model = pickle.load(f)
     with open('vectorizer.pkl', 'rb') as f:
         vectorizer = pickle.load(f)
-    print("Custom sentiment model loaded successfully")
+    log.info("Custom sentiment model loaded")
 except Exception as e:
-    print(f"Error loading custom sentiment model: {str(e)}")
+    log.error("Error loading custom sentiment model: %s", e)
     # Fallback to NLTK if custom model fails to load
     import nltk
     from nltk.sentiment.vader import SentimentIntensityAnalyzer
     try:
         nltk.download('vader_lexicon', quiet=True)
         sentiment_analyzer = SentimentIntensityAnalyzer()
-        print("Fallback to NLTK VADER sentiment analyzer")
+        log.info("Falling back to the NLTK VADER sentiment analyzer")
     except:
-        print("NLTK resource download failed. Sentiment analysis will be disabled.")
+        log.error("NLTK resource download failed, sentiment analysis is disabled")
+
+# Patterns used by preprocess_text, compiled once at import
+NON_ALPHA_PATTERN = re.compile(r'[^a-zA-Z\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
 
 def preprocess_text(text):
     """Preprocess text for sentiment analysis"""
@@ -40,9 +58,9 @@ def preprocess_text(text):
     # Convert to lowercase
     text = text.lower()
     # Remove special characters and numbers
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    text = NON_ALPHA_PATTERN.sub('', text)
     # Remove extra spaces
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = WHITESPACE_PATTERN.sub(' ', text).strip()
     return text
 
 def analyze_sentiment(text):
@@ -61,7 +79,8 @@ def analyze_sentiment(text):
             # Convert to bag of words
             bow = vectorizer.transform([processed_text])
             # Predict sentiment (-1, 0, 1)
-            return sentiment_model.predict(bow)[0]
+            with timed("model_inference_seconds", model="sentiment"):
+                return sentiment_model.predict(bow)[0]
         # Fallback to NLTK if custom model is not available
         elif 'sentiment_analyzer' in globals():
             sentiment_scores = sentiment_analyzer.polarity_scores(text)
@@ -71,281 +90,401 @@ def analyze_sentiment(text):
             # If no sentiment analysis is available
             return 0
     except Exception as e:
-        print(f"Error analyzing sentiment: {str(e)}")
+        log.error("Error analyzing sentiment: %s", e)
         return 0  # Return neutral sentiment on error
 
-@sentiment_blueprint.route('/user/<user_id>/standard-recommendations', methods=['GET'])
-def get_standard_recommendations(user_id):
-    # Get database from app context
-    db = sentiment_blueprint.db
-    users_collection = db.users
+def analyze_sentiment_batch(texts):
+    """
+    Analyze sentiment of many texts at once, returning one score per text.
+    Scores match analyze_sentiment, but the custom model transforms all texts
+    into a single sparse matrix and predicts once.
+    """
+    scores = [0] * len(texts)
     
+    # Empty texts stay neutral
+    indices = [i for i, text in enumerate(texts) if text]
+    if not indices:
+        return scores
+        
     try:
-        # Check cache first
-        cache_key = f"std_rec_{user_id}"
-        cached_result = cache.get(cache_key)
-        if cached_result:
-            return jsonify(cached_result), 200
+        if 'sentiment_model' in globals() and 'vectorizer' in globals():
+            processed_texts = [preprocess_text(texts[i]) for i in indices]
+            bow = vectorizer.transform(processed_texts)
+            with timed("model_inference_seconds", model="sentiment_batch"):
+                predictions = sentiment_model.predict(bow)
+            for i, prediction in zip(indices, predictions):
+                scores[i] = prediction
+        elif 'sentiment_analyzer' in globals():
+            for i in indices:
+                scores[i] = sentiment_analyzer.polarity_scores(texts[i])['compound']
+        return scores
+    except Exception as e:
+        log.error("Error analyzing sentiment batch: %s", e)
+        return [0] * len(texts)  # Return neutral sentiment on error
+
+def sentiment_label(score):
+    """Collapse a sentiment score to the stored label: 1, 0 or -1"""
+    if score > 0:
+        return 1
+    if score < 0:
+        return -1
+    return 0
+
+# Comments waiting to be scored, drained by a background worker thread.
+# A comment is stored without a label until it is scored, so anything still
+# queued when the process exits is picked up again by the next worker to start
+# (see SENTIMENT_RECOVERY_WINDOW), or by backfill_sentiment.py.
+sentiment_queue = queue.Queue()
+SENTIMENT_BATCH_SIZE = 100
+sentiment_worker_lock = threading.Lock()
+sentiment_worker_pid = None
+# On start, one process scores the comments left unscored in this many seconds
+# before it. Older ones are left to backfill_sentiment.py.
+SENTIMENT_RECOVERY_WINDOW = int(os.environ.get('SENTIMENT_RECOVERY_WINDOW', 86400))
+# Processes starting within this many seconds of the last recovery skip it
+SENTIMENT_RECOVERY_INTERVAL = int(os.environ.get('SENTIMENT_RECOVERY_INTERVAL', 600))
+
+def store_comment_sentiments(db, comments, update_profiles=True):
+    """
+    Score a batch of comments and store the label on both the article comment
+    and the user's commentedArticles entry.
+    Each comment is a dict with domain, articleId, commentId, userId, text
+    and commentedAt.
+    Only comments without a label yet are stored, so scoring a comment twice
+    is harmless. With update_profiles, each user's comment score is adjusted
+    for the newly stored labels as well.
+    Returns the number of labels stored.
+    """
+    if not comments:
+        return 0
         
-        # Convert the string user ID to MongoDB ObjectId
-        user_id_obj = ObjectId(user_id)
+    labels = [sentiment_label(score) for score in analyze_sentiment_batch([c['text'] for c in comments])]
+    
+    # The user entry is labelled first and only once, so another worker or
+    # the backfill scoring the same comment doesn't count it in the profile again.
+    # Entries are tagged with this batch's id to tell which labels it stored.
+    batch_id = uuid.uuid4().hex
+    user_updates = [UpdateOne(
+        {"_id": comment['userId'],
+         "commentedArticles": {"$elemMatch": {"commentId": comment['commentId'],
+                                              "sentiment": {"$exists": False}}}},
+        {"$set": {"commentedArticles.$.sentiment": label,
+                  "commentedArticles.$.sentimentBatch": batch_id}}
+    ) for comment, label in zip(comments, labels)]
+    result = db.users.bulk_write(user_updates, ordered=False)
+    if not result.modified_count:
+        return 0
+    
+    stored_ids = set()
+    for user in db.users.find(
+        {"_id": {"$in": list({comment['userId'] for comment in comments})},
+         "commentedArticles.sentimentBatch": batch_id},
+        {"commentedArticles.commentId": 1, "commentedArticles.sentimentBatch": 1}
+    ):
+        stored_ids.update(item.get("commentId") for item in user.get("commentedArticles", [])
+                          if item.get("sentimentBatch") == batch_id)
+    stored = [(comment, label) for comment, label in zip(comments, labels)
+              if comment['commentId'] in stored_ids]
+    
+    # Group article updates so each collection gets one bulk write
+    article_updates = {}
+    for comment, label in stored:
+        article_updates.setdefault(comment['domain'], []).append(UpdateOne(
+            {"id": comment['articleId'], "comments.id": comment['commentId']},
+            {"$set": {"comments.$.sentiment": label}}
+        ))
+    for domain, updates in article_updates.items():
+        db[domain].bulk_write(updates, ordered=False)
+    
+    if update_profiles and stored:
+        # Profiles that don't exist yet are built from history later, so don't upsert
+        stored_labels = {comment['commentId']: label for comment, label in stored}
+        uncounted = uncounted_comments(db, [comment for comment, _ in stored])
+        labels = [stored_labels[comment['commentId']] for comment in uncounted]
+        profile_updates = [UpdateOne({"_id": user_id}, {"$inc": inc})
+                           for user_id, inc in comment_updates(uncounted, labels)]
+        if profile_updates:
+            db.user_profiles.bulk_write(profile_updates, ordered=False)
+    
+    return len(stored)
+
+def claim_recovery(db, now):
+    """
+    Take the recovery lock so only one of the workers starting together scans
+    for unscored comments. The lock is kept, so the next recovery waits until
+    it expires.
+    """
+    locks = db.sentiment_recovery_locks
+    locks.delete_one({"_id": "recovery", "lockedAt": {"$lt": now - timedelta(seconds=SENTIMENT_RECOVERY_INTERVAL)}})
+    try:
+        locks.insert_one({"_id": "recovery", "lockedAt": now})
+        return True
+    except DuplicateKeyError:
+        return False
+
+def sentiment_worker(started_at):
+    """Drain the sentiment queue in batches for the lifetime of the worker process"""
+    # Comments queued by a process that exited before scoring them
+    try:
+        db = sentiment_blueprint.db
+        if claim_recovery(db, started_at):
+            recovered = backfill_comment_sentiment(
+                db,
+                commented_after=started_at - timedelta(seconds=SENTIMENT_RECOVERY_WINDOW),
+                commented_before=started_at
+            )
+            if recovered:
+                log.info("Stored sentiment for %d comments left unscored", recovered)
+    except Exception as e:
+        log.error("Error scoring unscored comments: %s", e)
+    
+    while True:
+        batch = [sentiment_queue.get()]
+        while len(batch) < SENTIMENT_BATCH_SIZE:
+            try:
+                batch.append(sentiment_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            store_comment_sentiments(sentiment_blueprint.db, batch)
+        except Exception as e:
+            log.error("Error storing comment sentiment: %s", e)
+
+def start_sentiment_worker():
+    """Start the worker thread for this process if it isn't running yet"""
+    global sentiment_worker_pid
+    
+    # Gunicorn forks workers, so start one thread per process on first use
+    with sentiment_worker_lock:
+        if sentiment_worker_pid != os.getpid():
+            threading.Thread(target=sentiment_worker, args=(datetime.now(),), daemon=True).start()
+            sentiment_worker_pid = os.getpid()
+
+def enqueue_comment_sentiment(domain, article_id, comment_id, user_id, text, commented_at):
+    """Queue a new comment to be scored off the request path"""
+    start_sentiment_worker()
+    sentiment_queue.put({
+        "domain": domain,
+        "articleId": article_id,
+        "commentId": comment_id,
+        "userId": user_id,
+        "text": text,
+        "commentedAt": commented_at
+    })
+
+def backfill_comment_sentiment(db, batch_size=500, commented_after=None, commented_before=None):
+    """
+    Score every stored comment that has no sentiment label yet, optionally
+    only the ones written from commented_after and before commented_before.
+    Comments are collected from users' commentedArticles and scored in bulk
+    batches. Profiles are updated for comments they don't count yet.
+    """
+    total = 0
+    batch = []
+    
+    unscored = {"sentiment": {"$exists": False}}
+    commented_at = {}
+    if commented_after:
+        commented_at["$gte"] = commented_after
+    if commented_before:
+        commented_at["$lt"] = commented_before
+    if commented_at:
+        unscored["commentedAt"] = commented_at
+    users = db.users.find(
+        {"commentedArticles": {"$elemMatch": unscored}},
+        {"commentedArticles": 1}
+    )
+    
+    for user in users:
+        for item in user.get("commentedArticles", []):
+            if "sentiment" in item or not item.get("commentId"):
+                continue
+            if commented_at and not item.get("commentedAt"):
+                continue
+            if commented_after and item["commentedAt"] < commented_after:
+                continue
+            if commented_before and item["commentedAt"] >= commented_before:
+                continue
+            batch.append({
+                "domain": item.get("domain", "").lower(),
+                "articleId": item.get("articleId"),
+                "commentId": item["commentId"],
+                "userId": user["_id"],
+                "text": item.get("commentText", ""),
+                "commentedAt": item.get("commentedAt")
+            })
+            
+            if len(batch) >= batch_size:
+                total += store_comment_sentiments(db, batch)
+                batch = []
+    
+    total += store_comment_sentiments(db, batch)
+    return total
+
+def build_standard_recommendations(db, user_id):
+    """
+    Compute a user's standard recommendations.
+    Returns (response_data, status) so the result can be served or stored as a feed.
+    """
+    users_collection = db.users
+    
+    # Convert the string user ID to MongoDB ObjectId
+    user_id_obj = ObjectId(user_id)
+    
+    # Find the user
+    user = users_collection.find_one({"_id": user_id_obj})
+    if not user:
+        return {"error": "User not found"}, 404
+    
+    # Get user's interested domains and interactions
+    interested_domains = user.get("interestedDomains", [])
+    liked_articles = user.get("likedArticles", [])
+    
+    if not interested_domains:
+        return {"error": "User has no interested domains selected"}, 404
         
-        # Find the user
-        user = users_collection.find_one({"_id": user_id_obj})
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+    # Convert domain names to lowercase for collection names
+    domain_collections = [domain.lower() for domain in interested_domains]
+    
+    # Group interacted article IDs by domain to avoid recommending them
+    excluded_ids = interacted_ids_by_domain(user)
+    
+    # Look up the existing collections once instead of once per domain
+    existing_collections = set(db.list_collection_names())
+    
+    recommended_articles = []
+    high_percentile_domains = []
+    
+    # Get 30 articles based on user scores and 10 random articles
+    articles_to_fetch_by_score = 30
+    articles_to_fetch_random = 10
+    
+    # Check if we have enough liked articles to use the advanced algorithm
+    if len(liked_articles) >= 5:
+        # Read running domain weights from the user's profile instead of
+        # walking the whole interaction history
+        profile = get_profile(db, user, analyze_sentiment_batch)
+        domain_scores = profile_domain_scores(profile)
         
-        # Get user's interested domains and interactions
-        interested_domains = user.get("interestedDomains", [])
-        liked_articles = user.get("likedArticles", [])
-        commented_articles = user.get("commentedArticles", [])
-        shared_articles = user.get("sharedArticles", [])
+        # Calculate percentiles and the domains already well-represented
+        percentiles = domain_percentiles(domain_scores)
+        high_percentile_domains = dominant_domains(percentiles)
         
-        if not interested_domains:
-            return jsonify({"error": "User has no interested domains selected"}), 404
-            
-        # Convert domain names to lowercase for collection names
-        domain_collections = [domain.lower() for domain in interested_domains]
+        # Distribute articles according to percentiles
+        domain_article_counts = score_quotas(percentiles, existing_collections, articles_to_fetch_by_score)
         
-        # Create a set of all interacted article IDs to avoid recommending them
-        interacted_articles = set()
-        for item in liked_articles + commented_articles + shared_articles:
-            if 'articleId' in item and 'domain' in item:
-                interacted_articles.add((item['articleId'], item['domain']))
+        # Plan additional random articles from domains with percentile <= 50,
+        # an equal share per domain until the random quota is covered
+        low_percentile_domains = [d for d in domain_scores.keys() 
+                                 if d not in high_percentile_domains
+                                 and d in existing_collections]
+        random_article_counts = dict(even_quotas(low_percentile_domains, articles_to_fetch_random))
         
-        recommended_articles = []
+        # Fetch score-based and random articles in one query. Each domain's
+        # articles come from a single $sample so the two sets never overlap
+        quotas = [(domain, domain_article_counts.get(domain, 0) + random_article_counts.get(domain, 0))
+                  for domain in domain_scores.keys()]
+        sampled = group_by_domain(sample_from_domains(db, quotas, excluded_ids))
         
-        # Get 30 articles based on user scores and 10 random articles
-        articles_to_fetch_by_score = 30
-        articles_to_fetch_random = 10
+        score_based_articles, random_articles = label_sampled(sampled, domain_article_counts, percentiles)
         
-        # Check if we have enough liked articles to use the advanced algorithm
-        if len(liked_articles) >= 5:
-            # Calculate domain scores based on interactions
-            domain_scores = {domain.lower(): 0 for domain in ["nature", "education", "entertainment", "technology", 
-                            "science", "political", "lifestyle", "social", "space", "food"]}
-            
-            # Track domain comment counts separately for sentiment analysis
-            domain_comment_counts = {domain.lower(): 0 for domain in domain_scores.keys()}
-            
-            # Calculate scores by domain
-            for article in liked_articles:
-                if 'domain' in article:
-                    domain = article['domain'].lower()
-                    if domain in domain_scores:
-                        domain_scores[domain] += 0.5
-            
-            for article in shared_articles:
-                if 'domain' in article:
-                    domain = article['domain'].lower()
-                    if domain in domain_scores:
-                        domain_scores[domain] += 0.1
-            
-            # Apply custom sentiment analysis to comments
-            for article in commented_articles:
-                if 'domain' in article and 'commentText' in article:
-                    domain = article['domain'].lower()
-                    if domain in domain_scores:
-                        # Get sentiment score using custom model (-1, 0, or 1)
-                        sentiment_score = analyze_sentiment(article['commentText'])
-                        
-                        # Adjust comment count based on sentiment
-                        if sentiment_score > 0:  # Positive sentiment
-                            domain_comment_counts[domain] += 1
-                        elif sentiment_score < 0:  # Negative sentiment
-                            domain_comment_counts[domain] = max(0, domain_comment_counts[domain] - 1)
-                        # Neutral sentiment leaves count unchanged
-            
-            # Add sentiment-adjusted comment scores to domain scores
-            for domain, comment_count in domain_comment_counts.items():
-                domain_scores[domain] += comment_count * 0.2
-            
-            # Calculate percentiles
-            total_score = sum(domain_scores.values())
-            domain_percentiles = {}
-            
-            if total_score > 0:
-                for domain, score in domain_scores.items():
-                    domain_percentiles[domain] = (score / total_score) * 100
-            else:
-                # If no interactions, equal distribution
-                for domain in domain_scores:
-                    domain_percentiles[domain] = 10  # 10% each for 10 domains
-            
-            # Select articles based on domain percentiles
-            high_percentile_domains = [d for d, p in domain_percentiles.items() if p > 50]
-            
-            # Distribute articles according to percentiles
-            domain_article_counts = {}
-            remaining = articles_to_fetch_by_score
-            
-            for domain, percentile in domain_percentiles.items():
-                # Skip domains with no collections
-                if domain not in db.list_collection_names():
-                    continue
-                    
-                # Calculate articles to fetch for this domain
-                domain_count = int(round(articles_to_fetch_by_score * (percentile / 100)))
-                domain_article_counts[domain] = min(domain_count, remaining)
-                remaining -= domain_article_counts[domain]
-            
-            # If we didn't allocate all 30 articles, distribute the remainder
-            if remaining > 0:
-                valid_domains = [d for d in domain_scores.keys() if d in db.list_collection_names()]
-                if valid_domains:
-                    per_domain = remaining // len(valid_domains)
-                    for domain in valid_domains:
-                        domain_article_counts[domain] = domain_article_counts.get(domain, 0) + per_domain
-                        remaining -= per_domain
-                    
-                    # Add any remaining to the first domain
-                    if remaining > 0 and valid_domains:
-                        domain_article_counts[valid_domains[0]] = domain_article_counts.get(valid_domains[0], 0) + remaining
-            
-            # Fetch the calculated number of articles from each domain
-            for domain, count in domain_article_counts.items():
-                if count <= 0:
-                    continue
-                    
-                # Get article IDs to exclude
-                exclude_ids = [article_id for article_id, article_domain in interacted_articles if article_domain == domain]
-                
-                # Get random articles from this domain
-                domain_articles = list(db[domain].aggregate([
-                    {"$match": {"id": {"$nin": exclude_ids}}},
-                    {"$sample": {"size": count}},
-                    {"$project": {"_id": 0}}
-                ]))
-                
-                # Add domain name and score info to each article
-                for article in domain_articles:
-                    article["domain"] = domain
-                    article["domain_score"] = float(domain_percentiles[domain])
-                    article["recommendation_source"] = "score_based"
-                
-                recommended_articles.extend(domain_articles)
-            
-            # Get additional random articles from domains with percentile <= 50
-            remaining_random = articles_to_fetch_random
-            if recommended_articles:
-                low_percentile_domains = [d for d in domain_scores.keys() 
-                                         if d not in high_percentile_domains
-                                         and d in db.list_collection_names()]
-                
-                if low_percentile_domains:
-                    articles_per_domain = max(1, remaining_random // len(low_percentile_domains))
-                    
-                    for domain in low_percentile_domains:
-                        # Get article IDs to exclude
-                        exclude_ids = [article_id for article_id, article_domain in interacted_articles if article_domain == domain]
-                        already_recommended_ids = [a["id"] for a in recommended_articles if a.get("domain") == domain]
-                        exclude_ids.extend(already_recommended_ids)
-                        
-                        additional_articles = list(db[domain].aggregate([
-                            {"$match": {"id": {"$nin": exclude_ids}}},
-                            {"$sample": {"size": articles_per_domain}},
-                            {"$project": {"_id": 0}}
-                        ]))
-                        
-                        # Add domain name and source info to each article
-                        for article in additional_articles:
-                            article["domain"] = domain
-                            article["domain_score"] = float(domain_percentiles[domain])
-                            article["recommendation_source"] = "random"
-                            
-                        recommended_articles.extend(additional_articles)
-                        remaining_random -= len(additional_articles)
-                        
-                        if remaining_random <= 0:
-                            break
-            
-        else:
-            # Simple recommendation for users with fewer than 5 liked articles
-            # Get random articles from each interested domain
-            articles_per_domain = max(1, 40 // len(domain_collections))  # 40 articles total
-            
-            for domain in domain_collections:
-                # Make sure the domain collection exists
-                if domain in db.list_collection_names():
-                    # Get article IDs to exclude
-                    exclude_ids = [article_id for article_id, article_domain in interacted_articles if article_domain == domain]
-                    
-                    # Get random articles from this domain
-                    domain_articles = list(db[domain].aggregate([
-                        {"$match": {"id": {"$nin": exclude_ids}}},
-                        {"$sample": {"size": articles_per_domain}},
-                        {"$project": {"_id": 0}}
-                    ]))
-                    
-                    # Add domain name and source info to each article
-                    for article in domain_articles:
-                        article["domain"] = domain
-                        article["recommendation_source"] = "new_user"
-                    
-                    recommended_articles.extend(domain_articles)
+        recommended_articles.extend(score_based_articles)
+        recommended_articles.extend(random_articles)
         
-        # If we still don't have 40 articles, grab more from random domains
-        if len(recommended_articles) < 40:
-            remaining_from_collections = 40 - len(recommended_articles)
-            all_domains = ["nature", "education", "entertainment", "technology", 
-                          "science", "political", "lifestyle", "social", 
-                          "space", "food"]
-            
-            # Filter to domains with collections and that aren't already well-represented
-            valid_domains = [d.lower() for d in all_domains 
-                           if d.lower() in db.list_collection_names() 
-                           and d.lower() not in (high_percentile_domains if 'high_percentile_domains' in locals() else [])]
-            
-            if valid_domains:
-                articles_per_domain = max(1, remaining_from_collections // len(valid_domains))
-                
-                for domain in valid_domains:
-                    # Get article IDs to exclude
-                    exclude_ids = [article_id for article_id, article_domain in interacted_articles if article_domain == domain]
-                    already_recommended_ids = [a["id"] for a in recommended_articles if a.get("domain") == domain]
-                    exclude_ids.extend(already_recommended_ids)
-                    
-                    extra_articles = list(db[domain].aggregate([
-                        {"$match": {"id": {"$nin": exclude_ids}}},
-                        {"$sample": {"size": articles_per_domain}},
-                        {"$project": {"_id": 0}}
-                    ]))
-                    
-                    # Add domain name and source info to each article
-                    for article in extra_articles:
-                        article["domain"] = domain
-                        article["recommendation_source"] = "fallback"
-                        
-                    recommended_articles.extend(extra_articles)
-                    remaining_from_collections -= len(extra_articles)
-                    
-                    if remaining_from_collections <= 0:
-                        break
+    else:
+        # Simple recommendation for users with fewer than 5 liked articles
+        # Get random articles from each interested domain
+        articles_per_domain = max(1, 40 // len(domain_collections))  # 40 articles total
+        
+        # Make sure the domain collections exist
+        quotas = [(domain, articles_per_domain) for domain in domain_collections 
+                  if domain in existing_collections]
         
-        # Remove duplicates by ID
-        seen_ids = set()
-        unique_articles = []
+        # Add source info to each article
+        for article in sample_from_domains(db, quotas, excluded_ids):
+            article["recommendation_source"] = "new_user"
+            recommended_articles.append(article)
+    
+    # If we still don't have 40 articles, grab more from random domains
+    if len(recommended_articles) < 40:
+        remaining_from_collections = 40 - len(recommended_articles)
+        
+        # Filter to domains with collections and that aren't already well-represented
+        valid_domains = [d for d in ALL_DOMAINS 
+                       if d in existing_collections 
+                       and d not in high_percentile_domains]
+        
+        if valid_domains:
+            # Exclude articles already recommended as well as interacted ones
+            fallback_excluded_ids = with_recommended(excluded_ids, recommended_articles)
+            quotas = even_quotas(valid_domains, remaining_from_collections)
+            
+            # Add source info to each article
+            for article in sample_from_domains(db, quotas, fallback_excluded_ids):
+                article["recommendation_source"] = "fallback"
+                recommended_articles.append(article)
+    
+    # Remove duplicates by ID
+    unique_articles = unique_by_id(recommended_articles)
+    
+    # Prepare response
+    response_data = {
+        "standardRecommendedArticles": unique_articles[:40],  # Limit to 40 articles
+        "count": len(unique_articles[:40]),
+        "method": "Interest, interaction, and custom sentiment-based recommendations"
+    }
+    
+    return response_data, 200
+
+@sentiment_blueprint.route('/user/<user_id>/standard-recommendations', methods=['GET'])
+def get_standard_recommendations(user_id):
+    # Get database from app context
+    db = sentiment_blueprint.db
+    
+    try:
+        # Serve the precomputed feed with a single read if there is one
+        feed = read_feed("standard", user_id)
+        if feed:
+            return jsonify(feed), 200
         
-        for article in recommended_articles:
-            if article["id"] not in seen_ids:
-                seen_ids.add(article["id"])
-                unique_articles.append(article)
+        # Check cache first
+        cache_key = f"std_rec_{user_id}"
+        cached_result = cache.get(cache_key)
+        if cached_result:
+            return jsonify(cached_result), 200
         
-        # Prepare response
-        response_data = {
-            "standardRecommendedArticles": unique_articles[:40],  # Limit to 40 articles
-            "count": len(unique_articles[:40]),
-            "method": "Interest, interaction, and custom sentiment-based recommendations"
-        }
+        started_at = datetime.now()
+        response_data, status = build_standard_recommendations(db, user_id)
         
-        # Cache the result for 30 minutes (1800 seconds)
-        cache.set(cache_key, response_data, timeout=1800)
+        if status == 200:
+            # Cache the result for 6 hours (21600 seconds), interaction events clear it sooner.
+            # A result the user's latest interaction already invalidated isn't cached.
+            if user_invalidated_at(user_id) < started_at.timestamp():
+                cache.set(cache_key, response_data, timeout=21600)
+            
+            # Store it as the user's feed for the next load
+            save_feed("standard", user_id, response_data, generated_at=started_at)
         
-        return jsonify(response_data), 200
+        return jsonify(response_data), status
             
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
 # Define the initialization function to pass database connection and other resources from main app
 def init_app(app, database):
-    sentiment_blueprint.db = database
\ No newline at end of file
+    sentiment_blueprint.db = database
+    
+    # Drop cached recommendations when the user interacts
+    register_user_cache(cache, "std_rec_{user_id}")
+    
+    # Lets the recovery on start find recent unscored comments without a full scan
+    try:
+        database.users.create_index("commentedArticles.commentedAt")
+    except Exception as e:
+        log.error("Error creating comment index: %s", e)
+    
+    # Score comments a previous worker left unscored
+    start_sentiment_worker()
+    
+    # Let the feed worker precompute standard recommendations
+    register_feed_builder("standard", lambda user_id: build_standard_recommendations(database, user_id))
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+Signed session tokens.
+
+Login hands out a token carrying the user's id and name, signed with
+HMAC-SHA256:
+
+    base64url(json claims) + "." + base64url(signature)
+
+Routes that receive it in an `Authorization: Bearer <token>` header can
+trust the user id without looking the user up in MongoDB. Verified tokens
+are kept in a small per-worker LRU, so a repeat request skips the decoding
+too.
+
+The signing key comes from SESSION_SECRET. Without it a random key is
+created once and stored in the app_settings collection, so every worker
+and restart signs with the same key.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from pymongo import ReturnDocument
+
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 30 * 24 * 3600))
+VERIFIED_CACHE_SIZE = 4096
+
+secret_key = None
+verified_lock = threading.Lock()
+verified_tokens = OrderedDict()  # token -> claims
+
+
+class InvalidSession(Exception):
+    pass
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def sign(payload):
+    return hmac.new(secret_key, payload.encode(), hashlib.sha256).digest()
+
+
+def issue_token(user_id, full_name):
+    now = int(time.time())
+    claims = {"sub": str(user_id), "name": full_name, "iat": now, "exp": now + SESSION_TTL}
+    payload = b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{b64encode(sign(payload))}"
+
+
+def verify_token(token):
+    """Return the token's claims, raising InvalidSession if it is forged, malformed or expired"""
+    with verified_lock:
+        claims = verified_tokens.get(token)
+        if claims:
+            verified_tokens.move_to_end(token)
+
+    if claims is None:
+        try:
+            payload, signature = token.split(".")
+            if not hmac.compare_digest(b64decode(signature), sign(payload)):
+                raise InvalidSession("Invalid session token")
+            claims = json.loads(b64decode(payload))
+        except (ValueError, TypeError):
+            raise InvalidSession("Invalid session token")
+
+        with verified_lock:
+            verified_tokens[token] = claims
+            while len(verified_tokens) > VERIFIED_CACHE_SIZE:
+                verified_tokens.popitem(last=False)
+
+    if claims["exp"] < time.time():
+        raise InvalidSession("Session expired")
+    return claims
+
+
+def bearer_token(request):
+    """The token from the request's Authorization header, or None"""
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[len("Bearer "):].strip()
+    return None
+
+
+def init_sessions(database):
+    """Load the signing key from SESSION_SECRET or the shared app_settings collection"""
+    global secret_key
+    if os.environ.get('SESSION_SECRET'):
+        secret_key = os.environ['SESSION_SECRET'].encode()
+        return
+
+    # The first worker to get here stores its key, every other one reads it back
+    settings = database.app_settings.find_one_and_update(
+        {"_id": "session_secret"},
+        {"$setOnInsert": {"value": secrets.token_hex(32)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    secret_key = settings["value"].encode()
@@ -0,0 +1,179 @@
+"""
+Structured, non-blocking logging for the app process.
+
+Records are written to stdout as one JSON object per line, e.g.
+
+    {"ts": "2026-10-19T12:00:00.123", "level": "WARNING", "logger": "app",
+     "msg": "Error getting image for Mars: ...", "route": "/wiki", "request_id": "...", "page": "Mars"}
+
+Fields passed in `extra` are added to the record, and records logged during
+a request carry its route and request id. Calling threads only put records
+on a bounded queue; a listener thread formats and writes them, and if it
+falls behind new records are dropped instead of blocking the request.
+
+Two filters keep the volume bounded:
+- repeated warnings and errors, counted per logger and message template,
+  pass LOG_SAMPLE_BURST times per LOG_SAMPLE_WINDOW seconds, and the next
+  one that passes reports how many were suppressed
+- a single request logs at most REQUEST_LOG_LIMIT records
+
+Log with a constant message template so repeats are recognised:
+
+    log = get_logger(__name__)
+    log.warning("Error getting image for %s: %s", page_title, error, extra={"page": page_title})
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_SAMPLE_WINDOW = float(os.environ.get('LOG_SAMPLE_WINDOW', 60))
+LOG_SAMPLE_BURST = int(os.environ.get('LOG_SAMPLE_BURST', 5))
+REQUEST_LOG_LIMIT = int(os.environ.get('REQUEST_LOG_LIMIT', 50))
+
+# Attributes every LogRecord has, anything else came from `extra`
+STANDARD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestFilter(logging.Filter):
+    """Tag records with the request they were logged in, and cap records per request"""
+
+    def filter(self, record):
+        # Imported here because db_profiler logs through this module
+        from db_profiler import request_context
+        route, request_id = request_context()
+        record.route = route
+        if request_id:
+            record.request_id = request_id
+        if not has_request_context():
+            return True
+
+        logged = g.get("log_records", 0) + 1
+        g.log_records = logged
+        if logged == REQUEST_LOG_LIMIT:
+            record.request_log_limit_reached = True
+        return logged <= REQUEST_LOG_LIMIT
+
+
+class SamplingFilter(logging.Filter):
+    """Let through a burst of each repeated warning or error per window, then count the rest"""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.windows = {}  # (logger, message template) -> [window start, seen, suppressed]
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= LOG_SAMPLE_WINDOW:
+                suppressed = window[2] if window else 0
+                window = self.windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            window[1] += 1
+            if window[1] > LOG_SAMPLE_BURST:
+                window[2] += 1
+                return False
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue records for the listener thread, dropping them if the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.listener = None
+        self.listener_pid = None
+        self.listener_lock = threading.Lock()
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record needn't be
+        # flattened to a string here; formatting happens off the request thread
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            record.dropped_before = self.dropped
+        try:
+            self.queue.put_nowait(record)
+            self.dropped = 0
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        self.start_listener()
+        super().emit(record)
+
+    def start_listener(self):
+        """Start the writer thread once per process"""
+        if self.listener_pid == os.getpid():
+            return
+        with self.listener_lock:
+            if self.listener_pid == os.getpid():
+                return
+            stream_handler = logging.StreamHandler(sys.stdout)
+            stream_handler.setFormatter(JsonFormatter())
+            self.listener = QueueListener(self.queue, stream_handler)
+            self.listener.start()
+            self.listener_pid = os.getpid()
+
+    def stop_listener(self):
+        """Write out the queued records and stop the writer thread"""
+        with self.listener_lock:
+            if self.listener_pid == os.getpid():
+                self.listener.stop()
+            self.listener_pid = None
+
+
+def configure_logging():
+    root = logging.getLogger()
+    if any(isinstance(handler, NonBlockingQueueHandler) for handler in root.handlers):
+        return
+    handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(SamplingFilter())
+    handler.addFilter(RequestFilter())
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    atexit.register(handler.stop_listener)
+    # Don't fork while the writer thread might hold the queue's lock; the
+    # parent restarts it right after and a child starts its own on first use
+    os.register_at_fork(before=handler.stop_listener, after_in_parent=handler.start_listener)
+
+
+def get_logger(name):
+    configure_logging()
+    return logging.getLogger(name)
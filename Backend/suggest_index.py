@@ -0,0 +1,100 @@
+"""
+Typeahead suggestions over article titles and trending topics.
+
+Every title is stored under its full normalized form and under the suffix
+starting at each later word, so "cap" suggests "Delhi Capitals". The keys
+live in one sorted list, and a prefix lookup is a bisect followed by a scan
+of the matching range. Prefixes of up to SHORT_PREFIX characters match too
+many keys to scan per keystroke, so their best suggestions are kept in a
+table updated on every insert.
+
+    index = SuggestIndex()
+    index.add("Delhi Capitals", score=12, domain="social", id=123)
+    index.suggest("del", limit=8)
+"""
+import heapq
+import re
+import threading
+from bisect import bisect_left, bisect_right
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+SHORT_PREFIX = 3
+MAX_SUGGESTIONS = 20
+
+# Engagement points per like and per comment on an article
+LIKE_POINTS = 1
+COMMENT_POINTS = 2
+# Pageviews of a trending topic worth one engagement point
+VIEWS_PER_POINT = 10000
+
+
+def normalize(text):
+    return " ".join(TOKEN_PATTERN.findall(text.lower()))
+
+
+def engagement_score(article):
+    comment_count = article.get("comment_count")
+    if comment_count is None:
+        comment_count = len(article.get("comments") or [])
+    return (article.get("likes") or 0) * LIKE_POINTS + comment_count * COMMENT_POINTS
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.keys = []          # sorted normalized title suffixes
+        self.key_entries = []   # entry number of each key, in the same order
+        self.entries = []       # entry number -> suggestion dict
+        self.titles = set()     # normalized titles already added
+        self.short_tops = {}    # short prefix -> best entry numbers, highest score first
+        self.lock = threading.Lock()
+
+    def add(self, title, score, **fields):
+        """Add a suggestion. Titles already present are skipped."""
+        normalized = normalize(title)
+        if not normalized:
+            return False
+
+        with self.lock:
+            if normalized in self.titles:
+                return False
+            self.titles.add(normalized)
+            entry = len(self.entries)
+            self.entries.append(dict(fields, title=title, score=score))
+
+            words = normalized.split(" ")
+            for i in range(len(words)):
+                key = " ".join(words[i:])
+                position = bisect_right(self.keys, key)
+                self.keys.insert(position, key)
+                self.key_entries.insert(position, entry)
+
+                for length in range(1, min(SHORT_PREFIX, len(key)) + 1):
+                    tops = self.short_tops.setdefault(key[:length], [])
+                    if entry not in tops:
+                        tops.append(entry)
+                        tops.sort(key=lambda number: self.entries[number]["score"], reverse=True)
+                        del tops[MAX_SUGGESTIONS:]
+        return True
+
+    def add_article(self, domain, article):
+        return self.add(article["title"], engagement_score(article), type="article", domain=domain, id=article["id"])
+
+    def add_trending(self, topic):
+        return self.add(topic["title"], round(topic["views"] / VIEWS_PER_POINT, 2), type="trending")
+
+    def suggest(self, prefix, limit):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        with self.lock:
+            if len(prefix) <= SHORT_PREFIX:
+                matches = self.short_tops.get(prefix, [])[:limit]
+            else:
+                start = bisect_left(self.keys, prefix)
+                # Keys only contain [a-z0-9 ], so every key starting with prefix sorts before prefix + "~"
+                end = bisect_left(self.keys, prefix + "~", start)
+                matches = heapq.nlargest(limit, set(self.key_entries[start:end]),
+                                         key=lambda number: self.entries[number]["score"])
+            return [self.entries[number] for number in matches]
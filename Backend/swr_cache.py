@@ -0,0 +1,165 @@
+"""
+Stale-while-revalidate caching for expensive Flask views.
+
+A cached response younger than soft_ttl is served as is. Past soft_ttl it is
+still served right away, and the view is re-run in a background thread to
+replace it. Past hard_ttl the entry is gone and the caller waits for a fresh
+response. Only one recomputation per key runs at a time; concurrent misses
+wait for it instead of all running the view.
+
+    @app.route('/articles/trending')
+    @stale_while_revalidate(cache, lambda: f"trending_{request.args.get('limit')}",
+                            soft_ttl=60, hard_ttl=600)
+    def get_trending_articles():
+        ...
+
+Only 200 responses are cached. Each response carries an X-Cache header of
+HIT, STALE or MISS, and cache_stats() returns the counters per view.
+
+Views over per-user data pass invalidated_at, which returns when the view's
+data last changed. An entry computed before that is neither stored nor
+served, so a computation that was running when the user interacted can't
+put the old response back after the invalidation cleared it.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import Response, current_app, make_response, request
+
+from metrics import count_cache
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+# Longest a request waits for another thread's recomputation of the same key
+SINGLE_FLIGHT_WAIT = 30
+
+stats_lock = threading.Lock()
+view_stats = {}
+
+inflight_lock = threading.Lock()
+inflight = {}
+
+
+def count(name, outcome):
+    with stats_lock:
+        counters = view_stats.setdefault(name, {"hit": 0, "stale": 0, "miss": 0, "refresh_error": 0})
+        counters[outcome] += 1
+    count_cache(name, outcome)
+
+
+def cache_stats():
+    """Hit, stale and miss counters per cached view, with the hit ratio"""
+    with stats_lock:
+        stats = {}
+        for name, counters in view_stats.items():
+            served = counters["hit"] + counters["stale"] + counters["miss"]
+            stats[name] = dict(counters, hit_ratio=(counters["hit"] + counters["stale"]) / served if served else 0)
+        return stats
+
+
+def begin_flight(key):
+    """Return (event, leader). The leader runs the view, others wait on the event."""
+    with inflight_lock:
+        if key in inflight:
+            return inflight[key], False
+        event = threading.Event()
+        inflight[key] = event
+        return event, True
+
+
+def end_flight(key):
+    with inflight_lock:
+        event = inflight.pop(key, None)
+    if event:
+        event.set()
+
+
+def render(entry, outcome):
+    response = Response(entry["body"], status=entry["status"], mimetype=entry["mimetype"])
+    response.headers["X-Cache"] = outcome
+    return response
+
+
+def stale_while_revalidate(cache, key_fn, soft_ttl, hard_ttl, name=None, invalidated_at=None):
+    """
+    Cache a view's responses in `cache` under key_fn(*view_args).
+    key_fn runs inside the request, so it can read request.args.
+    invalidated_at(*view_args), if given, returns the time.time() of the
+    last change to the view's data.
+    """
+    def decorator(view):
+        view_name = name or view.__name__
+
+        def outdated(computed_at, args, kwargs):
+            return invalidated_at is not None and computed_at <= invalidated_at(*args, **kwargs)
+
+        def compute_and_store(key, args, kwargs):
+            # The data read by the view is at least as new as this
+            computed_at = time.time()
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not outdated(computed_at, args, kwargs):
+                cache.set(key, {
+                    "body": response.get_data(),
+                    "status": response.status_code,
+                    "mimetype": response.mimetype,
+                    "computed_at": computed_at,
+                    "stored_at": time.time()
+                }, timeout=hard_ttl)
+            return response
+
+        def refresh_in_background(app, path, query_string, key, args, kwargs):
+            try:
+                with app.test_request_context(path, query_string=query_string):
+                    compute_and_store(key, args, kwargs)
+            except Exception as e:
+                count(view_name, "refresh_error")
+                log.error("Error refreshing cached %s: %s", view_name, e)
+            finally:
+                end_flight(key)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = key_fn(*args, **kwargs)
+            entry = cache.get(key)
+            if entry and outdated(entry["computed_at"], args, kwargs):
+                cache.delete(key)
+                entry = None
+
+            if entry:
+                if time.time() - entry["stored_at"] < soft_ttl:
+                    count(view_name, "hit")
+                    return render(entry, "HIT")
+
+                # Serve the stale copy and let one background thread replace it
+                count(view_name, "stale")
+                _, leader = begin_flight(key)
+                if leader:
+                    threading.Thread(
+                        target=refresh_in_background,
+                        args=(current_app._get_current_object(), request.path,
+                              request.query_string.decode("utf-8"), key, args, kwargs),
+                        daemon=True
+                    ).start()
+                return render(entry, "STALE")
+
+            count(view_name, "miss")
+            event, leader = begin_flight(key)
+            if not leader:
+                # Someone else is already computing this key, reuse their result
+                event.wait(SINGLE_FLIGHT_WAIT)
+                entry = cache.get(key)
+                if entry and not outdated(entry["computed_at"], args, kwargs):
+                    return render(entry, "MISS")
+                return view(*args, **kwargs)
+
+            try:
+                response = compute_and_store(key, args, kwargs)
+            finally:
+                end_flight(key)
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+    return decorator
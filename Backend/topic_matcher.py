@@ -0,0 +1,82 @@
+"""
+Keyword classification of Wikipedia trending topics.
+
+Each regional keyword set is compiled once into a single regex alternation,
+and the namespace filters into one anchored regex, so classifying a title is
+one C-level scan instead of a Python loop over every keyword and prefix.
+
+    classifier = get_classifier("india")
+    related, others = classifier.partition(topics)
+
+Matching is a case-insensitive substring match, the same as checking
+`keyword in title.lower()` for each keyword.
+"""
+import re
+
+DEFAULT_REGION = "india"
+
+# Keywords whose topics are listed first for each region
+REGION_KEYWORDS = {
+    "india": ["india", "indian", "mumbai", "delhi", "bangalore", "kolkata", "chennai",
+              "hyderabad", "modi", "bollywood", "cricket", "bjp", "congress"],
+    "us": ["united states", "american", "america", "new york", "california", "texas", "washington",
+           "florida", "chicago", "trump", "biden", "nfl", "nba", "super bowl"],
+    "uk": ["united kingdom", "british", "britain", "england", "english", "london", "scotland",
+           "wales", "manchester", "liverpool", "premier league", "starmer", "bbc"],
+    "australia": ["australia", "australian", "sydney", "melbourne", "brisbane", "perth",
+                  "queensland", "afl", "albanese"],
+    "canada": ["canada", "canadian", "toronto", "vancouver", "montreal", "ottawa", "quebec",
+               "alberta", "nhl", "carney"],
+}
+
+# Skip main page, special pages, and other non-article pages
+SKIPPED_TITLES = ["Main_Page", "Special:Search"]
+SKIPPED_PREFIXES = ["Wikipedia:", "Special:", "File:", "Portal:", "User:"]
+
+
+def compile_keywords(keywords):
+    # Longest first so a longer keyword wins over a shorter one it contains
+    ordered = sorted(set(keyword.lower() for keyword in keywords), key=len, reverse=True)
+    return re.compile("|".join(re.escape(keyword) for keyword in ordered))
+
+
+def compile_skipped(titles, prefixes):
+    exact = [re.escape(title) + r"\Z" for title in titles]
+    starts = [re.escape(prefix) for prefix in prefixes]
+    return re.compile("|".join(exact + starts))
+
+
+class TopicClassifier:
+    """Filters non-article pages and splits topics into related and other"""
+
+    def __init__(self, keywords, skipped_titles=SKIPPED_TITLES, skipped_prefixes=SKIPPED_PREFIXES):
+        self.keyword_pattern = compile_keywords(keywords)
+        self.skipped_pattern = compile_skipped(skipped_titles, skipped_prefixes)
+
+    def is_article(self, name):
+        """False for the main page and pages in non-article namespaces"""
+        return self.skipped_pattern.match(name) is None
+
+    def is_related(self, title):
+        return self.keyword_pattern.search(title.lower()) is not None
+
+    def partition(self, topics):
+        """Split topic dicts into (related, others), keeping their order"""
+        related = []
+        others = []
+        for topic in topics:
+            if self.is_related(topic['title']):
+                related.append(topic)
+            else:
+                others.append(topic)
+        return related, others
+
+
+classifiers = {}
+
+
+def get_classifier(region=DEFAULT_REGION):
+    """Compiled classifier for a region in REGION_KEYWORDS. Raises KeyError for unknown regions."""
+    if region not in classifiers:
+        classifiers[region] = TopicClassifier(REGION_KEYWORDS[region])
+    return classifiers[region]
@@ -0,0 +1,217 @@
+"""
+Trending Wikipedia topics over rolling windows, polled in the background.
+
+The Wikimedia pageviews top list only changes once a day, so instead of
+calling it on every /wiki/trending request a poller thread fetches each day
+once and stores its topic list in the trending_topics collection:
+
+    {
+        "_id": "2025/03/25",
+        "topics": [{"title": ..., "views": ..., "rank": ...}, ...],  # non-article pages removed
+        "fetchedAt": datetime
+    }
+
+Each worker adds the stored days to an in-memory PageviewWindow covering the
+last 30 days. Topics are ranked over a 1, 7 or 30 day window by total views or by
+day-over-day growth, and topics related to the requested region are moved
+to the front, see topic_matcher.
+
+Every worker polls MongoDB, but only the worker holding the per-date lock
+calls the pageviews API, so after the initial backfill upstream traffic is
+about one call per day per deployment.
+"""
+import copy
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import requests
+from pymongo.errors import DuplicateKeyError
+
+from pageview_window import PageviewWindow
+from structured_logging import get_logger
+from topic_matcher import DEFAULT_REGION, get_classifier
+
+log = get_logger(__name__)
+
+PAGEVIEWS_URL = "https://wikimedia.org/api/rest_v1/metrics/pageviews/top/en.wikipedia/all-access/"
+
+# Set proper headers to avoid 403 errors
+PAGEVIEWS_HEADERS = {
+    'User-Agent': 'Visionary Educational App/1.0 (contact@visionary-education.com)',
+    'Accept': 'application/json',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+POLL_INTERVAL = int(os.environ.get('TRENDING_POLL_INTERVAL', 900))
+# Pageviews for a day are published with a delay, so look back a few days
+DAYS_TO_TRY = 3
+# Days of top lists kept for the rolling trending windows
+WINDOW_DAYS = 30
+TRENDING_WINDOWS = (1, 7, 30)
+# A date that failed to fetch (not published yet, 403, worker died) is retried after this long
+FETCH_RETRY_AFTER = 3600
+
+trending_db = None
+current_window = None
+state_lock = threading.Lock()
+poller_pid = None
+poller_lock = threading.Lock()
+
+# Ranked, region-ordered topic lists for the current window, built on first request
+ordered_topics = {}
+
+
+def build_topics(top_articles):
+    """Drop non-article pages and keep a simplified topic object per article"""
+    is_article = get_classifier().is_article
+    return [
+        {
+            'title': article['article'].replace('_', ' '),
+            'views': article['views'],
+            'rank': article['rank']
+        }
+        for article in top_articles
+        if is_article(article['article'])
+    ]
+
+
+def fetch_top_articles(date_str):
+    """Fetch the pageviews top list for one date, or None if it isn't available"""
+    response = requests.get(f"{PAGEVIEWS_URL}{date_str}", headers=PAGEVIEWS_HEADERS, timeout=10)
+    if response.status_code != 200:
+        log.warning("Pageviews API returned status %d for %s", response.status_code, date_str)
+        return None
+    return response.json()['items'][0]['articles']
+
+
+def claim_fetch(date_str):
+    """
+    Take the per-date fetch lock so only one worker calls the API. The lock is
+    kept after the attempt, so a failed date is retried once it expires.
+    """
+    locks = trending_db.trending_fetch_locks
+    now = datetime.now()
+    locks.delete_one({"_id": date_str, "lockedAt": {"$lt": now - timedelta(seconds=FETCH_RETRY_AFTER)}})
+    try:
+        locks.insert_one({"_id": date_str, "lockedAt": now})
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+def store_date(date_str):
+    """Fetch and store one date's topics. Returns the stored document, or None."""
+    if not claim_fetch(date_str):
+        return None
+    try:
+        top_articles = fetch_top_articles(date_str)
+    except Exception as e:
+        log.warning("Error fetching trending data for %s: %s", date_str, e)
+        return None
+    if top_articles is None:
+        return None
+    document = {"_id": date_str, "topics": build_topics(top_articles), "fetchedAt": datetime.now()}
+    trending_db.trending_topics.replace_one({"_id": date_str}, document, upsert=True)
+    return document
+
+
+def recent_dates(days=DAYS_TO_TRY):
+    """Dates to look for, newest first, formatted for the API (YYYY/MM/DD)"""
+    today = datetime.now()
+    return [(today - timedelta(days=days_ago)).strftime("%Y/%m/%d") for days_ago in range(1, days + 1)]
+
+
+def parse_date(date_str):
+    return datetime.strptime(date_str, "%Y/%m/%d").date()
+
+
+def refresh(backfill=True):
+    """
+    Add newly stored days to the in-memory window, fetching missing days from
+    the API first. Without backfill only the newest available day is fetched,
+    which is enough to answer a request on a cold start.
+    """
+    global current_window
+    dates = recent_dates(WINDOW_DAYS)
+    stored_dates = {doc["_id"] for doc in trending_db.trending_topics.find({"_id": {"$in": dates}}, {"_id": 1})}
+
+    for date_str in dates if backfill else dates[:DAYS_TO_TRY]:
+        if date_str not in stored_dates and store_date(date_str):
+            stored_dates.add(date_str)
+        if not backfill and date_str in stored_dates:
+            break
+
+    # Only days this worker hasn't loaded yet are read back from MongoDB
+    window = current_window or PageviewWindow(WINDOW_DAYS)
+    loaded = window.loaded_days
+    new_dates = sorted(date_str for date_str in stored_dates if parse_date(date_str).toordinal() not in loaded)
+    if not new_dates:
+        return current_window
+
+    if window is current_window:
+        # Copy so requests never read a window that is being updated
+        window = copy.deepcopy(window)
+    for doc in trending_db.trending_topics.find({"_id": {"$in": new_dates}}):
+        window.add_day(parse_date(doc["_id"]), doc["topics"])
+
+    with state_lock:
+        current_window = window
+        ordered_topics.clear()
+    return current_window
+
+
+def get_trending(limit, region=DEFAULT_REGION, window=1, sort="views"):
+    """
+    Return the trending topics over the last `window` days, ranked by views or
+    velocity, with the region's related topics first. Loads the newest day on
+    a cold start. Raises KeyError for unknown regions.
+    """
+    classifier = get_classifier(region)
+    pageviews = current_window or refresh(backfill=False)
+    if not pageviews or pageviews.newest is None:
+        return None
+
+    key = (pageviews.newest, window, sort, region)
+    if key not in ordered_topics:
+        related, others = classifier.partition(pageviews.ranking(window, sort))
+        with state_lock:
+            ordered_topics[key] = (related + others, len(related))
+    topics, related_count = ordered_topics[key]
+
+    return {
+        "date": date.fromordinal(pageviews.newest).strftime("%Y/%m/%d"),
+        "days_loaded": len(pageviews.loaded_days),
+        "region": region,
+        "topics": topics[:limit],
+        "related_count": related_count
+    }
+
+
+def poll():
+    while True:
+        try:
+            refresh()
+        except Exception as e:
+            log.error("Error refreshing trending topics: %s", e)
+        time.sleep(POLL_INTERVAL)
+
+
+def start_poller():
+    """Start the poller thread for this process if it isn't running yet"""
+    global poller_pid
+    # Threads don't survive a fork, so a forked process starts its own
+    if poller_pid == os.getpid():
+        return
+    with poller_lock:
+        if poller_pid != os.getpid():
+            threading.Thread(target=poll, daemon=True).start()
+            poller_pid = os.getpid()
+
+
+def init_trending(database):
+    """Start polling in this process"""
+    global trending_db
+    trending_db = database
+    start_poller()
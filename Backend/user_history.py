@@ -0,0 +1,100 @@
+"""
+Slim user reads and paginated interaction history.
+
+The likedArticles, commentedArticles and sharedArticles arrays on a user
+grow for as long as the account is used. A slim login reads only their
+sizes, computed by MongoDB, and hands out a history cursor. The client then
+pages through each array, newest first, and only the requested slice is
+ever sent over the wire.
+
+The cursor is an opaque string that records, per interaction type, the
+array index paging continues from. Interactions are appended with $push, so
+indexes stay stable while the user keeps interacting. Removing an item
+(unliking) can shift a page by one entry.
+"""
+import base64
+import json
+
+INTERACTION_TYPES = ["likedArticles", "commentedArticles", "sharedArticles"]
+
+HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 100
+
+# Profile fields returned by login, never the interaction arrays
+PROFILE_FIELDS = ["fullName", "email", "phone", "bio", "interestedDomains"]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(positions):
+    return base64.urlsafe_b64encode(json.dumps(positions, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid history cursor")
+    if not isinstance(positions, dict) or not all(
+            isinstance(positions.get(kind, 0), int) and positions.get(kind, 0) >= 0 for kind in INTERACTION_TYPES):
+        raise InvalidCursor("Invalid history cursor")
+    return positions
+
+
+def find_slim_user(users_collection, query):
+    """The user's profile, password hash and interaction counts, without the interaction arrays"""
+    projection = {field: 1 for field in PROFILE_FIELDS + ["password"]}
+    for kind in INTERACTION_TYPES:
+        projection[f"{kind}Count"] = {"$size": {"$ifNull": [f"${kind}", []]}}
+
+    users = list(users_collection.aggregate([
+        {"$match": query},
+        {"$limit": 1},
+        {"$project": projection}
+    ]))
+    if not users:
+        return None
+
+    user = users[0]
+    user["interactionCounts"] = {kind: user.pop(f"{kind}Count") for kind in INTERACTION_TYPES}
+    return user
+
+
+def history_cursor(counts):
+    """Cursor for the newest page of every interaction type"""
+    return encode_cursor(dict(counts))
+
+
+def get_history_page(users_collection, user_id, kind, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of the user's `kind` interactions, newest first. Returns
+    (items, next_cursor), where next_cursor is None once the oldest item was
+    returned, or None if the user doesn't exist.
+    """
+    positions = decode_cursor(cursor) if cursor else {}
+    array = {"$ifNull": [f"${kind}", []]}
+
+    if kind in positions:
+        end = positions[kind]
+        if end == 0:
+            return [], None
+        start = max(0, end - limit)
+        page = {"items": {"$slice": [array, start, end - start]}}
+    else:
+        # Without a position, read the newest items and the array size
+        page = {"items": {"$slice": [array, -limit]}, "size": {"$size": array}}
+
+    users = list(users_collection.aggregate([
+        {"$match": {"_id": user_id}},
+        {"$limit": 1},
+        {"$project": dict(page, _id=0)}
+    ]))
+    if not users:
+        return None
+    if kind not in positions:
+        start = max(0, users[0]["size"] - limit)
+
+    positions[kind] = start
+    return list(reversed(users[0]["items"])), encode_cursor(positions) if start > 0 else None
@@ -0,0 +1,167 @@
+"""
+Per-user domain score profiles.
+
+Each user has one document in the user_profiles collection holding running
+domain weights, so recommendations don't have to walk the user's whole
+interaction history:
+
+    {
+        "_id": <user ObjectId>,
+        "domainScores": {"nature": 1.6, ...},   # +0.5 per like, +0.1 per share
+        "commentScores": {"nature": 0.4, ...},  # +0.2 / -0.2 per positive / negative comment
+        "likeCount": 7,
+        "builtAt": datetime                     # comments up to here are counted
+    }
+
+Interaction routes update it with atomic $inc. Comment scores are kept apart
+so a domain's comment contribution can be floored at zero when read.
+
+Comments are scored in the background. A profile built from history scores
+the comments it finds itself, so only comments written after builtAt are
+added when their sentiment label is stored.
+"""
+from datetime import datetime
+
+LIKE_WEIGHT = 0.5
+SHARE_WEIGHT = 0.1
+COMMENT_WEIGHT = 0.2
+
+ALL_DOMAINS = ["nature", "education", "entertainment", "technology",
+               "science", "political", "lifestyle", "social", "space", "food"]
+
+
+def create_profile(db, user_id):
+    """Create an empty profile for a new user"""
+    now = datetime.now()
+    db.user_profiles.update_one(
+        {"_id": user_id},
+        {"$setOnInsert": {"domainScores": {}, "commentScores": {}, "likeCount": 0,
+                          "updatedAt": now, "builtAt": now}},
+        upsert=True
+    )
+
+
+def record_like(db, user_id, domain, liked=True):
+    """Add a like to the profile, or take it back on unlike"""
+    sign = 1 if liked else -1
+    db.user_profiles.update_one(
+        {"_id": user_id},
+        {"$inc": {f"domainScores.{domain}": sign * LIKE_WEIGHT, "likeCount": sign},
+         "$set": {"updatedAt": datetime.now()}}
+    )
+
+
+def record_share(db, user_id, domain):
+    db.user_profiles.update_one(
+        {"_id": user_id},
+        {"$inc": {f"domainScores.{domain}": SHARE_WEIGHT},
+         "$set": {"updatedAt": datetime.now()}}
+    )
+
+
+def comment_updates(comments, labels):
+    """
+    Build (user_id, $inc document) pairs for scored comments.
+    Neutral comments don't change the profile and are skipped.
+    """
+    increments = {}
+    for comment, label in zip(comments, labels):
+        if label == 0:
+            continue
+        inc = increments.setdefault(comment['userId'], {})
+        key = f"commentScores.{comment['domain']}"
+        inc[key] = inc.get(key, 0) + label * COMMENT_WEIGHT
+    return list(increments.items())
+
+
+def uncounted_comments(db, comments):
+    """
+    The scored comments that the authors' existing profiles don't count yet,
+    those written after the profile was built. Comments without a profile
+    are left out, the profile counts them when it is built from history.
+    """
+    user_ids = list({comment['userId'] for comment in comments})
+    built_at = {}
+    for profile in db.user_profiles.find({"_id": {"$in": user_ids}}, {"builtAt": 1, "updatedAt": 1}):
+        # Profiles from before builtAt was stored only miss comments after their last update
+        built_at[profile["_id"]] = profile.get("builtAt") or profile.get("updatedAt")
+
+    return [comment for comment in comments
+            if built_at.get(comment['userId']) and comment.get('commentedAt')
+            and comment['commentedAt'] > built_at[comment['userId']]]
+
+
+def profile_from_history(user, score_comments):
+    """
+    Compute a profile from the user's full interaction history.
+    score_comments takes a list of comment texts and returns sentiment scores.
+    """
+    now = datetime.now()
+    domain_scores = {}
+    comment_scores = {}
+
+    for article in user.get("likedArticles", []):
+        if 'domain' in article:
+            domain = article['domain'].lower()
+            domain_scores[domain] = domain_scores.get(domain, 0) + LIKE_WEIGHT
+
+    for article in user.get("sharedArticles", []):
+        if 'domain' in article:
+            domain = article['domain'].lower()
+            domain_scores[domain] = domain_scores.get(domain, 0) + SHARE_WEIGHT
+
+    # Use stored sentiment labels and only run the model for unlabelled comments
+    comments = [article for article in user.get("commentedArticles", [])
+                if 'domain' in article and 'commentText' in article]
+    sentiments = [article.get('sentiment') for article in comments]
+    unscored = [i for i, score in enumerate(sentiments) if score is None]
+    if unscored:
+        for i, score in zip(unscored, score_comments([comments[i]['commentText'] for i in unscored])):
+            sentiments[i] = score
+
+    for article, sentiment in zip(comments, sentiments):
+        domain = article['domain'].lower()
+        if sentiment > 0:
+            comment_scores[domain] = comment_scores.get(domain, 0) + COMMENT_WEIGHT
+        elif sentiment < 0:
+            comment_scores[domain] = comment_scores.get(domain, 0) - COMMENT_WEIGHT
+
+    return {
+        "domainScores": domain_scores,
+        "commentScores": comment_scores,
+        "likeCount": len(user.get("likedArticles", [])),
+        "updatedAt": now,
+        "builtAt": now
+    }
+
+
+def build_profile(db, user, score_comments):
+    """
+    Build and store a profile from the user's full interaction history.
+    Used once for users who existed before profiles were maintained.
+    """
+    profile = profile_from_history(user, score_comments)
+
+    # $setOnInsert keeps a profile another worker created in the meantime
+    db.user_profiles.update_one({"_id": user["_id"]}, {"$setOnInsert": profile}, upsert=True)
+    return db.user_profiles.find_one({"_id": user["_id"]})
+
+
+def get_profile(db, user, score_comments):
+    """Return the user's profile, building it from history if it doesn't exist yet"""
+    profile = db.user_profiles.find_one({"_id": user["_id"]})
+    if profile is None:
+        profile = build_profile(db, user, score_comments)
+    return profile
+
+
+def profile_domain_scores(profile):
+    """Combine the running weights into one score per known domain"""
+    domain_scores = {}
+    for domain in ALL_DOMAINS:
+        score = profile.get("domainScores", {}).get(domain, 0)
+        # A domain's comments never count against its like and share score
+        score += max(0, profile.get("commentScores", {}).get(domain, 0))
+        # Guard against float drift from repeated like/unlike
+        domain_scores[domain] = max(0, round(score, 6))
+    return domain_scores